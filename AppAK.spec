@@ -79,7 +79,8 @@ exe = EXE(
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    # UPX-compressed DLLs are decompressed on every launch, which slows startup
+    upx=False,
     console=True,  # False untuk sembunyikan cmd window (ganti jika sudah stabil)
 )
 
@@ -89,7 +90,7 @@ coll = COLLECT(
     a.zipfiles,
     a.datas,
     strip=False,
-    upx=True,
+    upx=False,
     upx_exclude=[],
     name='AppAK',
 )
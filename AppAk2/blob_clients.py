@@ -0,0 +1,206 @@
+"""
+Blob store clients.
+
+``get_blob_client()`` returns a ``VercelBlobClient`` for Vercel Blob, or,
+when BLOB_LOCAL_ROOT is set, a ``LocalBlobClient`` that keeps the blobs as
+files under that directory. Both offer the part of the BlobClient API the
+app uses (put, upload_file, head, get, delete, iter_objects) plus
+``read_range``, so migrate_to_production.py and the storage backend can be
+run and tested without a Vercel token. Only ``VercelBlobClient`` can mint
+client tokens for uploads that go from the browser straight to the store.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import shutil
+import urllib.error
+import urllib.parse
+import urllib.request
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+try:
+    from vercel.blob.errors import BlobNotFoundError
+except ImportError:  # the local client does not need the SDK
+    class BlobNotFoundError(Exception):
+        pass
+
+
+BLOB_READ_TIMEOUT = 60
+# The Blob API that @vercel/blob and the Python SDK upload to
+BLOB_API_URL = "https://vercel.com/api/blob"
+BLOB_API_VERSION = "11"
+
+
+def get_blob_client():
+    root = os.environ.get("BLOB_LOCAL_ROOT")
+    if root:
+        return LocalBlobClient(root)
+    return VercelBlobClient()
+
+
+def generate_client_token(read_write_token, pathname, *, valid_until, maximum_size=None,
+                          allowed_content_types=None, allow_overwrite=False):
+    """
+    Client token that lets a browser upload ``pathname`` and nothing else
+    until ``valid_until`` (Unix time in seconds), as @vercel/blob's
+    generateClientTokenFromReadWriteToken makes them: the base64 JSON payload
+    signed with HMAC-SHA256 keyed by the read-write token.
+    """
+    parts = read_write_token.split("_")
+    if len(parts) < 5 or not parts[3]:
+        raise ValueError("Invalid BLOB_READ_WRITE_TOKEN: no store id")
+    claims = {
+        "pathname": pathname,
+        "validUntil": int(valid_until * 1000),
+        "addRandomSuffix": False,
+        "allowOverwrite": allow_overwrite,
+    }
+    if maximum_size is not None:
+        claims["maximumSizeInBytes"] = maximum_size
+    if allowed_content_types:
+        claims["allowedContentTypes"] = list(allowed_content_types)
+    payload = base64.b64encode(json.dumps(claims, separators=(",", ":")).encode()).decode()
+    signature = hmac.new(read_write_token.encode(), payload.encode(), hashlib.sha256).hexdigest()
+    secured = base64.b64encode(f"{signature}.{payload}".encode()).decode()
+    return f"vercel_blob_client_{parts[3]}_{secured}"
+
+
+def blob_api_url(pathname):
+    """URL of the Blob API request that PUTs ``pathname``."""
+    base = os.environ.get("VERCEL_BLOB_API_URL", BLOB_API_URL)
+    return f"{base}?{urllib.parse.urlencode({'pathname': pathname})}"
+
+
+class VercelBlobClient:
+    """vercel.blob.BlobClient plus ``read_range``, which the SDK does not offer."""
+
+    def __init__(self, token=None):
+        from vercel.blob import BlobClient
+        self.token = token or os.environ.get("BLOB_READ_WRITE_TOKEN", "")
+        self._client = BlobClient(token=token)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def generate_client_token(self, pathname, **kwargs):
+        return generate_client_token(self.token, pathname, **kwargs)
+
+    def read_range(self, blob, start, end):
+        """Bytes ``start`` up to ``end`` (exclusive) of ``blob``, a result of ``head()``."""
+        request = urllib.request.Request(blob.url, headers={
+            "Authorization": f"Bearer {self.token}",
+            "Range": f"bytes={start}-{end - 1}",
+        })
+        try:
+            with urllib.request.urlopen(request, timeout=BLOB_READ_TIMEOUT) as response:
+                data = response.read()
+                # 200 instead of 206: the server ignored the Range header
+                return data if response.status == 206 else data[start:end]
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                raise BlobNotFoundError()
+            if e.code == 416:  # range starts past the end
+                return b""
+            raise
+
+
+@dataclass
+class LocalBlob:
+    pathname: str
+    size: int
+    uploaded_at: datetime
+    url: str
+    download_url: str
+    content_type: str = "application/octet-stream"
+    content: bytes = None
+
+
+class LocalBlobClient:
+    """Stand-in for vercel.blob.BlobClient that stores the blobs under ``root``."""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, pathname):
+        path = os.path.abspath(os.path.join(self.root, pathname))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid blob path: {pathname}")
+        return path
+
+    def _blob(self, pathname, content=None):
+        path = self._path(pathname)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            raise BlobNotFoundError()
+        url = f"file://{path}"
+        return LocalBlob(
+            pathname=pathname,
+            size=stat.st_size,
+            uploaded_at=datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc),
+            url=url,
+            download_url=url,
+            content=content,
+        )
+
+    def put(self, path, body, *, access="public", overwrite=False, **kwargs):
+        target = self._path(path)
+        if os.path.exists(target) and not overwrite:
+            raise FileExistsError(f"Blob already exists: {path}")
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Write to a temporary name so a reader never sees a partial blob
+        partial = f"{target}.part"
+        with open(partial, "wb") as f:
+            if isinstance(body, (bytes, bytearray)):
+                f.write(body)
+            elif isinstance(body, str):
+                f.write(body.encode("utf-8"))
+            else:
+                shutil.copyfileobj(body, f)
+        os.replace(partial, target)
+        return self._blob(path)
+
+    def upload_file(self, local_path, path, **kwargs):
+        with open(local_path, "rb") as f:
+            return self.put(path, f, **kwargs)
+
+    def head(self, url_or_path, **kwargs):
+        return self._blob(url_or_path)
+
+    def get(self, url_or_path, *, access="public", **kwargs):
+        try:
+            with open(self._path(url_or_path), "rb") as f:
+                content = f.read()
+        except FileNotFoundError:
+            raise BlobNotFoundError()
+        return self._blob(url_or_path, content=content)
+
+    def read_range(self, blob, start, end):
+        try:
+            with open(self._path(blob.pathname), "rb") as f:
+                f.seek(start)
+                return f.read(max(end - start, 0))
+        except FileNotFoundError:
+            raise BlobNotFoundError()
+
+    def delete(self, url_or_path, **kwargs):
+        paths = [url_or_path] if isinstance(url_or_path, str) else url_or_path
+        for pathname in paths:
+            try:
+                os.remove(self._path(pathname))
+            except FileNotFoundError:
+                pass
+
+    def iter_objects(self, *, prefix=None, **kwargs):
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in sorted(filenames):
+                if filename.endswith(".part"):
+                    continue
+                pathname = os.path.relpath(os.path.join(dirpath, filename), self.root).replace(os.sep, "/")
+                if prefix and not pathname.startswith(prefix):
+                    continue
+                yield self._blob(pathname)
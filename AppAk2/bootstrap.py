@@ -0,0 +1,203 @@
+"""
+Database preparation for fresh serverless instances.
+
+On Vercel the SQLite database lives in /tmp and is empty on every cold
+start. Instead of running every migration there, ``build_sqlite_template``
+produces a fully migrated database file with a stamp of the migrations it
+contains; ``prepare_database`` copies that file into place and only falls
+back to ``migrate`` when the stamp does not match the migrations of the
+deployed code.
+
+The stamp is kept inside the database (STAMP_TABLE) together with the
+number of rows in django_migrations, so it travels with the file: a
+database restored from a backup or copied from another machine carries its
+own stamp or none, and a later ``migrate`` (forwards or back) invalidates
+it. Checking it is one query on a read-only connection, without loading
+the migration graph.
+
+The legacy ``@vercel/python`` build does not run build.sh, so the template
+is committed (build/db_template.sqlite3) and shipped through
+``includeFiles`` in vercel.json. Rebuild it with ``manage.py
+build_sqlite_template`` after adding a migration; the tests fail while it
+is stale.
+"""
+import hashlib
+import os
+import shutil
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connections
+
+STAMP_TABLE = 'appak_schema_stamp'
+# Connection the template is migrated through, so the default one is untouched
+TEMPLATE_ALIAS = 'sqlite_template'
+
+
+def schema_stamp():
+    """
+    Hash of every migration file of the installed apps (Django's own
+    included) and of whether SQLite supports the trigram name index, which
+    migration 0005 only creates when it does. The Django version is left out:
+    requirements.txt does not pin it, so the deployment may install a newer
+    patch release than the one the committed template was built with.
+    """
+    from pegawai.listing import FTS_TRIGRAM_MIN_SQLITE
+
+    digest = hashlib.sha256()
+    digest.update(f'fts-trigram={sqlite3.sqlite_version_info >= FTS_TRIGRAM_MIN_SQLITE}'.encode())
+    for app_config in sorted(apps.get_app_configs(), key=lambda config: config.label):
+        migrations_dir = os.path.join(app_config.path, 'migrations')
+        if not os.path.isdir(migrations_dir):
+            continue
+        for name in sorted(os.listdir(migrations_dir)):
+            if not name.endswith('.py'):
+                continue
+            digest.update(f'{app_config.label}/{name}'.encode())
+            with open(os.path.join(migrations_dir, name), 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+def read_stamp(db_path):
+    """
+    The schema stamp stored in the SQLite database at ``db_path``; None if it
+    has none, or if migrations were applied or unapplied after it was written.
+    """
+    if not os.path.exists(db_path):
+        return None
+    try:
+        conn = sqlite3.connect(f'{Path(db_path).resolve().as_uri()}?mode=ro', uri=True)
+        try:
+            row = conn.execute(
+                f'SELECT schema, applied = (SELECT COUNT(*) FROM django_migrations) FROM {STAMP_TABLE}'
+            ).fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+    return row[0] if row and row[1] else None
+
+
+def write_stamp(db_path, stamp):
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            conn.execute(f'CREATE TABLE IF NOT EXISTS {STAMP_TABLE} (schema TEXT NOT NULL, applied INTEGER NOT NULL)')
+            conn.execute(f'DELETE FROM {STAMP_TABLE}')
+            conn.execute(
+                f'INSERT INTO {STAMP_TABLE} (schema, applied) SELECT ?, COUNT(*) FROM django_migrations', [stamp],
+            )
+    finally:
+        conn.close()
+
+
+def _migrate(database='default'):
+    from django.core.management import call_command
+
+    call_command('migrate', '--run-syncdb', database=database, interactive=False, verbosity=0)
+
+
+def migrations_pending(database='default'):
+    """True when the migration table does not yet record every migration on disk."""
+    from django.db.migrations.executor import MigrationExecutor
+
+    executor = MigrationExecutor(connections[database])
+    return bool(executor.migration_plan(executor.loader.graph.leaf_nodes()))
+
+
+def build_sqlite_template(path):
+    """
+    Create a fully migrated SQLite database at ``path`` and stamp it. The
+    migrations run on a temporary SQLite connection, whatever the default
+    database is.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    # configure_settings fills in the defaults Django expects on every alias
+    connections.settings[TEMPLATE_ALIAS] = connections.configure_settings({
+        'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': tmp_path},
+    })['default']
+    try:
+        _migrate(TEMPLATE_ALIAS)
+    finally:
+        connections[TEMPLATE_ALIAS].close()
+        del connections[TEMPLATE_ALIAS]
+        del connections.settings[TEMPLATE_ALIAS]
+
+    os.replace(tmp_path, path)
+    stamp = schema_stamp()
+    write_stamp(path, stamp)
+    return stamp
+
+
+def prepare_database(database='default'):
+    """
+    Make sure the database is migrated, as cheaply as possible.
+    Returns a short description of what was done.
+    """
+    db_settings = settings.DATABASES[database]
+    if db_settings['ENGINE'] != 'django.db.backends.sqlite3':
+        if not migrations_pending(database):
+            return 'up to date'
+        _migrate(database)
+        return 'migrate'
+
+    db_path = str(db_settings['NAME'])
+    stamp = schema_stamp()
+    if read_stamp(db_path) == stamp:
+        return 'up to date'
+
+    template_path = getattr(settings, 'SQLITE_TEMPLATE_PATH', '')
+    if not os.path.exists(db_path) and template_path and read_stamp(template_path) == stamp:
+        # The copy carries the template's stamp
+        tmp_path = db_path + '.tmp'
+        shutil.copyfile(template_path, tmp_path)
+        os.replace(tmp_path, db_path)
+        return 'template copy'
+
+    if os.path.exists(db_path) and not migrations_pending(database):
+        # Already migrated by an earlier run, just not stamped yet
+        write_stamp(db_path, stamp)
+        return 'up to date'
+
+    _migrate(database)
+    write_stamp(db_path, stamp)
+    return 'migrate'
+
+
+class ColdStartTimer:
+    """Collects named phase durations and writes one summary line to stderr."""
+
+    def __init__(self, started=None):
+        self.started = started if started is not None else time.perf_counter()
+        self._last = self.started
+        self.phases = []
+
+    def mark(self, phase, detail=''):
+        """Record the time since the previous mark as ``phase``."""
+        now = time.perf_counter()
+        self.phases.append((phase, (now - self._last) * 1000, detail))
+        self._last = now
+
+    def add(self, phase, duration_ms, detail=''):
+        """Record a phase that was timed separately (e.g. a request)."""
+        self.phases.append((phase, duration_ms, detail))
+
+    def summary(self, label='cold start'):
+        total = (time.perf_counter() - self.started) * 1000
+        parts = [
+            f"{phase} {duration:.0f}ms" + (f" ({detail})" if detail else '')
+            for phase, duration, detail in self.phases
+        ]
+        return f"[{label}] {', '.join(parts)}; total {total:.0f}ms"
+
+    def report(self, stream=None, label='cold start'):
+        print(self.summary(label), file=stream or sys.stderr, flush=True)
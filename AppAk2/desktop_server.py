@@ -0,0 +1,167 @@
+"""
+WSGI server for the desktop build (desktop_launcher.py).
+
+Requests are handled by a pool of worker threads so a long PDF render does
+not block navigation, and static/media files are answered straight from
+disk by ``StaticFilesApp`` without entering Django. waitress (HTTP/1.1
+keep-alive) is used when it is installed; otherwise a thread-pooled
+``wsgiref`` server from the standard library.
+"""
+import email.utils
+import mimetypes
+import os
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from socketserver import ThreadingMixIn
+from urllib.parse import unquote
+from wsgiref.simple_server import WSGIServer, WSGIRequestHandler, make_server
+from wsgiref.util import FileWrapper
+
+DEFAULT_THREADS = 8
+STATIC_MAX_AGE = 3600
+
+
+class StaticFilesApp:
+    """
+    Serve STATIC_URL (through the staticfiles finders, then STATIC_ROOT) and
+    MEDIA_URL (from MEDIA_ROOT) directly; pass everything else to ``application``.
+    """
+
+    def __init__(self, application):
+        from django.conf import settings
+
+        self.application = application
+        self.static_url = settings.STATIC_URL
+        self.static_root = settings.STATIC_ROOT
+        self.media_url = settings.MEDIA_URL
+        self.media_root = settings.MEDIA_ROOT
+        self._static_paths = {}
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if environ.get('REQUEST_METHOD') in ('GET', 'HEAD'):
+            file_path = None
+            if self.static_url and path.startswith(self.static_url):
+                file_path = self._find_static(path[len(self.static_url):])
+            elif self.media_url and path.startswith(self.media_url):
+                file_path = self._join(self.media_root, path[len(self.media_url):])
+            if file_path:
+                return self._serve(file_path, environ, start_response)
+        return self.application(environ, start_response)
+
+    @staticmethod
+    def _join(root, relative_path):
+        """Resolve ``relative_path`` under ``root``; None if it escapes root or is not a file."""
+        if not root:
+            return None
+        relative_path = posixpath.normpath(unquote(relative_path)).lstrip('/')
+        if relative_path.startswith('..'):
+            return None
+        root = os.path.abspath(root)
+        full_path = os.path.abspath(os.path.join(root, relative_path))
+        if os.path.commonpath([root, full_path]) != root or not os.path.isfile(full_path):
+            return None
+        return full_path
+
+    def _find_static(self, relative_path):
+        # Only files that were found are cached: the set of app static files is
+        # fixed, while arbitrary missing URLs would grow the dict without bound
+        if relative_path in self._static_paths:
+            return self._static_paths[relative_path]
+        from django.contrib.staticfiles import finders
+
+        found = None
+        normalized = posixpath.normpath(unquote(relative_path)).lstrip('/')
+        if not normalized.startswith('..'):
+            found = finders.find(normalized)
+        found = found or self._join(self.static_root, relative_path)
+        if found:
+            self._static_paths[relative_path] = found
+        return found
+
+    def _serve(self, file_path, environ, start_response):
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return self.application(environ, start_response)
+
+        last_modified = email.utils.formatdate(stat.st_mtime, usegmt=True)
+        headers = [
+            ('Last-Modified', last_modified),
+            ('Cache-Control', f'max-age={STATIC_MAX_AGE}'),
+        ]
+        if_modified_since = environ.get('HTTP_IF_MODIFIED_SINCE')
+        if if_modified_since:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                since = None
+            if since is not None and int(stat.st_mtime) <= since:
+                start_response('304 Not Modified', headers)
+                return []
+
+        content_type, encoding = mimetypes.guess_type(file_path)
+        headers += [
+            ('Content-Type', content_type or 'application/octet-stream'),
+            ('Content-Length', str(stat.st_size)),
+        ]
+        if encoding:
+            headers.append(('Content-Encoding', encoding))
+        start_response('200 OK', headers)
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            return []
+        # The server calls close() on the wrapper when the response is done, closing f
+        file_wrapper = environ.get('wsgi.file_wrapper', FileWrapper)
+        return file_wrapper(open(file_path, 'rb'), 64 * 1024)
+
+
+class SilentHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class PooledWSGIServer(ThreadingMixIn, WSGIServer):
+    """wsgiref server that handles each connection on a bounded thread pool."""
+
+    daemon_threads = True
+    threads = DEFAULT_THREADS
+
+    def process_request(self, request, client_address):
+        if not hasattr(self, '_executor'):
+            self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='appak-http')
+        self._executor.submit(self.process_request_thread, request, client_address)
+
+    def server_close(self):
+        super().server_close()
+        executor = getattr(self, '_executor', None)
+        if executor:
+            executor.shutdown(wait=False)
+
+
+def serve(application, host, port, threads=DEFAULT_THREADS, backend='auto', ready_message=None):
+    """
+    Serve ``application`` (wrapped in StaticFilesApp) until interrupted.
+    ``backend`` is 'auto', 'waitress' or 'stdlib'.
+    """
+    application = StaticFilesApp(application)
+
+    if backend in ('auto', 'waitress'):
+        try:
+            from waitress import serve as waitress_serve
+        except ImportError:
+            if backend == 'waitress':
+                raise
+        else:
+            if ready_message:
+                print(ready_message)
+            waitress_serve(application, host=host, port=port, threads=threads, _quiet=True)
+            return
+
+    server_class = type('PooledWSGIServer', (PooledWSGIServer,), {'threads': threads})
+    httpd = make_server(host, port, application, server_class=server_class, handler_class=SilentHandler)
+    if ready_message:
+        print(ready_message)
+    try:
+        httpd.serve_forever()
+    finally:
+        httpd.server_close()
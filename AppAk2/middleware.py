@@ -0,0 +1,148 @@
+"""
+Opt-in per-request instrumentation (REQUEST_TIMING_ENABLED).
+
+For every request ``QueryTimingMiddleware`` records the number of SQL
+queries, the time spent in the database, queries executed more than once
+with the same SQL and parameters, the time spent rendering templates and
+the total time (queries of a streaming response made after the view
+returns are not counted). The numbers are added to the ``Server-Timing`` header
+(visible in the browser's network panel) and logged as one JSON line on
+the "appak.timing" logger; ``manage.py timing_report`` aggregates those
+lines per URL name.
+"""
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('appak.timing')
+
+# Number of duplicated statements written to each log line
+LOGGED_DUPLICATES = 3
+
+_local = threading.local()
+_template_patch_lock = threading.Lock()
+_template_patched = False
+
+
+class RequestStats:
+    """Counters of one request, filled in by the database and template hooks."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_ms = 0.0
+        self.template_ms = 0.0
+        self.statements = Counter()
+        self._template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_ms += (time.perf_counter() - start) * 1000
+            self.queries += 1
+            try:
+                self.statements[(sql, repr(params))] += 1
+            except Exception:
+                self.statements[(sql, None)] += 1
+
+    def repeated_sql(self):
+        """Extra executions of the same SQL with different parameters (the N+1 pattern)."""
+        per_sql = Counter()
+        for (sql, _), count in self.statements.items():
+            per_sql[sql] += count
+        distinct = Counter(sql for sql, _ in self.statements)
+        return sum(per_sql[sql] - 1 for sql, variants in distinct.items() if variants > 1)
+
+    def duplicates(self):
+        """``[(sql, times), ...]`` of statements run more than once, most repeated first."""
+        return [
+            (sql, count) for (sql, _), count in self.statements.most_common() if count > 1
+        ]
+
+
+def _patch_template_render():
+    """Time top-level Template.render calls (included templates are part of their parent)."""
+    global _template_patched
+    with _template_patch_lock:
+        if _template_patched:
+            return
+        from django.template.base import Template
+
+        original_render = Template.render
+
+        def render(self, context):
+            stats = getattr(_local, 'stats', None)
+            if stats is None:
+                return original_render(self, context)
+            stats._template_depth += 1
+            start = time.perf_counter()
+            try:
+                return original_render(self, context)
+            finally:
+                stats._template_depth -= 1
+                if not stats._template_depth:
+                    stats.template_ms += (time.perf_counter() - start) * 1000
+
+        Template.render = render
+        _template_patched = True
+
+
+class QueryTimingMiddleware:
+    """Record query/timing stats per request; removed from the stack unless REQUEST_TIMING_ENABLED."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_TIMING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        _patch_template_render()
+
+    def __call__(self, request):
+        stats = RequestStats()
+        _local.stats = stats
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats))
+                response = self.get_response(request)
+        finally:
+            _local.stats = None
+        total_ms = (time.perf_counter() - start) * 1000
+
+        duplicates = stats.duplicates()
+        timing = (
+            f'db;dur={stats.db_ms:.1f};desc="{stats.queries} queries", '
+            f'tpl;dur={stats.template_ms:.1f}, '
+            f'total;dur={total_ms:.1f}'
+        )
+        if response.has_header('Server-Timing'):
+            timing = f"{response['Server-Timing']}, {timing}"
+        response['Server-Timing'] = timing
+
+        match = getattr(request, 'resolver_match', None)
+        logger.info(json.dumps({
+            'time': round(time.time(), 3),
+            'method': request.method,
+            'path': request.path,
+            'url_name': match.view_name if match else None,
+            'status': response.status_code,
+            'queries': stats.queries,
+            'db_ms': round(stats.db_ms, 2),
+            'duplicate_queries': sum(count - 1 for _, count in duplicates),
+            'repeated_sql': stats.repeated_sql(),
+            'template_ms': round(stats.template_ms, 2),
+            'total_ms': round(total_ms, 2),
+            'duplicates': [
+                {'sql': sql, 'count': count} for sql, count in duplicates[:LOGGED_DUPLICATES]
+            ],
+        }))
+        return response
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 from decouple import config
 
@@ -20,6 +21,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Query count / timing instrumentation, only active with REQUEST_TIMING_ENABLED
+    'AppAk2.middleware.QueryTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -42,6 +45,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'pegawai.context_processors.pdf_jobs',
             ],
         },
     },
@@ -103,6 +107,96 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'mediafiles')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Prebuilt, fully migrated SQLite file copied into /tmp on Vercel cold starts
+# (built by `manage.py build_sqlite_template`, see AppAk2/bootstrap.py)
+SQLITE_TEMPLATE_PATH = config('SQLITE_TEMPLATE_PATH', default=os.path.join(BASE_DIR, 'build', 'db_template.sqlite3'))
+
+# Number of worker processes for bulk PDF generation (0 = one per CPU core)
+PDF_BATCH_WORKERS = config('PDF_BATCH_WORKERS', default=0, cast=int)
+# Most reports a batch ZIP may contain when it is built inside the request
+# (no background jobs, or a client without JavaScript)
+BATCH_SYNC_MAX_REPORTS = config('BATCH_SYNC_MAX_REPORTS', default=30, cast=int)
+
+# Cache of generated report PDFs (see pegawai/pdf_cache.py)
+PDF_CACHE_ENABLED = config('PDF_CACHE_ENABLED', default=True, cast=bool)
+PDF_CACHE_DIR = config('PDF_CACHE_DIR', default=os.path.join(tempfile.gettempdir(), 'appak_pdf_cache'))
+PDF_CACHE_MEMORY_MAX_BYTES = config('PDF_CACHE_MEMORY_MAX_BYTES', default=32 * 1024 * 1024, cast=int)
+PDF_CACHE_DISK_MAX_BYTES = config('PDF_CACHE_DISK_MAX_BYTES', default=256 * 1024 * 1024, cast=int)
+
+# Background PDF jobs (see pegawai/pdf_jobs.py). Off on Vercel: the function
+# is frozen once the 202 is sent and the job files stay in that instance's
+# /tmp, so the PDF is rendered in the request instead.
+PDF_BACKGROUND_JOBS = config('PDF_BACKGROUND_JOBS', default=not os.environ.get('VERCEL'), cast=bool)
+PDF_JOB_WORKERS = config('PDF_JOB_WORKERS', default=2, cast=int)
+PDF_JOB_DIR = config('PDF_JOB_DIR', default=os.path.join(tempfile.gettempdir(), 'appak_pdf_jobs'))
+PDF_JOB_TTL = config('PDF_JOB_TTL', default=3600, cast=int)
+# Seconds after which an unfinished job is reported as failed (batch ZIPs get longer)
+PDF_JOB_TIMEOUT = config('PDF_JOB_TIMEOUT', default=300, cast=int)
+PDF_BATCH_JOB_TIMEOUT = config('PDF_BATCH_JOB_TIMEOUT', default=1800, cast=int)
+
+# Render the report templates once at startup (vercel_app.py; the desktop
+# launcher always does it in the background), see pegawai.utils.warm_up_pdf_renderer
+PDF_WARM_UP = config('PDF_WARM_UP', default=False, cast=bool)
+
+# List views (see pegawai/listing.py): cursor pages ordered by (nama, id)
+# instead of numbered OFFSET pages, optionally with an estimated total, and
+# the FTS5 trigram name search on SQLite
+LIST_KEYSET_PAGINATION = config('LIST_KEYSET_PAGINATION', default=False, cast=bool)
+LIST_APPROXIMATE_COUNT = config('LIST_APPROXIMATE_COUNT', default=False, cast=bool)
+LIST_SEARCH_FTS = config('LIST_SEARCH_FTS', default=True, cast=bool)
+
+# ETag / 304 Not Modified on the list and report pages (pegawai/conditional.py)
+CONDITIONAL_PAGES_ENABLED = config('CONDITIONAL_PAGES_ENABLED', default=True, cast=bool)
+
+# Vercel Blob media storage (AppAk2/storage_backends.py): uploads above the
+# threshold go up as multipart, reads fetch the blob in range requests of this size
+BLOB_MULTIPART_THRESHOLD = config('BLOB_MULTIPART_THRESHOLD', default=5 * 1024 * 1024, cast=int)
+BLOB_READ_CHUNK_SIZE = config('BLOB_READ_CHUNK_SIZE', default=1024 * 1024, cast=int)
+# exists()/size()/open() reuse a blob's metadata for this many seconds instead of
+# a head() round trip (0 = off); BLOB_METADATA_CACHE_ALIAS shares it through a Django cache
+BLOB_METADATA_CACHE_TTL = config('BLOB_METADATA_CACHE_TTL', default=300, cast=int)
+BLOB_METADATA_CACHE_SIZE = config('BLOB_METADATA_CACHE_SIZE', default=1024, cast=int)
+BLOB_METADATA_CACHE_ALIAS = config('BLOB_METADATA_CACHE_ALIAS', default='')
+
+# Certificate files of AK Pendidikan go from the browser straight to storage
+# with a signed, short-lived token (pegawai/direct_upload.py)
+SERTIFIKAT_DIRECT_UPLOAD = config('SERTIFIKAT_DIRECT_UPLOAD', default=False, cast=bool)
+SERTIFIKAT_UPLOAD_MAX_AGE = config('SERTIFIKAT_UPLOAD_MAX_AGE', default=15 * 60, cast=int)
+SERTIFIKAT_MAX_UPLOAD_BYTES = config('SERTIFIKAT_MAX_UPLOAD_BYTES', default=10 * 1024 * 1024, cast=int)
+SERTIFIKAT_UPLOAD_VERIFIER = config('SERTIFIKAT_UPLOAD_VERIFIER', default='')
+
+# Per-request query count and timing (AppAk2/middleware.py). The JSON lines go
+# to REQUEST_TIMING_LOG when set (aggregate with `manage.py timing_report`),
+# otherwise to the console.
+REQUEST_TIMING_ENABLED = config('REQUEST_TIMING_ENABLED', default=False, cast=bool)
+REQUEST_TIMING_LOG = config('REQUEST_TIMING_LOG', default='')
+
+# Per-report PDF phase timings are logged by the "pegawai" logger at INFO
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+        'timing': {
+            'class': 'logging.FileHandler', 'filename': REQUEST_TIMING_LOG, 'formatter': 'message', 'delay': True,
+        } if REQUEST_TIMING_LOG else {'class': 'logging.StreamHandler', 'formatter': 'message'},
+    },
+    'loggers': {
+        'pegawai': {
+            'handlers': ['console'],
+            'level': config('PEGAWAI_LOG_LEVEL', default='WARNING'),
+        },
+        'appak.timing': {
+            'handlers': ['timing'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 CSRF_TRUSTED_ORIGINS = [
     'http://127.0.0.1:8000',
     'http://localhost:8000',
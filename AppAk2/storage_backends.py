@@ -1,40 +1,239 @@
+import hashlib
+import io
 import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.base import File
 from django.core.files.storage import Storage
 from django.utils.deconstruct import deconstructible
-from vercel.blob import BlobClient
+from AppAk2.blob_clients import BLOB_API_VERSION, BlobNotFoundError, blob_api_url, get_blob_client
+
+# Uploads larger than this go up as multipart (parts sent one by one)
+BLOB_MULTIPART_THRESHOLD = 5 * 1024 * 1024
+# Bytes fetched per range request when reading a blob
+BLOB_READ_CHUNK_SIZE = 1024 * 1024
+# Seconds a blob's metadata (or its absence) is trusted without a head() (0 = no cache)
+BLOB_METADATA_CACHE_TTL = 300
+BLOB_METADATA_CACHE_SIZE = 1024
+
+# What the storage needs to know about a blob; picklable for the Django cache
+BlobMeta = namedtuple("BlobMeta", ["pathname", "size", "url"])
+# Cached "no such blob", so exists() on a missing name is not repeated either
+MISSING = BlobMeta(None, None, None)
+
+
+class BlobMetadataCache:
+    """
+    Per-process LRU of blob metadata with a TTL, optionally backed by a
+    Django cache (``cache_alias``) shared between processes. Entries are set
+    when the storage saves a blob and dropped when it deletes one.
+    """
+
+    def __init__(self, ttl, max_entries, cache_alias=""):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.shared = caches[cache_alias] if cache_alias else None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _shared_key(name):
+        return "blobmeta:" + hashlib.md5(name.encode("utf-8"), usedforsecurity=False).hexdigest()
+
+    def get(self, name):
+        """The cached BlobMeta (possibly MISSING) of ``name``, or None."""
+        if self.ttl <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                expires, meta = entry
+                if expires > time.monotonic():
+                    self._entries.move_to_end(name)
+                    self.hits += 1
+                    return meta
+                del self._entries[name]
+        meta = self.shared.get(self._shared_key(name)) if self.shared is not None else None
+        if meta is not None:
+            meta = BlobMeta(*meta)
+            self._remember(name, meta)
+            with self._lock:
+                self.hits += 1
+            return meta
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, name, meta):
+        if self.ttl <= 0:
+            return
+        self._remember(name, meta)
+        if self.shared is not None:
+            self.shared.set(self._shared_key(name), tuple(meta), self.ttl)
+
+    def invalidate(self, name):
+        with self._lock:
+            self._entries.pop(name, None)
+        if self.shared is not None:
+            self.shared.delete(self._shared_key(name))
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def _remember(self, name, meta):
+        with self._lock:
+            self._entries.pop(name, None)
+            self._entries[name] = (time.monotonic() + self.ttl, meta)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class BlobRangeReader(io.RawIOBase):
+    """
+    Seekable read-only stream over a blob that fetches the bytes it is asked
+    for with range requests, so nothing is downloaded until it is read and a
+    seek skips the bytes before it.
+    """
+
+    def __init__(self, client, blob):
+        self.client = client
+        self.blob = blob
+        self.size = blob.size
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError("negative seek position")
+        self.position = offset
+        return self.position
+
+    def readinto(self, buffer):
+        end = min(self.position + len(buffer), self.size)
+        if end <= self.position:
+            return 0
+        data = self.client.read_range(self.blob, self.position, end)
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
 
 
 @deconstructible
 class VercelBlobStorage(Storage):
-    def __init__(self):
-        self.client = BlobClient()
+    def __init__(self, client=None):
+        # Any object with the blob client interface of AppAk2.blob_clients
+        self.client = client or get_blob_client()
         self.store_id = os.environ.get("BLOB_STORE_ID", "")
+        self.multipart_threshold = getattr(settings, "BLOB_MULTIPART_THRESHOLD", BLOB_MULTIPART_THRESHOLD)
+        self.read_chunk_size = getattr(settings, "BLOB_READ_CHUNK_SIZE", BLOB_READ_CHUNK_SIZE)
+        self.metadata_cache = BlobMetadataCache(
+            getattr(settings, "BLOB_METADATA_CACHE_TTL", BLOB_METADATA_CACHE_TTL),
+            getattr(settings, "BLOB_METADATA_CACHE_SIZE", BLOB_METADATA_CACHE_SIZE),
+            getattr(settings, "BLOB_METADATA_CACHE_ALIAS", ""),
+        )
+
+    def _meta(self, name):
+        """BlobMeta of ``name`` (MISSING if there is no such blob), from the cache or a head()."""
+        meta = self.metadata_cache.get(name)
+        if meta is None:
+            try:
+                result = self.client.head(name)
+                meta = BlobMeta(result.pathname, result.size, result.url)
+            except BlobNotFoundError:
+                meta = MISSING
+            self.metadata_cache.set(name, meta)
+        return meta
+
+    def verified_size(self, name):
+        """
+        Size of ``name`` as the store reports it now (None if there is no
+        such blob), bypassing the metadata cache. An absence is not cached:
+        a direct upload of the name may still be in flight.
+        """
+        self.metadata_cache.invalidate(name)
+        try:
+            result = self.client.head(name)
+        except BlobNotFoundError:
+            return None
+        self.metadata_cache.set(name, BlobMeta(result.pathname, result.size, result.url))
+        return result.size
 
     def _save(self, name, content):
         content.seek(0)
-        self.client.put(name, content.read(), access="private", overwrite=True)
+        # The client reads the file in chunks; it is never loaded whole
+        result = self.client.put(
+            name, content, access="private", overwrite=True,
+            multipart=content.size > self.multipart_threshold,
+        )
+        self.metadata_cache.set(name, BlobMeta(name, content.size, result.url))
         return name
 
+    @property
+    def supports_direct_upload(self):
+        # The local stand-in client cannot issue client tokens
+        return hasattr(self.client, "generate_client_token")
+
+    def direct_upload_target(self, name, claims, max_age):
+        """
+        Request with which the browser uploads ``name`` to the Blob API itself
+        (pegawai.direct_upload): a client token limited to that pathname, the
+        announced size and ``max_age`` seconds, so the bytes never pass
+        through Django and its request body limit.
+        """
+        token = self.client.generate_client_token(
+            name, valid_until=time.time() + max_age, maximum_size=claims["size"],
+            allowed_content_types=[claims["type"]] if claims["type"] else None,
+        )
+        headers = {
+            "authorization": f"Bearer {token}",
+            "x-api-version": BLOB_API_VERSION,
+            "x-vercel-blob-access": "private",
+            "x-add-random-suffix": "0",
+            "x-allow-overwrite": "0",
+        }
+        if claims["type"]:
+            headers["x-content-type"] = claims["type"]
+        return {"url": blob_api_url(name), "method": "PUT", "headers": headers}
+
     def url(self, name):
         return f"https://{self.store_id}.private.blob.vercel-storage.com/{name}"
 
     def exists(self, name):
-        from vercel.blob.errors import BlobNotFoundError
-        try:
-            self.client.head(name)
-            return True
-        except BlobNotFoundError:
-            return False
+        return self._meta(name) != MISSING
 
     def delete(self, name):
         self.client.delete(name)
+        self.metadata_cache.invalidate(name)
 
     def _open(self, name, mode="rb"):
-        from django.core.files.base import ContentFile
-        result = self.client.get(name, access="private")
-        data = b"".join(result.stream) if result else b""
-        return ContentFile(data, name=name)
+        if "w" in mode or "a" in mode or "+" in mode:
+            raise ValueError("VercelBlobStorage files can only be opened for reading")
+        blob = self._meta(name)
+        if blob == MISSING:
+            raise BlobNotFoundError()
+        reader = io.BufferedReader(BlobRangeReader(self.client, blob), buffer_size=self.read_chunk_size)
+        return File(reader, name=name)
 
     def size(self, name):
-        result = self.client.head(name)
-        return result.size
+        meta = self._meta(name)
+        if meta == MISSING:
+            raise BlobNotFoundError()
+        return meta.size
@@ -7,6 +7,11 @@ pip install -r requirements.txt
 # Run Django migrations
 python manage.py migrate --no-input
 
+# Prebuilt SQLite database copied to /tmp on cold starts instead of migrating.
+# The Vercel deployment ships the committed build/db_template.sqlite3 (see
+# includeFiles in vercel.json); this refreshes it for other deployments.
+python manage.py build_sqlite_template
+
 # Collect static files
 python manage.py collectstatic --no-input
 
@@ -1,12 +1,15 @@
+import time
+_LAUNCH_START = time.perf_counter()
+
 import os
 import sys
 import hmac
 import uuid
-import time
 import hashlib
+import datetime
 import threading
+import multiprocessing
 import webbrowser
-from wsgiref.simple_server import make_server, WSGIRequestHandler
 
 if getattr(sys, 'frozen', False):
     BASE_DIR = os.path.dirname(sys.executable)
@@ -14,9 +17,23 @@ else:
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 PORT = 8000
+# Worker threads of the local web server; a PDF render occupies one of them
+SERVER_THREADS = int(os.environ.get("APPAK_SERVER_THREADS", "8"))
+# "auto" (waitress if installed, else the stdlib pool), "waitress" or "stdlib"
+SERVER_BACKEND = os.environ.get("APPAK_SERVER", "auto")
 URL = f"http://127.0.0.1:{PORT}/pegawai/"
 HWID_URL = f"http://127.0.0.1:{PORT}/hwid/"
 LICENSE_FILE = os.path.join(BASE_DIR, "license.key")
+# Startup profiling: set APPAK_PROFILE_STARTUP=1 or pass --profile-startup
+PROFILE_STARTUP = "--profile-startup" in sys.argv or os.environ.get("APPAK_PROFILE_STARTUP") == "1"
+PROFILE_FILE = os.path.join(BASE_DIR, "startup_profile.log")
+# Modules kept off the startup path (loaded by the PDF warm-up or the first PDF request)
+PDF_MODULES = ("xhtml2pdf", "reportlab")
+# Load the PDF renderer in the background when the first report page is
+# opened, so it is ready by the time its PDF is requested without slowing
+# startup ("startup": right after startup instead, "0": never)
+PDF_WARM_UP = os.environ.get("APPAK_PDF_WARMUP", "report")
+REPORT_PAGES = ("/pegawai/konversi/", "/pegawai/akumulasi/", "/pegawai/penetapan/", "/pegawai/batch_reports/")
 SECRET = b"AppAK-LicenseSecret-2026"
 
 
@@ -38,18 +55,16 @@ def is_licensed():
         return False
 
 
-class SilentHandler(WSGIRequestHandler):
-    def log_message(self, format, *args):
-        pass
-
-
-def setup_django():
+def setup_django(timer=None):
     sys.path.insert(0, BASE_DIR)
     os.environ.setdefault("DJANGO_SETTINGS_MODULE", "AppAk2.settings")
 
     import django
     from django.conf import settings
 
+    if timer:
+        timer.mark("import django")
+
     if not settings.configured:
         django.setup()
 
@@ -64,23 +79,112 @@ def setup_django():
     _conn.commit()
     _conn.close()
 
-    from django.core.management import call_command
-    call_command("migrate", "--run-syncdb", verbosity=0)
+    if timer:
+        timer.mark("django.setup")
+
+    # Only migrates when the database is behind the bundled migrations
+    from AppAk2.bootstrap import prepare_database
+    result = prepare_database()
+    if timer:
+        timer.mark("migrate check", result)
+
+
+def _pdf_modules_loaded():
+    return sorted({name.split(".")[0] for name in sys.modules if name.split(".")[0] in PDF_MODULES})
+
+
+def _write_profile(timer):
+    loaded = _pdf_modules_loaded()
+    line = (
+        f"{datetime.datetime.now():%Y-%m-%d %H:%M:%S} {timer.summary('startup')}; "
+        f"{len(sys.modules)} modules; PDF libraries loaded: {', '.join(loaded) or 'no'}"
+    )
+    print(line)
+    try:
+        with open(PROFILE_FILE, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    except OSError:
+        pass
+
+
+def _profile_first_request(application, timer):
+    """Wrap the WSGI app so the first request is timed and the profile written."""
+    lock = threading.Lock()
+    pending = [True]
+
+    def profiled(environ, start_response):
+        with lock:
+            first = pending and pending.pop()
+        if not first:
+            return application(environ, start_response)
+        start = time.perf_counter()
+        result = application(environ, start_response)
+        timer.add("first request", (time.perf_counter() - start) * 1000, environ.get("PATH_INFO", ""))
+        _write_profile(timer)
+        return result
+
+    return profiled
+
+
+def warm_up_pdf(timer=None):
+    from pegawai.utils import warm_up_pdf_renderer
+    duration = warm_up_pdf_renderer()
+    if timer:
+        timer.add("pdf warm-up", duration)
+
+
+def start_pdf_warm_up(timer=None):
+    threading.Thread(target=warm_up_pdf, args=(timer,), daemon=True).start()
+
+
+def _warm_up_on_report_page(application, timer):
+    """Wrap the WSGI app so the first report page request starts the PDF warm-up."""
+    lock = threading.Lock()
+    pending = [True]
+
+    def warming(environ, start_response):
+        if pending and environ.get("PATH_INFO", "").startswith(REPORT_PAGES):
+            with lock:
+                first = pending and pending.pop()
+            if first:
+                start_pdf_warm_up(timer)
+        return application(environ, start_response)
+
+    return warming
 
 
-def run_server():
+def run_server(timer=None):
     from django.core.wsgi import get_wsgi_application
+    from AppAk2.desktop_server import serve
     application = get_wsgi_application()
-    httpd = make_server("127.0.0.1", PORT, application, handler_class=SilentHandler)
-    print(f"AppAK berjalan di {URL}")
-    httpd.serve_forever()
+    if PDF_WARM_UP == "report":
+        application = _warm_up_on_report_page(application, timer)
+    if timer:
+        timer.mark("wsgi app")
+        application = _profile_first_request(application, timer)
+    serve(
+        application, "127.0.0.1", PORT,
+        threads=SERVER_THREADS,
+        backend=SERVER_BACKEND,
+        ready_message=f"AppAK berjalan di {URL}",
+    )
 
 
 if __name__ == "__main__":
-    setup_django()
+    # Required for the PDF process pool in the frozen (PyInstaller) build
+    multiprocessing.freeze_support()
+    timer = None
+    if PROFILE_STARTUP:
+        sys.path.insert(0, BASE_DIR)
+        from AppAk2.bootstrap import ColdStartTimer
+        timer = ColdStartTimer(_LAUNCH_START)
+        timer.mark("imports")
+    setup_django(timer)
     start_url = URL if is_licensed() else HWID_URL
     threading.Thread(
         target=lambda: (time.sleep(1.5), webbrowser.open(start_url)),
         daemon=True
     ).start()
-    run_server()
+    if PDF_WARM_UP == "startup":
+        start_pdf_warm_up(timer)
+    run_server(timer)
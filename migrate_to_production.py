@@ -2,17 +2,37 @@
 Script migrasi: SQLite lokal -> PostgreSQL (Supabase) + file -> Vercel Blob
 
 Jalankan dari root project:
-    python migrate_to_production.py
+    python migrate_to_production.py [--dry-run] [--workers 8] [--batch-size 2000]
 
 Pastikan .env sudah berisi:
     DB_NAME, DB_USER, DB_PASSWORD, DB_HOST  -> Supabase credentials
     BLOB_READ_WRITE_TOKEN                   -> dari Vercel dashboard
     BLOB_STORE_ID                           -> dari Vercel dashboard
+
+Dengan BLOB_LOCAL_ROOT file diunggah ke folder lokal itu (AppAk2/blob_clients.py),
+untuk mencoba migrasi tanpa token Vercel.
+
+File diunggah paralel dan dilewati bila ukuran dan hash-nya sama dengan
+unggahan sebelumnya. Tabel disalin per batch (COPY + INSERT ... ON CONFLICT
+di PostgreSQL, bulk_create upsert di database lain). Progres disimpan di file
+checkpoint, sehingga migrasi yang terhenti dilanjutkan dari titik terakhir
+bila dijalankan lagi. Setelah semua tabel selesai, posisi tabel di checkpoint
+dihapus: migrasi berikutnya menyalin (upsert) semua baris lagi, jadi baris
+yang diubah sesudahnya ikut terkirim. --restart mengabaikan checkpoint sama
+sekali, termasuk daftar file yang sudah diunggah.
 """
 
+import argparse
+import hashlib
+import io
+import json
 import os
 import sys
 import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import django
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "AppAk2.settings")
@@ -21,93 +41,351 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from dotenv import load_dotenv
 load_dotenv()
 
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CHECKPOINT = os.path.join(BASE_DIR, ".migrate_checkpoint.json")
+UPLOAD_WORKERS = 8
+DATA_BATCH_SIZE = 2000
+HASH_CHUNK_SIZE = 1024 * 1024
 
-def upload_files_to_blob():
-    token = os.environ.get("BLOB_READ_WRITE_TOKEN")
-    if not token:
-        print("SKIP upload: BLOB_READ_WRITE_TOKEN tidak ditemukan")
-        return
+TABLES = [
+    ("pegawai_instansi",       "Instansi"),
+    ("pegawai_pegawai",        "Pegawai"),
+    ("pegawai_penilai",        "Penilai"),
+    ("pegawai_angkaintegrasi", "AngkaIntegrasi"),
+    ("pegawai_ak",             "AK"),
+    ("pegawai_akpendidikan",   "AkPendidikan"),
+]
 
-    from vercel.blob import BlobClient
-    client = BlobClient()
 
-    media_root = os.path.join(os.path.dirname(__file__), "mediafiles")
-    uploaded = 0
+class Checkpoint:
+    """
+    Progres migrasi dalam file JSON:
+        files:  blob_name -> {size, mtime_ns, sha256} dari unggahan yang berhasil
+        tables: nama tabel -> id terakhir yang sudah disalin oleh migrasi
+                yang belum selesai (dikosongkan setelah migrasi data selesai)
+    Ditulis ulang secara atomik setiap ada kemajuan.
+    """
+
+    def __init__(self, path, restart=False, dry_run=False):
+        self.path = path
+        self.dry_run = dry_run
+        self.lock = threading.Lock()
+        self.data = {"files": {}, "tables": {}}
+        if os.path.exists(path) and not restart:
+            with open(path, encoding="utf-8") as f:
+                self.data.update(json.load(f))
+
+    def file(self, blob_name):
+        return self.data["files"].get(blob_name)
+
+    def set_file(self, blob_name, info):
+        with self.lock:
+            self.data["files"][blob_name] = info
+            self._save()
+
+    def last_id(self, table_name):
+        return self.data["tables"].get(table_name, 0)
+
+    def set_last_id(self, table_name, last_id):
+        with self.lock:
+            self.data["tables"][table_name] = last_id
+            self._save()
+
+    def clear_tables(self):
+        with self.lock:
+            self.data["tables"] = {}
+            self._save()
+
+    def _save(self):
+        if self.dry_run:
+            return
+        partial = f"{self.path}.tmp"
+        with open(partial, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=1, sort_keys=True)
+        os.replace(partial, self.path)
 
-    for dirpath, _, filenames in os.walk(media_root):
-        for filename in filenames:
-            filepath = os.path.join(dirpath, filename)
-            blob_name = os.path.relpath(filepath, media_root).replace("\\", "/")
 
-            with open(filepath, "rb") as f:
-                try:
-                    client.put(blob_name, f.read(), access="private", overwrite=True)
-                    print(f"  OK {blob_name}")
-                    uploaded += 1
-                except Exception as e:
-                    print(f"  FAIL {blob_name}: {e}")
+class Progress:
+    """Mencetak jumlah selesai, kecepatan dan perkiraan sisa waktu (ETA), paling sering sekali per detik."""
 
-    print(f"Upload selesai: {uploaded} file")
+    def __init__(self, label, total, unit="item"):
+        self.label = label
+        self.total = total
+        self.unit = unit
+        self.done = 0
+        self.start = self.last_print = time.monotonic()
+        self.lock = threading.Lock()
 
+    def advance(self, amount=1):
+        with self.lock:
+            self.done += amount
+            now = time.monotonic()
+            if now - self.last_print >= 1 or self.done >= self.total:
+                self.last_print = now
+                self._print(now)
 
-def migrate_data():
-    required = ["DB_NAME", "DB_USER", "DB_PASSWORD", "DB_HOST"]
-    missing = [k for k in required if not os.environ.get(k)]
-    if missing:
-        print(f"SKIP migrasi data: env vars tidak lengkap: {missing}")
+    def _print(self, now):
+        elapsed = max(now - self.start, 1e-6)
+        rate = self.done / elapsed
+        remaining = (self.total - self.done) / rate if rate else 0
+        print(
+            f"  {self.label}: {self.done}/{self.total} {self.unit} "
+            f"({rate:.1f}/s, ETA {_format_seconds(remaining)})",
+            flush=True,
+        )
+
+
+def _format_seconds(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+
+def _file_info(filepath, previous):
+    """Ukuran, mtime dan sha256 file; hash lama dipakai lagi bila ukuran dan mtime tidak berubah."""
+    stat = os.stat(filepath)
+    info = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if previous and previous.get("size") == info["size"] and previous.get("mtime_ns") == info["mtime_ns"]:
+        info["sha256"] = previous["sha256"]
+        return info
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    info["sha256"] = digest.hexdigest()
+    return info
+
+
+def upload_files_to_blob(checkpoint, workers=UPLOAD_WORKERS, dry_run=False, media_root=None):
+    if not (os.environ.get("BLOB_READ_WRITE_TOKEN") or os.environ.get("BLOB_LOCAL_ROOT")):
+        print("SKIP upload: BLOB_READ_WRITE_TOKEN tidak ditemukan")
         return
 
-    django.setup()
+    from AppAk2.blob_clients import get_blob_client
+    client = get_blob_client()
 
-    sqlite_path = os.path.join(os.path.dirname(__file__), "db.sqlite3")
-    if not os.path.exists(sqlite_path):
-        print("SKIP migrasi data: db.sqlite3 tidak ditemukan")
+    media_root = media_root or os.path.join(BASE_DIR, "mediafiles")
+    files = []
+    for dirpath, _, filenames in os.walk(media_root):
+        for filename in sorted(filenames):
+            filepath = os.path.join(dirpath, filename)
+            files.append((filepath, os.path.relpath(filepath, media_root).replace("\\", "/")))
+
+    # Satu listing untuk ukuran semua blob, bukan satu HEAD per file
+    remote_sizes = {blob.pathname: blob.size for blob in client.iter_objects()}
+
+    pending = []
+    skipped = 0
+    for filepath, blob_name in files:
+        previous = checkpoint.file(blob_name)
+        info = _file_info(filepath, previous)
+        unchanged = (
+            previous is not None
+            and previous.get("sha256") == info["sha256"]
+            and remote_sizes.get(blob_name) == info["size"]
+        )
+        if unchanged:
+            skipped += 1
+        else:
+            pending.append((filepath, blob_name, info))
+
+    total_bytes = sum(info["size"] for _, _, info in pending)
+    print(f"{len(files)} file, {skipped} tidak berubah, {len(pending)} perlu diunggah ({total_bytes / 1024 / 1024:.1f} MB)")
+    if dry_run:
+        for _, blob_name, info in pending:
+            print(f"  [dry-run] {blob_name} ({info['size']} byte)")
+        return
+    if not pending:
         return
 
-    conn = sqlite3.connect(sqlite_path)
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
+    def upload(filepath, blob_name, info):
+        # upload_file membaca dari file (multipart untuk file besar), tidak memuat semuanya ke memori
+        client.upload_file(filepath, blob_name, access="private", overwrite=True)
+        checkpoint.set_file(blob_name, info)
+        return blob_name
+
+    progress = Progress("upload", len(pending), "file")
+    uploaded = failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(upload, *item): item[1] for item in pending}
+        for future in as_completed(futures):
+            try:
+                future.result()
+                uploaded += 1
+            except Exception as e:
+                failed += 1
+                print(f"  FAIL {futures[future]}: {e}")
+            progress.advance()
 
-    from pegawai.models import Instansi, Pegawai, Penilai, AngkaIntegrasi, AK, AkPendidikan
+    print(f"Upload selesai: {uploaded} file diunggah, {skipped} dilewati, {failed} gagal")
 
-    tables = [
-        ("pegawai_instansi",       Instansi),
-        ("pegawai_pegawai",        Pegawai),
-        ("pegawai_penilai",        Penilai),
-        ("pegawai_angkaintegrasi", AngkaIntegrasi),
-        ("pegawai_ak",             AK),
-        ("pegawai_akpendidikan",   AkPendidikan),
-    ]
 
-    for table_name, Model in tables:
-        cur.execute(f"SELECT * FROM {table_name}")
+def _source_rows(cur, table_name, columns, after_id, batch_size):
+    """Baris tabel SQLite dengan id > after_id, per batch, urut id."""
+    available = {row[1] for row in cur.execute(f"PRAGMA table_info({table_name})")}
+    selected = [column for column in columns if column in available]
+    while True:
+        cur.execute(
+            f"SELECT {', '.join(selected)} FROM {table_name} WHERE id > ? ORDER BY id LIMIT ?",
+            (after_id, batch_size),
+        )
         rows = cur.fetchall()
         if not rows:
-            print(f"  - {table_name}: kosong, skip")
+            return
+        yield [dict(zip(selected, row)) for row in rows]
+        after_id = rows[-1][0]
+
+
+def _fill_missing(Model, row):
+    """Nilai untuk kolom yang belum ada di database sumber yang lebih lama (mis. updated_at)."""
+    from django.utils import timezone
+    for field in Model._meta.concrete_fields:
+        if field.column in row:
             continue
+        if getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False):
+            row[field.column] = timezone.now()
+        else:
+            row[field.column] = field.get_default()
+    return row
+
+
+def _copy_text(value):
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return (
+        str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+    )
+
+
+def _copy_upsert(connection, Model, columns, rows):
+    """
+    Upsert lewat COPY ke tabel sementara lalu satu INSERT ... ON CONFLICT:
+    jauh lebih cepat daripada INSERT per baris melalui koneksi jarak jauh.
+    """
+    quote = connection.ops.quote_name
+    table = quote(Model._meta.db_table)
+    staging = quote(f"{Model._meta.db_table}_staging")
+    column_list = ", ".join(quote(column) for column in columns)
+    updates = ", ".join(f"{quote(column)} = EXCLUDED.{quote(column)}" for column in columns if column != "id")
+    data = "".join("\t".join(_copy_text(row[column]) for column in columns) + "\n" for row in rows)
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"CREATE TEMP TABLE IF NOT EXISTS {staging} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP")
+        copy_sql = f"COPY {staging} ({column_list}) FROM STDIN"
+        raw = cursor.cursor
+        if hasattr(raw, "copy_expert"):  # psycopg2
+            raw.copy_expert(copy_sql, io.StringIO(data))
+        else:  # psycopg 3
+            with raw.copy(copy_sql) as copy:
+                copy.write(data)
+        cursor.execute(
+            f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {staging} "
+            f"ON CONFLICT (id) DO UPDATE SET {updates}"
+        )
 
-        created = skipped = 0
-        for row in rows:
-            data = dict(row)
-            pk = data.pop("id")
-            try:
-                _, is_new = Model.objects.update_or_create(pk=pk, defaults=data)
-                if is_new:
-                    created += 1
-                else:
-                    skipped += 1
-            except Exception as e:
-                print(f"  FAIL {table_name} id={pk}: {e}")
 
-        print(f"  OK {table_name}: {created} baru, {skipped} sudah ada")
+def _bulk_upsert(Model, columns, rows, batch_size):
+    attnames = {field.column: field.attname for field in Model._meta.concrete_fields}
+    Model.objects.bulk_create(
+        [Model(**{attnames[column]: row[column] for column in columns}) for row in rows],
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=["id"],
+        update_fields=[field.name for field in Model._meta.concrete_fields if not field.primary_key],
+    )
 
-    conn.close()
+
+def migrate_data(checkpoint, sqlite_path, batch_size=DATA_BATCH_SIZE, dry_run=False):
+    from django.apps import apps
+    from django.core.management.color import no_style
+    from django.db import connection, transaction
+    from pegawai.credit_summary import rebuild_credit_summaries
+
+    conn = sqlite3.connect(f"file:{sqlite_path}?mode=ro", uri=True)
+    cur = conn.cursor()
+    use_copy = connection.vendor == "postgresql"
+    migrated_models = []
+
+    try:
+        for table_name, model_name in TABLES:
+            Model = apps.get_model("pegawai", model_name)
+            columns = [field.column for field in Model._meta.concrete_fields]
+            after_id = checkpoint.last_id(table_name)
+            cur.execute(f"SELECT COUNT(*) FROM {table_name} WHERE id > ?", (after_id,))
+            remaining = cur.fetchone()[0]
+            if not remaining:
+                print(f"  - {table_name}: sudah tersalin, skip")
+                continue
+            if dry_run:
+                print(f"  [dry-run] {table_name}: {remaining} baris akan disalin (setelah id {after_id})")
+                continue
+
+            progress = Progress(table_name, remaining, "baris")
+            for rows in _source_rows(cur, table_name, columns, after_id, batch_size):
+                rows = [_fill_missing(Model, row) for row in rows]
+                # Satu transaksi per batch; checkpoint baru maju setelah batch tersimpan
+                with transaction.atomic():
+                    if use_copy:
+                        _copy_upsert(connection, Model, columns, rows)
+                    else:
+                        _bulk_upsert(Model, columns, rows, batch_size)
+                checkpoint.set_last_id(table_name, rows[-1]["id"])
+                progress.advance(len(rows))
+            migrated_models.append(Model)
+            print(f"  OK {table_name}: {remaining} baris")
+    finally:
+        conn.close()
+
+    if dry_run:
+        return
+
+    if migrated_models:
+        # id disalin apa adanya, jadi sequence PostgreSQL harus dimajukan
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), migrated_models):
+                cursor.execute(sql)
+        # Penulisan bulk tidak memicu signal, jadi ringkasan angka kredit dibangun ulang
+        rebuild_credit_summaries()
+    # Checkpoint tabel hanya untuk melanjutkan migrasi yang terhenti; migrasi
+    # berikutnya menyalin semua baris lagi agar perubahan ikut terkirim
+    checkpoint.clear_tables()
     print("Migrasi data selesai")
 
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migrasi SQLite lokal + mediafiles ke produksi")
+    parser.add_argument("--dry-run", action="store_true", help="Hanya tampilkan apa yang akan diunggah/disalin")
+    parser.add_argument("--workers", type=int, default=UPLOAD_WORKERS, help="Jumlah unggahan paralel")
+    parser.add_argument("--batch-size", type=int, default=DATA_BATCH_SIZE, help="Baris per batch upsert")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="File checkpoint")
+    parser.add_argument("--restart", action="store_true", help="Abaikan checkpoint dan mulai dari awal")
+    parser.add_argument("--sqlite", default=os.path.join(BASE_DIR, "db.sqlite3"), help="Database SQLite sumber")
+    parser.add_argument("--skip-files", action="store_true", help="Lewati upload file")
+    parser.add_argument("--skip-data", action="store_true", help="Lewati migrasi data")
+    args = parser.parse_args(argv)
+
+    checkpoint = Checkpoint(args.checkpoint, restart=args.restart, dry_run=args.dry_run)
+
+    if not args.skip_files:
+        print("=== Upload file ke Vercel Blob ===")
+        upload_files_to_blob(checkpoint, workers=args.workers, dry_run=args.dry_run)
+        print()
+
+    if not args.skip_data:
+        print("=== Migrasi data SQLite -> PostgreSQL ===")
+        required = ["DB_NAME", "DB_USER", "DB_PASSWORD", "DB_HOST"]
+        missing = [k for k in required if not os.environ.get(k)]
+        if missing:
+            print(f"SKIP migrasi data: env vars tidak lengkap: {missing}")
+            return
+        if not os.path.exists(args.sqlite):
+            print(f"SKIP migrasi data: {args.sqlite} tidak ditemukan")
+            return
+        django.setup()
+        migrate_data(checkpoint, args.sqlite, batch_size=args.batch_size, dry_run=args.dry_run)
+
+
 if __name__ == "__main__":
-    print("=== Upload file ke Vercel Blob ===")
-    upload_files_to_blob()
-    print()
-    print("=== Migrasi data SQLite -> PostgreSQL ===")
-    migrate_data()
+    main()
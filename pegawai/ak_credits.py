@@ -0,0 +1,151 @@
+"""
+Bulk recalculation of the derived AK fields (prosentase, koefisien,
+jumlah_angka_kredit) with NumPy, for when PENILAIAN_TO_PROSENTASE or
+JENJANG_TO_KOEFISIEN change.
+
+``month_counts`` reproduces the month rule of views._calculate_ak_fields
+(``relativedelta`` whole months, plus one for a remaining partial month,
+at least one month for a valid period) on whole arrays of dates, and the
+credit formula is evaluated in the same order so the results are
+bit-for-bit those of the per-instance code.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .constants import PENILAIAN_TO_PROSENTASE, JENJANG_TO_KOEFISIEN
+from .credit_summary import rebuild_credit_summaries
+from .models import AK
+from .pdf_cache import get_pdf_cache
+
+RECALCULATE_CHUNK_SIZE = 2000
+RECALCULATED_FIELDS = ['prosentase', 'koefisien', 'jumlah_angka_kredit']
+AK_VALUE_FIELDS = ['pk', 'pegawai_id', 'penilaian', 'jenjang', 'tanggal_awal_penilaian', 'tanggal_akhir_penilaian',
+                   *RECALCULATED_FIELDS]
+
+
+def _add_months(np, years, months, days, offset):
+    """``date + relativedelta(months=offset)`` for arrays of year/month/day components."""
+    total = years * 12 + (months - 1) + offset
+    month_start = (total - 1970 * 12).astype('datetime64[M]')
+    days_in_month = ((month_start + 1).astype('datetime64[D]') - month_start.astype('datetime64[D]')).astype(int)
+    return month_start.astype('datetime64[D]') + (np.minimum(days, days_in_month) - 1)
+
+
+def month_counts(start, end):
+    """
+    Month count of each period, as _calculate_ak_fields computes it.
+    ``start`` and ``end`` are datetime64[D] arrays; NaT gives 0.
+    """
+    import numpy as np
+
+    valid = ~(np.isnat(start) | np.isnat(end))
+    start = np.where(valid, start, np.datetime64('2000-01-01'))
+    end = np.where(valid, end, np.datetime64('2000-01-01'))
+
+    start_months = start.astype('datetime64[M]')
+    start_years = start_months.astype(int) // 12 + 1970
+    start_month = start_months.astype(int) % 12 + 1
+    start_day = (start - start_months.astype('datetime64[D]')).astype(int) + 1
+    months = end.astype('datetime64[M]').astype(int) - start_months.astype(int)
+
+    # relativedelta(end, start): step the month count back (or forward, for a
+    # period that ends before it starts) until start + months does not pass end
+    shifted = _add_months(np, start_years, start_month, start_day, months)
+    forward = end >= start
+    months = months - (forward & (shifted > end)) + (~forward & (shifted < end))
+    shifted = _add_months(np, start_years, start_month, start_day, months)
+    remaining_days = (end - shifted).astype(int)
+
+    counts = months + (remaining_days > 0)
+    counts = np.where((counts == 0) & (start < end), 1, counts)
+    return np.where(valid, counts, 0)
+
+
+def _lookup(np, values, mapping, default, dtype):
+    """Map an object array through ``mapping`` once per distinct value."""
+    distinct, inverse = np.unique(values.astype(str), return_inverse=True)
+    mapped = np.array([mapping.get(value, default) for value in distinct], dtype=dtype)
+    return mapped[inverse]
+
+
+def compute_ak_credits(penilaian, jenjang, start, end):
+    """
+    Vectorised _calculate_ak_fields: returns ``(prosentase, koefisien,
+    jumlah_angka_kredit)`` arrays for arrays of penilaian, jenjang and
+    period start/end dates.
+    """
+    import numpy as np
+
+    prosentase = _lookup(np, penilaian, PENILAIAN_TO_PROSENTASE, 0, np.int64)
+    koefisien = _lookup(np, jenjang, JENJANG_TO_KOEFISIEN, 0.0, np.float64)
+    counts = month_counts(start, end)
+    jumlah = (counts / 12) * koefisien * (prosentase / 100)
+    return prosentase, koefisien, jumlah
+
+
+def _chunks(queryset, chunk_size):
+    last_pk = 0
+    while True:
+        rows = list(queryset.filter(pk__gt=last_pk).order_by('pk').values_list(*AK_VALUE_FIELDS)[:chunk_size])
+        if not rows:
+            return
+        yield rows
+        last_pk = rows[-1][0]
+
+
+def recalculate_ak(pegawai_ids=None, chunk_size=RECALCULATE_CHUNK_SIZE, dry_run=False, on_change=None):
+    """
+    Recompute the derived fields of every AK row (of ``pegawai_ids`` only,
+    when given) and write the rows whose values changed with bulk_update.
+
+    ``on_change(pk, pegawai_id, old, new)`` is called for every changed row,
+    with ``old``/``new`` tuples in RECALCULATED_FIELDS order. With ``dry_run``
+    nothing is written. Returns ``(checked, changed)``.
+    """
+    import numpy as np
+
+    queryset = AK.objects.all()
+    if pegawai_ids:
+        queryset = queryset.filter(pegawai_id__in=pegawai_ids)
+
+    checked = changed = 0
+    affected_pegawai = set()
+    for rows in _chunks(queryset, chunk_size):
+        columns = list(zip(*rows))
+        pks = np.array(columns[0], dtype=np.int64)
+        penilaian = np.array(columns[2], dtype=object)
+        jenjang = np.array(columns[3], dtype=object)
+        start = np.array(columns[4], dtype='datetime64[D]')
+        end = np.array(columns[5], dtype='datetime64[D]')
+        old_prosentase = np.array(columns[6], dtype=np.float64)
+        old_koefisien = np.array(columns[7], dtype=np.float64)
+        old_jumlah = np.array(columns[8], dtype=np.float64)
+
+        prosentase, koefisien, jumlah = compute_ak_credits(penilaian, jenjang, start, end)
+        differs = (prosentase != old_prosentase) | (koefisien != old_koefisien) | (jumlah != old_jumlah)
+        checked += len(rows)
+
+        updates = []
+        now = timezone.now()
+        for index in np.flatnonzero(differs):
+            pk, pegawai_id = rows[index][0], rows[index][1]
+            new = (int(prosentase[index]), float(koefisien[index]), float(jumlah[index]))
+            if on_change:
+                on_change(pk, pegawai_id, rows[index][6:], new)
+            affected_pegawai.add(pegawai_id)
+            # bulk_update does not apply auto_now, so updated_at is set here
+            updates.append(AK(pk=int(pks[index]), prosentase=new[0], koefisien=new[1],
+                              jumlah_angka_kredit=new[2], updated_at=now))
+        changed += len(updates)
+        if updates and not dry_run:
+            with transaction.atomic():
+                AK.objects.bulk_update(updates, [*RECALCULATED_FIELDS, 'updated_at'], batch_size=500)
+
+    if affected_pegawai and not dry_run:
+        # bulk_update bypasses the signals that drop cached PDFs and refresh the summaries
+        pdf_cache = get_pdf_cache()
+        if pdf_cache:
+            for pegawai_id in affected_pegawai:
+                pdf_cache.invalidate_pegawai(pegawai_id)
+        rebuild_credit_summaries(sorted(affected_pegawai))
+    return checked, changed
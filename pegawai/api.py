@@ -0,0 +1,168 @@
+"""
+Read-only JSON API over Pegawai, AK, AkPendidikan and AngkaIntegrasi, for
+tools that sync the data instead of reading the HTML pages or CSV exports.
+
+    GET api/<resource>/          rows ordered by id, one page at a time
+    GET api/<resource>/<id>/     one row
+
+with ``resource`` one of RESOURCES. The list endpoint takes
+
+    fields=nama,nip     only these fields (default: all; ``id`` is always included)
+    ids=3,5,8           just these rows (at most API_MAX_IDS, not paginated)
+    pegawai=12          only the rows of one pegawai (not for pegawai itself)
+    limit=100           page size (at most API_MAX_LIMIT)
+    cursor=<token>      the ``next_cursor`` of the previous page
+
+Foreign keys are given as ids, dates as ISO 8601 and files as their storage
+name. Every response has an ETag; a request whose If-None-Match matches it
+gets an empty 304.
+"""
+import hashlib
+
+from django.db import models
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response
+from django.views.decorators.http import require_safe
+
+from .models import Pegawai, AK, AkPendidikan, AngkaIntegrasi
+
+RESOURCES = {
+    'pegawai': Pegawai,
+    'ak': AK,
+    'ak-pendidikan': AkPendidikan,
+    'angka-integrasi': AngkaIntegrasi,
+}
+API_DEFAULT_LIMIT = 100
+API_MAX_LIMIT = 1000
+API_MAX_IDS = 1000
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def api_fields(model):
+    """Field names of ``model`` the API can return, in model order."""
+    return [field.name for field in model._meta.concrete_fields]
+
+
+def _selected_fields(request, model):
+    available = api_fields(model)
+    requested = [name.strip() for name in request.GET.get('fields', '').split(',') if name.strip()]
+    if not requested:
+        return available
+    unknown = [name for name in requested if name not in available]
+    if unknown:
+        raise ApiError(f"Field tidak dikenal: {', '.join(unknown)}. Field yang tersedia: {', '.join(available)}.")
+    # id first, then the requested fields without duplicates
+    return list(dict.fromkeys(['id', *requested]))
+
+
+def _int_param(request, name, default=None, minimum=1, maximum=None):
+    value = request.GET.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise ApiError(f'Parameter {name} harus berupa angka.')
+    if value < minimum:
+        raise ApiError(f'Parameter {name} minimal {minimum}.')
+    return min(value, maximum) if maximum else value
+
+
+def _parse_ids(raw):
+    try:
+        ids = sorted({int(value) for value in raw.split(',') if value.strip()})
+    except ValueError:
+        raise ApiError('Parameter ids harus berupa daftar angka dipisahkan koma.')
+    if len(ids) > API_MAX_IDS:
+        raise ApiError(f'Paling banyak {API_MAX_IDS} ids per permintaan.')
+    return ids
+
+
+def _rows(queryset, fields):
+    rows = list(queryset.values(*fields))
+    # FileField values are the storage name; no file is returned as null rather than ""
+    file_fields = [
+        field.name for field in queryset.model._meta.concrete_fields
+        if isinstance(field, models.FileField) and field.name in fields
+    ]
+    for row in rows:
+        for name in file_fields:
+            row[name] = row[name] or None
+    return rows
+
+
+def _json_response(request, data, status=200):
+    """JsonResponse with an ETag of its body, or a 304 when If-None-Match matches it."""
+    response = JsonResponse(data, status=status, json_dumps_params={'ensure_ascii': False})
+    if status != 200:
+        return response
+    response['ETag'] = f'"{hashlib.md5(response.content, usedforsecurity=False).hexdigest()}"'
+    return get_conditional_response(request, etag=response['ETag'], response=response)
+
+
+def _resolve(resource):
+    try:
+        return RESOURCES[resource]
+    except KeyError:
+        raise ApiError(f'Resource tidak dikenal: {resource}.', status=404)
+
+
+def _api_list(request, resource):
+    model = _resolve(resource)
+    fields = _selected_fields(request, model)
+    queryset = model.objects.order_by('id')
+
+    pegawai_id = _int_param(request, 'pegawai')
+    if pegawai_id is not None:
+        if model is Pegawai:
+            raise ApiError('Parameter pegawai tidak berlaku untuk resource pegawai.')
+        queryset = queryset.filter(pegawai_id=pegawai_id)
+
+    if request.GET.get('ids'):
+        return {'results': _rows(queryset.filter(id__in=_parse_ids(request.GET['ids'])), fields)}
+
+    limit = _int_param(request, 'limit', API_DEFAULT_LIMIT, maximum=API_MAX_LIMIT)
+    cursor = _int_param(request, 'cursor', minimum=0)
+    if cursor is not None:
+        queryset = queryset.filter(id__gt=cursor)
+    # One row more than the page tells whether there is a next page, without a COUNT
+    rows = _rows(queryset[:limit + 1], fields)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = str(rows[-1]['id'])
+    next_url = None
+    if next_cursor:
+        params = request.GET.copy()
+        params['cursor'] = next_cursor
+        next_url = request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+    return {'results': rows, 'next_cursor': next_cursor, 'next': next_url}
+
+
+def _api_detail(request, resource, pk):
+    model = _resolve(resource)
+    rows = _rows(model.objects.filter(pk=pk), _selected_fields(request, model))
+    if not rows:
+        raise ApiError(f'{model._meta.verbose_name} {pk} tidak ditemukan.', status=404)
+    return rows[0]
+
+
+@require_safe
+def api_list(request, resource):
+    try:
+        return _json_response(request, _api_list(request, resource))
+    except ApiError as e:
+        return _json_response(request, {'error': str(e)}, status=e.status)
+
+
+@require_safe
+def api_detail(request, resource, pk):
+    try:
+        return _json_response(request, _api_detail(request, resource, pk))
+    except ApiError as e:
+        return _json_response(request, {'error': str(e)}, status=e.status)
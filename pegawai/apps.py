@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class PegawaiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'pegawai'
+
+    def ready(self):
+        from django.core import checks
+
+        from . import signals  # noqa: F401
+        from .direct_upload import check_direct_upload_storage
+
+        checks.register(check_direct_upload_storage)
@@ -0,0 +1,138 @@
+import csv
+import io
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.template.loader import render_to_string
+
+from .models import Pegawai
+from .pdf import html_to_pdf_safe
+from .reports import ReportSnapshot, build_konversi_report, build_akumulasi_report, build_penetapan_report
+
+REPORT_TEMPLATES = {
+    'penetapan': 'pegawai/penetapan_report_template.html',
+    'akumulasi': 'pegawai/akumulasi_report_template.html',
+    'konversi': 'pegawai/konversi_report_template.html',
+}
+REPORT_TYPES = tuple(REPORT_TEMPLATES)
+
+STATUS_FIELDNAMES = ['nip', 'nama', 'laporan', 'file', 'status', 'keterangan']
+
+
+def filter_pegawai(unit_kerja='', golongan='', nips=None):
+    """Return the Pegawai matching all of the given filters, ordered by name."""
+    queryset = Pegawai.objects.order_by('nama', 'id')
+    if unit_kerja:
+        queryset = queryset.filter(unit_kerja=unit_kerja)
+    if golongan:
+        queryset = queryset.filter(golongan=golongan)
+    if nips:
+        queryset = queryset.filter(nip__in=nips)
+    return queryset
+
+
+def report_context(report_type, snapshot):
+    """Template context for ``report_type`` covering every period of the snapshot's pegawai."""
+    ak_ids, include_integrasi, include_pendidikan = snapshot.default_selection()
+    if report_type == 'konversi':
+        report_data, ak_list = build_konversi_report(snapshot, ak_ids, include_integrasi, include_pendidikan)
+    elif report_type == 'akumulasi':
+        report_data = build_akumulasi_report(snapshot, ak_ids, include_integrasi, include_pendidikan)
+        ak_list = report_data['ak_list']
+    elif report_type == 'penetapan':
+        report_data = build_penetapan_report(snapshot, ak_ids, include_integrasi, include_pendidikan)
+        ak_list = report_data['ak_list']
+    else:
+        raise ValueError(f"Unknown report type: {report_type}")
+    return {
+        'report_data': report_data,
+        'ak_list': ak_list,
+        'base_dir': settings.BASE_DIR,
+    }
+
+
+def _batch_workers():
+    return getattr(settings, 'PDF_BATCH_WORKERS', 0) or os.cpu_count() or 1
+
+
+def _convert_all(html_documents, max_workers):
+    """
+    Convert HTML documents to PDF, yielding ``(pdf_bytes, error)`` in input order.
+
+    Conversion runs in a process pool so it spreads across CPU cores; if a
+    pool cannot be started (restricted sandbox, serverless runtime) the
+    documents are converted in this process instead. A pool that breaks
+    partway through leaves the documents it already returned; only the rest
+    are converted again.
+    """
+    done = 0
+    if max_workers > 1 and len(html_documents) > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=min(max_workers, len(html_documents))) as executor:
+                for result in executor.map(html_to_pdf_safe, html_documents):
+                    done += 1
+                    yield result
+            return
+        except (OSError, NotImplementedError, BrokenProcessPool):
+            pass
+    for html in html_documents[done:]:
+        yield html_to_pdf_safe(html)
+
+
+def generate_reports_zip(pegawai_list, report_types, dest, max_workers=None):
+    """
+    Render ``report_types`` for every pegawai in ``pegawai_list`` and write
+    them as a ZIP archive to the binary file object ``dest``.
+
+    The archive also contains ``status.csv`` with one row per report.
+    Returns the list of status rows (dicts keyed by STATUS_FIELDNAMES).
+    """
+    if max_workers is None:
+        max_workers = _batch_workers()
+
+    jobs = []
+    statuses = []
+    html_documents = []
+    for snapshot in ReportSnapshot.for_pegawai_list(list(pegawai_list)):
+        pegawai = snapshot.pegawai
+        for report_type in report_types:
+            status = {
+                'nip': pegawai.nip,
+                'nama': pegawai.nama,
+                'laporan': report_type,
+                'file': f"{report_type}/{report_type}_{pegawai.nip}.pdf",
+                'status': 'OK',
+                'keterangan': '',
+            }
+            statuses.append(status)
+            try:
+                html = render_to_string(REPORT_TEMPLATES[report_type], report_context(report_type, snapshot))
+            except Exception as e:
+                status['status'] = 'GAGAL'
+                status['keterangan'] = f"Error rendering template: {e}"
+                continue
+            jobs.append(status)
+            html_documents.append(html)
+
+    with zipfile.ZipFile(dest, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for status, (pdf, error) in zip(jobs, _convert_all(html_documents, max_workers)):
+            if error:
+                status['status'] = 'GAGAL'
+                status['keterangan'] = error
+                continue
+            archive.writestr(status['file'], pdf)
+
+        for status in statuses:
+            if status['status'] != 'OK':
+                status['file'] = ''
+
+        status_csv = io.StringIO()
+        writer = csv.DictWriter(status_csv, fieldnames=STATUS_FIELDNAMES)
+        writer.writeheader()
+        writer.writerows(statuses)
+        archive.writestr('status.csv', status_csv.getvalue())
+
+    return statuses
@@ -0,0 +1,88 @@
+"""
+Conditional GET (ETag / If-None-Match) for the list and report pages.
+
+Every page is derived from the same data, so its ETag is a hash of the
+requested URL, the current ``data_version`` (one small query), the
+version of the code and templates, today's date (reports without AK
+rows print it) and the CSRF cookie (the pages embed a token derived from
+it, which a cached copy must not outlive). A refresh of an unchanged page is answered with 304 Not
+Modified after that single query, before the view loads anything.
+
+``data_version`` changes with every write that can affect a page:
+
+- Pegawai, Instansi and Penilai carry ``updated_at``; their row counts
+  catch deletions.
+- Changes to AK, AkPendidikan and AngkaIntegrasi rows, deletions
+  included, rebuild the pegawai's PegawaiCreditSummary (pegawai.signals),
+  which bumps its ``updated_at``.
+
+Bulk writes that skip the signals must refresh the summaries themselves,
+as the PDF cache already requires (see pegawai.credit_summary).
+
+There is no Last-Modified: a deleted row has no timestamp, so only the
+ETag reliably changes when rows are removed.
+"""
+import hashlib
+import os
+from datetime import date
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib import messages
+from django.db import connections
+from django.views.decorators.http import condition
+
+from .models import Pegawai, Instansi, Penilai, PegawaiCreditSummary
+
+
+def data_version(using='default'):
+    """Tuple that changes whenever data shown on a list or report page changes (one query)."""
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    pegawai, summary, instansi, penilai = (
+        quote(model._meta.db_table) for model in (Pegawai, PegawaiCreditSummary, Instansi, Penilai)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT (SELECT COUNT(*) FROM {pegawai}), (SELECT MAX(updated_at) FROM {pegawai}), '
+            f'(SELECT MAX(updated_at) FROM {summary}), '
+            f'(SELECT COUNT(*) FROM {instansi}), (SELECT MAX(updated_at) FROM {instansi}), '
+            f'(SELECT COUNT(*) FROM {penilai}), (SELECT MAX(updated_at) FROM {penilai})'
+        )
+        return cursor.fetchone()
+
+
+def _code_dirs():
+    """The app, the project package (settings) and the project-level templates."""
+    app_dir = os.path.dirname(os.path.abspath(__file__))
+    return [app_dir, os.path.join(settings.BASE_DIR, 'AppAk2'), os.path.join(settings.BASE_DIR, 'templates')]
+
+
+@lru_cache(maxsize=None)
+def code_version():
+    """Latest modification time of the code and templates, so a deploy changes every ETag."""
+    latest = 0.0
+    for directory in _code_dirs():
+        for root, _dirs, files in os.walk(directory):
+            for name in files:
+                if name.endswith(('.py', '.html')):
+                    latest = max(latest, os.path.getmtime(os.path.join(root, name)))
+    return latest
+
+
+def page_etag(request, *args, **kwargs):
+    """ETag of a GET/HEAD page, or None (no conditional handling) for other requests."""
+    if not getattr(settings, 'CONDITIONAL_PAGES_ENABLED', True) or request.method not in ('GET', 'HEAD'):
+        return None
+    # A pending flash message would be lost with a 304
+    if len(messages.get_messages(request)):
+        return None
+    payload = repr((
+        request.get_full_path(), data_version(), code_version(), date.today().isoformat(),
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME),
+    ))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+
+# View decorator: answers GET/HEAD with 304 when the page has not changed
+conditional_page = condition(etag_func=page_etag)
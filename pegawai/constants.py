@@ -1,4 +1,6 @@
 # pegawai/constants.py
+from types import MappingProxyType
+from typing import NamedTuple, Optional
 
 # Data pangkat dan golongan
 PANGKAT_OPTIONS = {
@@ -88,3 +90,76 @@ PENILAIAN_OPTIONS = [
     "Kurang",
     "Sangat Kurang"
 ]
+
+
+# === Tabel kenaikan pangkat (dibangun sekali saat import) ===
+
+PANGKAT_OPTIONS_REVERSE = MappingProxyType({v: k for k, v in PANGKAT_OPTIONS.items()})
+
+# Penulisan golongan alternatif (dibandingkan setelah .upper())
+GOLONGAN_ALIASES = MappingProxyType({
+    "IIIA": "III/a",
+    "IIIB": "III/b",
+    "IIIC": "III/c",
+    "IIID": "III/d",
+    "3A": "III/a",
+    "3B": "III/b",
+    "3C": "III/c",
+    "3D": "III/d",
+})
+
+
+class Promotion(NamedTuple):
+    """Everything the reports need to know about promotion from one golongan."""
+    next_golongan: str                # "Tertinggi" at the top rank, "N/A" for an unknown golongan
+    teks_tujuan: str                  # e.g. "Penata Tingkat I III/d"
+    pangkat_minimal: float
+    jenjang_minimal: Optional[float]  # None where the jenjang is not available (IV/d -> IV/e)
+    pendidikan_ak: float              # AK Pendidikan default: 25% of the higher minimal
+    lama: float                       # LAMA value of the Penetapan report
+    pengurangan: float                # deducted from the new credit in the Penetapan report
+
+
+def _build_promotion(golongan):
+    if golongan not in GOLONGAN_HIERARKI:
+        next_golongan = "N/A"
+    elif golongan == GOLONGAN_HIERARKI[-1]:
+        next_golongan = "Tertinggi"
+    else:
+        next_golongan = GOLONGAN_HIERARKI[GOLONGAN_HIERARKI.index(golongan) + 1]
+
+    pangkat_minimal, jenjang_minimal = MINIMAL_AK_MAPPING.get((golongan, next_golongan), (0.0, 0.0))
+    pendidikan_ak = 0.0
+    if (golongan, next_golongan) in MINIMAL_AK_MAPPING:
+        minimal_credit = max(pangkat_minimal, jenjang_minimal) if jenjang_minimal is not None else pangkat_minimal
+        pendidikan_ak = minimal_credit * 0.25
+
+    if next_golongan in GOLONGAN_HIERARKI:
+        teks_tujuan = f"{PANGKAT_OPTIONS_REVERSE.get(next_golongan, next_golongan)} {next_golongan}"
+    else:
+        teks_tujuan = next_golongan
+
+    return Promotion(
+        next_golongan=next_golongan,
+        teks_tujuan=teks_tujuan,
+        pangkat_minimal=pangkat_minimal,
+        jenjang_minimal=jenjang_minimal,
+        pendidikan_ak=pendidikan_ak,
+        lama=GOLONGAN_TO_LAMA.get(golongan, 0.0),
+        pengurangan=PENGURANGAN_GOLONGAN.get(golongan, 0),
+    )
+
+
+PROMOTION_TABLE = MappingProxyType({golongan: _build_promotion(golongan) for golongan in GOLONGAN_HIERARKI})
+UNKNOWN_PROMOTION = _build_promotion(None)
+
+
+def normalize_golongan(raw_golongan):
+    """Map alternative spellings ("IIIC", "3c", ...) to the GOLONGAN_HIERARKI form."""
+    raw_golongan = str(raw_golongan).strip()
+    return GOLONGAN_ALIASES.get(raw_golongan.upper(), raw_golongan)
+
+
+def get_promotion(golongan):
+    """Promotion info of a (normalized) golongan; UNKNOWN_PROMOTION if it is not in GOLONGAN_HIERARKI."""
+    return PROMOTION_TABLE.get(golongan, UNKNOWN_PROMOTION)
@@ -0,0 +1,6 @@
+from .pdf_jobs import pdf_jobs_enabled
+
+
+def pdf_jobs(request):
+    """Whether the report PDF links go through background jobs (base.html)."""
+    return {'pdf_jobs_enabled': pdf_jobs_enabled()}
@@ -0,0 +1,117 @@
+"""
+Maintenance of the denormalised PegawaiCreditSummary rows.
+
+A summary is recomputed for just the pegawai whose AK, AkPendidikan or
+AngkaIntegrasi rows changed (see pegawai.signals), with a fixed number of
+aggregate queries regardless of how many rows the pegawai has. Bulk writes
+(bulk_create, QuerySet.update/delete, raw SQL) bypass the signals and must
+call rebuild_credit_summaries themselves.
+"""
+from django.apps import apps as global_apps
+from django.db import connections, transaction
+from django.db.models import Count, Max, Min, OuterRef, Subquery, Sum
+
+SUMMARY_UPDATE_FIELDS = [
+    'total_ak',
+    'total_pendidikan',
+    'angka_integrasi',
+    'jumlah_ak',
+    'jumlah_pendidikan',
+    'latest_ak',
+    'periode_awal',
+    'periode_akhir',
+    'updated_at',
+]
+REBUILD_BATCH_SIZE = 500
+
+
+def _build_summaries(pegawai_ids, apps, using):
+    Pegawai = apps.get_model('pegawai', 'Pegawai')
+    AK = apps.get_model('pegawai', 'AK')
+    AkPendidikan = apps.get_model('pegawai', 'AkPendidikan')
+    AngkaIntegrasi = apps.get_model('pegawai', 'AngkaIntegrasi')
+    PegawaiCreditSummary = apps.get_model('pegawai', 'PegawaiCreditSummary')
+
+    # Same "latest" and "integrasi" choice as pegawai.reports.ReportSnapshot
+    latest_ak = AK.objects.using(using).filter(pegawai=OuterRef('pk')).order_by('-tanggal_akhir_penilaian', '-id').values('id')[:1]
+    integrasi = AngkaIntegrasi.objects.using(using).filter(pegawai=OuterRef('pk')).order_by('id').values('jumlah_angka_integrasi')[:1]
+    summaries = {
+        pegawai_id: PegawaiCreditSummary(
+            pegawai_id=pegawai_id, latest_ak_id=latest_ak_id, angka_integrasi=angka_integrasi,
+        )
+        for pegawai_id, latest_ak_id, angka_integrasi in Pegawai.objects.using(using).filter(pk__in=pegawai_ids).annotate(
+            summary_latest_ak=Subquery(latest_ak), summary_integrasi=Subquery(integrasi),
+        ).values_list('pk', 'summary_latest_ak', 'summary_integrasi')
+    }
+
+    ak_totals = AK.objects.using(using).filter(pegawai_id__in=summaries).values('pegawai_id').annotate(
+        total=Sum('jumlah_angka_kredit'), jumlah=Count('id'),
+        awal=Min('tanggal_awal_penilaian'), akhir=Max('tanggal_akhir_penilaian'),
+    ).order_by()
+    for row in ak_totals:
+        summary = summaries[row['pegawai_id']]
+        summary.total_ak = row['total'] or 0.0
+        summary.jumlah_ak = row['jumlah']
+        summary.periode_awal = row['awal']
+        summary.periode_akhir = row['akhir']
+
+    pendidikan_totals = AkPendidikan.objects.using(using).filter(pegawai_id__in=summaries).values('pegawai_id').annotate(
+        total=Sum('jumlah_angka_kredit'), jumlah=Count('id'),
+    ).order_by()
+    for row in pendidikan_totals:
+        summary = summaries[row['pegawai_id']]
+        summary.total_pendidikan = row['total'] or 0.0
+        summary.jumlah_pendidikan = row['jumlah']
+
+    return list(summaries.values())
+
+
+def _save_summaries(summaries, apps, using):
+    PegawaiCreditSummary = apps.get_model('pegawai', 'PegawaiCreditSummary')
+    with transaction.atomic(using=using):
+        if connections[using].features.supports_update_conflicts_with_target:
+            PegawaiCreditSummary.objects.using(using).bulk_create(
+                summaries,
+                update_conflicts=True,
+                unique_fields=['pegawai'],
+                update_fields=SUMMARY_UPDATE_FIELDS,
+            )
+        else:
+            PegawaiCreditSummary.objects.using(using).filter(pegawai_id__in=[s.pegawai_id for s in summaries]).delete()
+            PegawaiCreditSummary.objects.using(using).bulk_create(summaries)
+
+
+def rebuild_credit_summaries(pegawai_ids=None, batch_size=REBUILD_BATCH_SIZE, apps=global_apps, using='default'):
+    """
+    Recompute the summaries of ``pegawai_ids`` (every pegawai when None).
+    Returns the number of summaries written. ``apps`` and ``using`` let data
+    migrations pass their historical app registry and database.
+    """
+    if pegawai_ids is None:
+        Pegawai = apps.get_model('pegawai', 'Pegawai')
+        pegawai_ids = Pegawai.objects.using(using).order_by('pk').values_list('pk', flat=True)
+    pegawai_ids = list(pegawai_ids)
+
+    written = 0
+    for start in range(0, len(pegawai_ids), batch_size):
+        summaries = _build_summaries(pegawai_ids[start:start + batch_size], apps, using)
+        if summaries:
+            _save_summaries(summaries, apps, using)
+            written += len(summaries)
+    return written
+
+
+def refresh_credit_summary(pegawai_id):
+    """Recompute one pegawai's summary once the current transaction commits."""
+    transaction.on_commit(lambda: rebuild_credit_summaries([pegawai_id]))
+
+
+def get_credit_summary(pegawai):
+    """Return the PegawaiCreditSummary of ``pegawai``, building it if it is missing."""
+    from .models import PegawaiCreditSummary
+
+    summary = PegawaiCreditSummary.objects.select_related('latest_ak').filter(pegawai=pegawai).first()
+    if summary is None:
+        rebuild_credit_summaries([pegawai.pk])
+        summary = PegawaiCreditSummary.objects.select_related('latest_ak').filter(pegawai=pegawai).first()
+    return summary
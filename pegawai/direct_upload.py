@@ -0,0 +1,191 @@
+"""
+Direct uploads of AK Pendidikan certificate files (file_sertifikat), so
+the file does not pass through the Django process as part of the form.
+
+With SERTIFIKAT_DIRECT_UPLOAD the form page does this before submitting:
+
+1. POST ak_pendidikan/upload/ with the file's name, size and type. The
+   server picks the storage key and answers with a signed, short-lived
+   token and the target to send the bytes to.
+2. The browser sends the file to that target.
+3. The form is submitted with the token instead of the file. The form
+   checks the signature and age of the token, runs the verification hook
+   (by default: the object exists and has the announced size) and only
+   stores the key on AkPendidikan.
+
+The target comes from the storage's ``direct_upload_target(key, claims,
+max_age)`` when its ``supports_direct_upload`` is true (VercelBlobStorage
+with a Vercel client). On FileSystemStorage it is the signed PUT endpoint
+below, a stand-in that runs the whole flow locally. Any other storage
+would have the file go through Django after all, so direct uploads are
+refused there (check_direct_upload_storage).
+"""
+import json
+import os
+import posixpath
+import tempfile
+import uuid
+
+from django.conf import settings
+from django.core import checks
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.signing import BadSignature, SignatureExpired, TimestampSigner
+from django.http import Http404, JsonResponse
+from django.urls import reverse
+from django.utils.module_loading import import_string
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods, require_POST
+
+from .models import AkPendidikan
+
+SIGNER_SALT = 'pegawai.direct_upload'
+SERTIFIKAT_UPLOAD_MAX_AGE = 15 * 60
+SERTIFIKAT_MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+SERTIFIKAT_EXTENSIONS = {'.pdf', '.jpg', '.jpeg', '.png'}
+PUT_CHUNK_SIZE = 64 * 1024
+
+
+class DirectUploadError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def storage_accepts_direct_upload(storage=None):
+    """Whether files can reach ``storage`` without passing through the Django process."""
+    storage = storage or default_storage
+    return getattr(storage, 'supports_direct_upload', False) or isinstance(storage, FileSystemStorage)
+
+
+def direct_upload_enabled():
+    return getattr(settings, 'SERTIFIKAT_DIRECT_UPLOAD', False) and storage_accepts_direct_upload()
+
+
+def check_direct_upload_storage(app_configs=None, **kwargs):
+    """System check: SERTIFIKAT_DIRECT_UPLOAD needs a storage that can take the file directly."""
+    if not getattr(settings, 'SERTIFIKAT_DIRECT_UPLOAD', False) or storage_accepts_direct_upload():
+        return []
+    return [checks.Error(
+        f'SERTIFIKAT_DIRECT_UPLOAD is on, but {default_storage.__class__.__name__} cannot issue direct '
+        'upload targets, so certificate files would still pass through Django.',
+        hint='Use VercelBlobStorage with BLOB_READ_WRITE_TOKEN, or turn SERTIFIKAT_DIRECT_UPLOAD off.',
+        id='pegawai.E001',
+    )]
+
+
+def _max_age():
+    return getattr(settings, 'SERTIFIKAT_UPLOAD_MAX_AGE', SERTIFIKAT_UPLOAD_MAX_AGE)
+
+
+def _max_bytes():
+    return getattr(settings, 'SERTIFIKAT_MAX_UPLOAD_BYTES', SERTIFIKAT_MAX_UPLOAD_BYTES)
+
+
+def new_upload_key(filename):
+    """Storage key for a new certificate: under upload_to, in its own random directory."""
+    field = AkPendidikan._meta.get_field('file_sertifikat')
+    key = field.generate_filename(None, os.path.basename(filename))
+    directory, name = posixpath.split(key)
+    return posixpath.join(directory, uuid.uuid4().hex, name)
+
+
+def sign_upload(filename, size, content_type=''):
+    """Validate an announced upload; returns ``(token, claims)``."""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in SERTIFIKAT_EXTENSIONS:
+        raise DirectUploadError(f"Jenis file tidak didukung. Gunakan: {', '.join(sorted(SERTIFIKAT_EXTENSIONS))}.")
+    if not isinstance(size, int) or size <= 0:
+        raise DirectUploadError('Ukuran file tidak valid.')
+    if size > _max_bytes():
+        raise DirectUploadError(f'Ukuran file maksimal {_max_bytes() // (1024 * 1024)} MB.')
+    claims = {'key': new_upload_key(filename), 'size': size, 'type': content_type}
+    return TimestampSigner(salt=SIGNER_SALT).sign_object(claims), claims
+
+
+def check_upload_token(token):
+    """The claims of a token issued by sign_upload, if it is authentic and not expired."""
+    try:
+        return TimestampSigner(salt=SIGNER_SALT).unsign_object(token, max_age=_max_age())
+    except SignatureExpired:
+        raise DirectUploadError('Waktu unggah sudah habis, silakan pilih file lagi.', status=403)
+    except BadSignature:
+        raise DirectUploadError('Token unggah tidak valid.', status=403)
+
+
+def verify_upload(claims, storage=None):
+    """
+    Default verification hook: the object exists in storage with the
+    announced size. Storages with a metadata cache are asked through
+    ``verified_size`` so that neither a stale entry nor a "not found" from
+    a submit that came before the upload finished decides the answer.
+    """
+    storage = storage or default_storage
+    if hasattr(storage, 'verified_size'):
+        size = storage.verified_size(claims['key'])
+    else:
+        size = storage.size(claims['key']) if storage.exists(claims['key']) else None
+    if size is None:
+        raise DirectUploadError('File belum terunggah ke penyimpanan.')
+    if size != claims['size']:
+        raise DirectUploadError('Ukuran file yang terunggah tidak sesuai.')
+
+
+def run_verify_hook(claims):
+    """Run SERTIFIKAT_UPLOAD_VERIFIER (dotted path, default verify_upload) on a finished upload."""
+    hook = getattr(settings, 'SERTIFIKAT_UPLOAD_VERIFIER', '')
+    (import_string(hook) if hook else verify_upload)(claims)
+
+
+def upload_target(request, token, claims):
+    if getattr(default_storage, 'supports_direct_upload', False):
+        return default_storage.direct_upload_target(claims['key'], claims, max_age=_max_age())
+    headers = {'Content-Type': claims['type']} if claims['type'] else {}
+    return {
+        'url': request.build_absolute_uri(reverse('sertifikat_upload_put', args=[token])),
+        'method': 'PUT',
+        'headers': headers,
+    }
+
+
+@require_POST
+def sertifikat_upload_target(request):
+    if not direct_upload_enabled():
+        raise Http404
+    try:
+        try:
+            data = json.loads(request.body or b'{}')
+            filename, size = str(data.get('filename', '')), data.get('size')
+        except (ValueError, AttributeError):
+            raise DirectUploadError('Permintaan tidak valid.')
+        token, claims = sign_upload(filename, size, str(data.get('content_type', '')))
+        return JsonResponse({'key': claims['key'], 'token': token, 'target': upload_target(request, token, claims)})
+    except DirectUploadError as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+
+
+@csrf_exempt  # authorised by the signed token in the URL
+@require_http_methods(['PUT'])
+def sertifikat_upload_put(request, token):
+    """Stand-in for a storage service's signed upload URL: writes the request body to FileSystemStorage."""
+    if not direct_upload_enabled() or not isinstance(default_storage, FileSystemStorage):
+        raise Http404
+    try:
+        claims = check_upload_token(token)
+        if default_storage.exists(claims['key']):
+            raise DirectUploadError('File untuk token ini sudah terunggah.', status=409)
+        # Read the body in chunks into a spooled file, refusing more than was announced
+        with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as spooled:
+            received = 0
+            for chunk in iter(lambda: request.read(PUT_CHUNK_SIZE), b''):
+                received += len(chunk)
+                if received > claims['size']:
+                    raise DirectUploadError('File lebih besar dari ukuran yang diumumkan.', status=413)
+                spooled.write(chunk)
+            if received != claims['size']:
+                raise DirectUploadError('File yang diterima tidak lengkap.')
+            spooled.seek(0)
+            default_storage.save(claims['key'], File(spooled, name=claims['key']))
+        return JsonResponse({'key': claims['key']}, status=201)
+    except DirectUploadError as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
@@ -1,4 +1,6 @@
 from django import forms
+from django.urls import reverse
+from .direct_upload import DirectUploadError, check_upload_token, direct_upload_enabled, run_verify_hook
 from .models import AK, Pegawai, AngkaIntegrasi, Instansi, Penilai, AkPendidikan
 from .constants import JENJANG_OPTIONS, PENILAIAN_OPTIONS, PENILAIAN_TO_PROSENTASE, JENJANG_TO_KOEFISIEN
 
@@ -82,6 +84,9 @@ class PenilaiForm(forms.ModelForm):
             apply_form_control(field)
 
 class AkPendidikanForm(forms.ModelForm):
+    # Set by the page after a direct upload (pegawai/direct_upload.py) instead of sending the file
+    sertifikat_upload_token = forms.CharField(required=False, widget=forms.HiddenInput)
+
     class Meta:
         model = AkPendidikan
         exclude = ['jumlah_angka_kredit']  # Exclude jumlah_angka_kredit since it's calculated automatically
@@ -101,4 +106,23 @@ class AkPendidikanForm(forms.ModelForm):
             if field_name == 'durasi_pelatihan':
                 field.help_text = "Durasi pelatihan dalam jam"
             elif field_name == 'nomor_sertifikat':
-                field.help_text = "Nomor sertifikat harus unik"
\ No newline at end of file
+                field.help_text = "Nomor sertifikat harus unik"
+        if direct_upload_enabled():
+            self.fields['file_sertifikat'].widget.attrs['data-direct-upload-url'] = reverse('sertifikat_upload_target')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        token = cleaned_data.get('sertifikat_upload_token')
+        if token and direct_upload_enabled():
+            try:
+                claims = check_upload_token(token)
+                # A token stays valid for its whole max age: it must not attach one file to two rows
+                if AkPendidikan.objects.filter(file_sertifikat=claims['key']).exclude(pk=self.instance.pk).exists():
+                    raise DirectUploadError('File ini sudah dipakai oleh data lain, silakan unggah ulang.')
+                run_verify_hook(claims)
+            except DirectUploadError as e:
+                self.add_error('file_sertifikat', str(e))
+            else:
+                # Only the key is stored; the file is already in storage
+                cleaned_data['file_sertifikat'] = claims['key']
+        return cleaned_data
\ No newline at end of file
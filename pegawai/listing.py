@@ -0,0 +1,235 @@
+"""
+Pagination and name search for the list views (pegawai, AK, AK Pendidikan,
+Angka Integrasi).
+
+By default the lists keep the numbered OFFSET pages of Paginator. With
+LIST_KEYSET_PAGINATION the pages are fetched by cursor instead, ordered by
+(nama, id) of the pegawai: a page is one query that seeks past the last row
+of the previous page, however deep it is, and no COUNT is run. With
+LIST_APPROXIMATE_COUNT the keyset pages show an estimated total read from
+the database statistics.
+
+The search box matches a substring of the pegawai name. On PostgreSQL that
+is ``nama__icontains``, which the pegawai_nama_trgm_idx trigram index
+serves. On SQLite it is a MATCH against the pegawai_nama_fts FTS5 trigram
+table, kept in sync with pegawai_pegawai by triggers; queries shorter than
+a trigram fall back to LIKE.
+"""
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+LIST_PAGE_SIZE = 5
+
+NAMA_FTS_TABLE = 'pegawai_nama_fts'
+# The trigram tokenizer needs SQLite 3.34
+FTS_TRIGRAM_MIN_SQLITE = (3, 34, 0)
+
+
+def sqlite_has_trigram(connection):
+    return connection.vendor == 'sqlite' and connection.Database.sqlite_version_info >= FTS_TRIGRAM_MIN_SQLITE
+
+
+def create_nama_fts(schema_editor):
+    """
+    (Re)create the pegawai_nama_fts table and the triggers that keep it in
+    sync with pegawai_pegawai, and index the current names. SQLite drops the
+    triggers whenever a migration rebuilds pegawai_pegawai, so such a
+    migration has to call this again.
+    """
+    if not sqlite_has_trigram(schema_editor.connection):
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {NAMA_FTS_TABLE} USING fts5("
+        "nama, content='pegawai_pegawai', content_rowid='id', tokenize='trigram')"
+    )
+    schema_editor.execute(
+        f'CREATE TRIGGER IF NOT EXISTS {NAMA_FTS_TABLE}_ai AFTER INSERT ON pegawai_pegawai BEGIN '
+        f'INSERT INTO {NAMA_FTS_TABLE}(rowid, nama) VALUES (new.id, new.nama); END'
+    )
+    schema_editor.execute(
+        f'CREATE TRIGGER IF NOT EXISTS {NAMA_FTS_TABLE}_ad AFTER DELETE ON pegawai_pegawai BEGIN '
+        f"INSERT INTO {NAMA_FTS_TABLE}({NAMA_FTS_TABLE}, rowid, nama) VALUES ('delete', old.id, old.nama); END"
+    )
+    schema_editor.execute(
+        f'CREATE TRIGGER IF NOT EXISTS {NAMA_FTS_TABLE}_au AFTER UPDATE OF id, nama ON pegawai_pegawai BEGIN '
+        f"INSERT INTO {NAMA_FTS_TABLE}({NAMA_FTS_TABLE}, rowid, nama) VALUES ('delete', old.id, old.nama); "
+        f'INSERT INTO {NAMA_FTS_TABLE}(rowid, nama) VALUES (new.id, new.nama); END'
+    )
+    schema_editor.execute(f"INSERT INTO {NAMA_FTS_TABLE}({NAMA_FTS_TABLE}) VALUES ('rebuild')")
+
+
+def drop_nama_fts(schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for suffix in ('ai', 'ad', 'au'):
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {NAMA_FTS_TABLE}_{suffix}')
+    schema_editor.execute(f'DROP TABLE IF EXISTS {NAMA_FTS_TABLE}')
+
+
+def filter_by_nama(queryset, search_query, pegawai_field=None):
+    """
+    Filter ``queryset`` to the rows whose pegawai name contains
+    ``search_query``. ``pegawai_field`` is the foreign key to Pegawai, or
+    None when ``queryset`` is of Pegawai itself.
+    """
+    connection = connections[queryset.db]
+    if (
+        getattr(settings, 'LIST_SEARCH_FTS', True)
+        and len(search_query) >= 3
+        and sqlite_has_trigram(connection)
+    ):
+        # A quoted string is one phrase of consecutive trigrams: a substring match
+        phrase = '"' + search_query.replace('"', '""') + '"'
+        matching_ids = RawSQL(f'SELECT rowid FROM {NAMA_FTS_TABLE} WHERE {NAMA_FTS_TABLE} MATCH %s', [phrase])
+        return queryset.filter(**{f'{pegawai_field or "pk"}__in': matching_ids})
+    prefix = f'{pegawai_field}__' if pegawai_field else ''
+    return queryset.filter(**{f'{prefix}nama__icontains': search_query})
+
+
+def approximate_count(model, using='default'):
+    """
+    Cheap estimate of the number of rows of ``model``, or None if the
+    database has none to offer. PostgreSQL: the planner's row estimate
+    (current as of the last VACUUM/ANALYZE). SQLite: the span of rowids,
+    which overcounts once rows have been deleted.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+        elif connection.vendor == 'sqlite':
+            # MIN/MAX of the rowid are single b-tree seeks
+            cursor.execute(f'SELECT MAX(rowid) - MIN(rowid) + 1 FROM {connection.ops.quote_name(table)}')
+        else:
+            return None
+        row = cursor.fetchone()
+    # reltuples is -1 for a table that was never analyzed
+    if not row or row[0] is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+def encode_cursor(values):
+    return urlsafe_b64encode(json.dumps(values, separators=(',', ':')).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """The key values of a cursor token, or None for a missing or malformed one."""
+    if not token:
+        return None
+    try:
+        values = json.loads(urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except ValueError:
+        return None
+    if not (isinstance(values, list) and len(values) == 2
+            and isinstance(values[0], str) and isinstance(values[1], int)):
+        return None
+    return values
+
+
+class KeysetPage:
+    """
+    One page of keyset pagination. Iterates like a Paginator Page; the
+    templates link to the neighbouring pages with ``next_cursor`` and
+    ``previous_cursor``.
+    """
+    is_keyset = True
+
+    def __init__(self, object_list, has_next, has_previous, next_cursor, previous_cursor, approximate_count=None):
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.approximate_count = approximate_count
+
+    def __repr__(self):
+        return f'<KeysetPage of {len(self.object_list)} rows>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+
+def _key_of(obj, key_fields):
+    values = []
+    for field in key_fields:
+        value = obj
+        for part in field.split('__'):
+            value = getattr(value, part)
+        values.append(value)
+    return values
+
+
+def _seek(key_fields, values, lookup):
+    """
+    (first, second) > values (``lookup`` 'gt') or < values ('lt'), without
+    row comparison syntax. The leading range on ``first`` lets the planner
+    walk the (nama, id) index instead of merging two index scans and sorting.
+    """
+    first, second = key_fields
+    return Q(**{f'{first}__{lookup}e': values[0]}) & (
+        Q(**{f'{first}__{lookup}': values[0]}) | Q(**{f'{second}__{lookup}': values[1]})
+    )
+
+
+def keyset_page(queryset, key_fields, after=None, before=None, per_page=LIST_PAGE_SIZE):
+    """
+    The page of ``queryset`` ordered by the two ``key_fields`` that follows
+    the cursor ``after``, or precedes the cursor ``before`` (the first page
+    when neither is given). Runs a single query of ``per_page + 1`` rows.
+    """
+    after, before = decode_cursor(after), decode_cursor(before)
+    if before is not None:
+        queryset = queryset.filter(_seek(key_fields, before, 'lt'))
+        rows = list(queryset.order_by(*(f'-{field}' for field in key_fields))[:per_page + 1])
+        has_previous = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        has_next = True
+    else:
+        if after is not None:
+            queryset = queryset.filter(_seek(key_fields, after, 'gt'))
+        rows = list(queryset.order_by(*key_fields)[:per_page + 1])
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        has_previous = after is not None
+
+    next_cursor = encode_cursor(_key_of(rows[-1], key_fields)) if rows and has_next else None
+    previous_cursor = encode_cursor(_key_of(rows[0], key_fields)) if rows and has_previous else None
+    return KeysetPage(rows, has_next, has_previous, next_cursor, previous_cursor)
+
+
+def paginate_list(request, queryset, key_fields, search_query=''):
+    """
+    Page of a list view: keyset when LIST_KEYSET_PAGINATION is set, else a
+    numbered Paginator page. Both are ordered by ``key_fields``.
+    """
+    if not getattr(settings, 'LIST_KEYSET_PAGINATION', False):
+        paginator = Paginator(queryset.order_by(*key_fields), LIST_PAGE_SIZE)
+        return paginator.get_page(request.GET.get('page'))
+
+    page = keyset_page(queryset, key_fields, after=request.GET.get('after'), before=request.GET.get('before'))
+    if getattr(settings, 'LIST_APPROXIMATE_COUNT', False) and not search_query:
+        page.approximate_count = approximate_count(queryset.model, queryset.db)
+    return page
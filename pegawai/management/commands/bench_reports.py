@@ -0,0 +1,236 @@
+import io
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from pegawai import views
+from pegawai.credit_summary import rebuild_credit_summaries
+from pegawai.models import AK
+from pegawai.reports import ReportSnapshot
+from pegawai.synthetic import seed_synthetic_data
+from pegawai.utils import export_pegawai_to_csv, import_pegawai_from_csv, iter_ak_csv, warm_up_pdf_renderer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PDF_VIEWS = [
+    ('konversi_pdf_view', views.konversi_pdf_view),
+    ('akumulasi_pdf_view', views.akumulasi_pdf_view),
+    ('penetapan_pdf_view', views.penetapan_pdf_view),
+    ('merge_report_pdf_view', views.merge_report_pdf_view),
+]
+REPORT_HELPERS = [
+    ('_get_konversi_report_data', views._get_konversi_report_data),
+    ('_get_akumulasi_report_data', views._get_akumulasi_report_data),
+    ('_get_penetapan_report_data', views._get_penetapan_report_data),
+]
+
+
+class _Rollback(Exception):
+    pass
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of a non-empty list."""
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(percent / 100 * len(values)) - 1))
+    return values[index]
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where it is not available."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark report building, the report PDF views and CSV import/export on synthetic data '
+        '(rolled back afterwards); prints p50/p95/p99, query counts and peak RSS'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pegawai', type=int, default=200, help='Number of synthetic pegawai')
+        parser.add_argument('--ak-per-pegawai', type=int, default=6)
+        parser.add_argument('--pendidikan-per-pegawai', type=int, default=2)
+        parser.add_argument('--repeat', type=int, default=30, help='Runs of each report helper and CSV path')
+        parser.add_argument('--pdf-repeat', type=int, default=5, help='Runs of each PDF view (0 to skip)')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed for choosing pegawai')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--compare', help='JSON file of an earlier run to compare p50 timings with')
+
+    def handle(self, *args, **options):
+        if options['pegawai'] < 1:
+            raise CommandError('--pegawai must be at least 1.')
+        previous = None
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as f:
+                    previous = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read {options['compare']}: {e}")
+
+        results = {}
+        # Every PDF must really be rendered, not served from the report PDF cache
+        with override_settings(PDF_CACHE_ENABLED=False):
+            try:
+                with transaction.atomic():
+                    seed_seconds = self._seed(options)
+                    self._run(options, results)
+                    raise _Rollback
+            except _Rollback:
+                pass
+
+        report = {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'git_revision': git_revision(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'scale': {
+                'pegawai': options['pegawai'],
+                'ak_per_pegawai': options['ak_per_pegawai'],
+                'pendidikan_per_pegawai': options['pendidikan_per_pegawai'],
+            },
+            'seed_seconds': round(seed_seconds, 2),
+            'peak_rss_mb': peak_rss_mb(),
+            'results': results,
+        }
+        self._print(report, previous)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}.")
+
+    def _seed(self, options):
+        self.stdout.write(
+            f"Generating {options['pegawai']} pegawai with {options['ak_per_pegawai']} AK and "
+            f"{options['pendidikan_per_pegawai']} AkPendidikan rows each..."
+        )
+        start = time.perf_counter()
+        pegawai_list = seed_synthetic_data(
+            options['pegawai'], options['ak_per_pegawai'], options['pendidikan_per_pegawai'], with_integrasi=True,
+        )
+        rebuild_credit_summaries([pegawai.pk for pegawai in pegawai_list])
+        self.pegawai_list = pegawai_list
+        return time.perf_counter() - start
+
+    def _measure(self, results, name, func, arguments):
+        """Call ``func(*args)`` for each args tuple, recording duration and query count."""
+        timings = []
+        queries = []
+        errors = 0
+        for args in arguments:
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                try:
+                    ok = func(*args)
+                except Exception:
+                    ok = False
+                timings.append((time.perf_counter() - start) * 1000)
+            queries.append(len(context.captured_queries))
+            errors += ok is False
+        results[name] = {
+            'runs': len(timings),
+            'errors': errors,
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'mean_ms': round(sum(timings) / len(timings), 3),
+            'queries_avg': round(sum(queries) / len(queries), 2),
+            'queries_max': max(queries),
+            'peak_rss_mb': peak_rss_mb(),
+        }
+        self.stdout.write(f'  {name} done')
+
+    def _run(self, options, results):
+        rng = random.Random(options['seed'])
+        repeat = options['repeat']
+        chosen = [rng.choice(self.pegawai_list) for _ in range(repeat)]
+        ak_ids = {}
+        for pegawai_id, ak_id in AK.objects.filter(pegawai__in=chosen).values_list('pegawai_id', 'id'):
+            ak_ids.setdefault(pegawai_id, []).append(ak_id)
+
+        for name, helper in REPORT_HELPERS:
+            def build(pegawai, helper=helper):
+                # Includes loading the snapshot, as the views do
+                helper(pegawai, ak_ids.get(pegawai.pk, []), True, True, snapshot=ReportSnapshot(pegawai))
+            self._measure(results, name, build, [(pegawai,) for pegawai in chosen])
+
+        if options['pdf_repeat']:
+            # Library imports and font loading are a one-off cost, not part of a render
+            warm_up_pdf_renderer()
+            factory = RequestFactory()
+            pdf_chosen = chosen[:options['pdf_repeat']]
+            for name, view in PDF_VIEWS:
+                def render(pegawai, view=view):
+                    request = factory.get('/', {
+                        'pegawai_id': pegawai.pk, 'include_angka_integrasi': 'true', 'include_ak_pendidikan': 'true',
+                    })
+                    response = view(request)
+                    return response.status_code == 200 and response.content.startswith(b'%PDF')
+                self._measure(results, name, render, [(pegawai,) for pegawai in pdf_chosen])
+
+        self._measure(results, 'export_pegawai_csv', lambda: len(export_pegawai_to_csv()) > 0,
+                      [()] * repeat)
+        self._measure(results, 'export_ak_csv', lambda: sum(1 for _ in iter_ak_csv()) > 0, [()] * repeat)
+
+        csv_text = export_pegawai_to_csv()
+        unchanged = csv_text.encode('utf-8')
+
+        def import_csv(data):
+            imported, errors = import_pegawai_from_csv(io.BytesIO(data))
+            return imported > 0 and not errors
+
+        self._measure(results, 'import_pegawai_csv_unchanged', import_csv, [(unchanged,)] * repeat)
+        # Every run renames every pegawai, so each import really writes all rows
+        changed = [(csv_text.replace(' ANALIS', f' ANALIS {n}').encode('utf-8'),) for n in range(repeat)]
+        self._measure(results, 'import_pegawai_csv_changed', import_csv, changed)
+
+    def _print(self, report, previous):
+        scale = report['scale']
+        self.stdout.write(
+            f"\n{report['database']}, {scale['pegawai']} pegawai x {scale['ak_per_pegawai']} AK "
+            f"(seeded in {report['seed_seconds']}s), revision {report['git_revision'] or '?'}"
+        )
+        header = f"{'path':<32} {'runs':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8} {'rss MB':>7}"
+        if previous:
+            header += f" {'p50 vs ' + (previous.get('git_revision') or 'previous'):>16}"
+        self.stdout.write(header)
+        for name, stats in report['results'].items():
+            line = (
+                f"{name:<32} {stats['runs']:>5} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} "
+                f"{stats['p99_ms']:>9.2f} {stats['queries_avg']:>8.1f} {stats['peak_rss_mb'] or '-':>7}"
+            )
+            before = (previous or {}).get('results', {}).get(name)
+            if before and before.get('p50_ms'):
+                change = (stats['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100
+                text = f"{change:+.1f}%"
+                line += f" {text:>16}"
+            if stats['errors']:
+                line += f"  ({stats['errors']} errors)"
+            self.stdout.write(self.style.WARNING(line) if stats['errors'] else line)
+        self.stdout.write(f"Peak RSS: {report['peak_rss_mb'] or '-'} MB")
@@ -0,0 +1,20 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from AppAk2.bootstrap import build_sqlite_template
+
+
+class Command(BaseCommand):
+    help = 'Build the fully migrated SQLite template database used on cold starts (SQLITE_TEMPLATE_PATH)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=None, help='Template path (default: settings.SQLITE_TEMPLATE_PATH)')
+
+    def handle(self, *args, **options):
+        path = options['output'] or settings.SQLITE_TEMPLATE_PATH
+        start = time.perf_counter()
+        stamp = build_sqlite_template(path)
+        self.stdout.write(self.style.SUCCESS(
+            f'Built {path} (schema {stamp[:12]}) in {time.perf_counter() - start:.2f}s.'
+        ))
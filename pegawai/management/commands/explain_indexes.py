@@ -0,0 +1,143 @@
+import re
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+from pegawai.listing import filter_by_nama
+from pegawai.models import Pegawai, AK, AkPendidikan
+from pegawai.synthetic import seed_synthetic_data
+
+# Plan lines that mean a full table scan: PostgreSQL "Seq Scan on <table>",
+# SQLite "SCAN <table>" (an index walk is reported as "SCAN <table> USING INDEX",
+# an FTS5 MATCH as "SCAN <table> VIRTUAL TABLE INDEX").
+SEQ_SCAN_PATTERNS = [
+    re.compile(r'Seq Scan on (\w+)'),
+    re.compile(r'\bSCAN (\w+)(?! USING| VIRTUAL TABLE)(?:\s|$)'),
+]
+# SQLite plan lines that walk a whole index ("SCAN <table> USING [COVERING] INDEX")
+# rather than seeking into it ("SEARCH <table> USING INDEX ... (col=?)"):
+# fine under a LIMIT, a full read otherwise
+INDEX_SCAN_PATTERNS = [
+    re.compile(r'\bSCAN (\w+) USING (?:COVERING )?INDEX\b'),
+]
+# Plan lines that mean the rows are sorted after fetching instead of read in index order
+SORT_PATTERNS = [
+    re.compile(r'^\s*(?:->\s*)?(?:Incremental )?Sort\b', re.MULTILINE),
+    re.compile(r'USE TEMP B-TREE FOR ORDER BY'),
+]
+# Small lookup tables; scanning them in a join is cheaper than an index probe
+LOOKUP_TABLES = {'pegawai_instansi', 'pegawai_penilai'}
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Show the query plans (EXPLAIN) and timings of the report and list queries, flagging sequential scans'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Generate this many synthetic pegawai (with AK rows) first; rolled back afterwards')
+        parser.add_argument('--ak-per-pegawai', type=int, default=6)
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per query for the timing')
+        parser.add_argument('--search', default='ANI',
+                            help='Name fragment for the search and keyset queries (3+ characters to use '
+                                 'the SQLite trigram search; shorter ones fall back to LIKE)')
+        parser.add_argument('--verbose-plans', action='store_true', help='Print the full plan of every query')
+
+    def handle(self, *args, **options):
+        if not options['seed']:
+            self._report(options)
+            return
+        try:
+            with transaction.atomic():
+                self._seed(options['seed'], options['ak_per_pegawai'])
+                self._report(options)
+                raise _Rollback
+        except _Rollback:
+            self.stdout.write('Synthetic data rolled back.')
+
+    def _seed(self, count, ak_per_pegawai):
+        self.stdout.write(f'Generating {count} pegawai with {ak_per_pegawai} AK rows each...')
+        seed_synthetic_data(count, ak_per_pegawai)
+        with connection.cursor() as cursor:
+            # Refresh planner statistics so the plans reflect the new row counts
+            cursor.execute('ANALYZE')
+
+    def _queries(self, search):
+        pegawai_id = Pegawai.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        return [
+            ('report: AK by pegawai, by period start',
+             AK.objects.filter(pegawai_id=pegawai_id).order_by('tanggal_awal_penilaian')),
+            ('report: latest AK of pegawai',
+             AK.objects.filter(pegawai_id=pegawai_id).order_by('-tanggal_akhir_penilaian')[:1]),
+            ('report: AkPendidikan by pegawai, by period start',
+             AkPendidikan.objects.filter(pegawai_id=pegawai_id).order_by('tanggal_awal_penilaian')),
+            ('report: latest AkPendidikan of pegawai',
+             AkPendidikan.objects.filter(pegawai_id=pegawai_id).order_by('-tanggal_akhir_penilaian')[:1]),
+            ('list: pegawai page ordered by nama',
+             Pegawai.objects.order_by('nama', 'id')[:5]),
+            ('list: pegawai keyset page',
+             Pegawai.objects.filter(Q(nama__gte=search) & (Q(nama__gt=search) | Q(id__gt=0)))
+             .order_by('nama', 'id')[:6]),
+            ('list: pegawai nama search',
+             filter_by_nama(Pegawai.objects.all(), search).order_by('nama', 'id')[:5]),
+            ('list: AK page ordered by pegawai nama',
+             AK.objects.select_related('pegawai', 'instansi', 'penilai').order_by('pegawai__nama', 'id')[:10]),
+        ]
+
+    def _report(self, options):
+        self.stdout.write(f'Database backend: {connection.vendor}')
+        flagged = walked = 0
+        for name, queryset in self._queries(options['search']):
+            plan = queryset.explain()
+            seq_scans = sorted({
+                match.group(1) for pattern in SEQ_SCAN_PATTERNS for match in pattern.finditer(plan)
+            } - LOOKUP_TABLES)
+            index_scans = sorted({
+                match.group(1) for pattern in INDEX_SCAN_PATTERNS for match in pattern.finditer(plan)
+            } - LOOKUP_TABLES)
+            sorted_after_fetch = any(pattern.search(plan) for pattern in SORT_PATTERNS)
+
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - start) * 1000)
+
+            if seq_scans:
+                status = self.style.WARNING(f"SEQ SCAN ({', '.join(seq_scans)})")
+            elif sorted_after_fetch:
+                status = self.style.WARNING('index + sort')
+            elif index_scans:
+                status = self.style.NOTICE(f"index scan ({', '.join(index_scans)})")
+                walked += 1
+            else:
+                status = self.style.SUCCESS('index search')
+            flagged += bool(seq_scans or sorted_after_fetch)
+            self.stdout.write(f'{name:<50} {status:<40} median {statistics.median(timings):8.3f} ms')
+            if options['verbose_plans']:
+                for line in plan.splitlines():
+                    self.stdout.write(f'    {line}')
+
+        if flagged:
+            self.stdout.write(self.style.WARNING(f'{flagged} queries do not use a matching index.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('All queries use a matching index.'))
+        if walked:
+            self.stdout.write(
+                f'{walked} queries walk a whole index in order (SCAN ... USING INDEX) instead of seeking '
+                'into it; that only stays cheap while the query has a LIMIT.'
+            )
+        if connection.vendor == 'sqlite':
+            if len(options['search']) < 3:
+                self.stdout.write(self.style.WARNING(
+                    f"--search {options['search']!r} is shorter than a trigram, so the nama search uses LIKE."
+                ))
+            self.stdout.write(
+                'Note: SQLite cannot use an index for LIKE with a leading wildcard; the nama search '
+                'uses the pegawai_nama_fts table (migration 0005) for fragments of 3 or more characters.'
+            )
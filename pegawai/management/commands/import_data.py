@@ -1,112 +1,219 @@
+import os
 import sqlite3
-import pandas as pd
-from django.core.management.base import BaseCommand
-from pegawai.models import Pegawai, Instansi, Penilai, AngkaIntegrasi, AK
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models, transaction
+from django.utils import timezone
+from pegawai.credit_summary import rebuild_credit_summaries
+from pegawai.models import Pegawai, Instansi, Penilai, AngkaIntegrasi, AK, AkPendidikan, PegawaiCreditSummary
+from pegawai.pdf_cache import get_pdf_cache
+
+IMPORT_BATCH_SIZE = 1000
+
+PERSON_FIELDS = [
+    'nama', 'nip', 'no_seri_karpeg', 'tempat_lahir', 'tanggal_lahir', 'jenis_kelamin',
+    'pangkat', 'golongan', 'tmt_pangkat', 'jabatan', 'tmt_jabatan', 'unit_kerja',
+]
+AK_FIELDS = [
+    'pegawai_id', 'instansi_id', 'penilai_id', 'tanggal_awal_penilaian', 'tanggal_akhir_penilaian',
+    'penilaian', 'prosentase', 'koefisien', 'jumlah_angka_kredit', 'tanggal_ditetapkan',
+    'tempat_ditetapkan', 'jenjang',
+]
+
+# (legacy table, model, imported fields, natural key). Rows are matched on the
+# natural key in --incremental mode; rows sharing a key are paired in id order.
+TABLES = [
+    ('instansi', Instansi, ['nama_instansi'], ['nama_instansi']),
+    ('pegawai', Pegawai, PERSON_FIELDS, ['nip']),
+    ('penilai', Penilai, PERSON_FIELDS, ['nip']),
+    ('angka_integrasi', AngkaIntegrasi, ['pegawai_id', 'jumlah_angka_integrasi'], ['pegawai_id']),
+    ('ak', AK, AK_FIELDS, ['pegawai_id', 'tanggal_awal_penilaian', 'tanggal_akhir_penilaian']),
+]
+# Legacy foreign key column -> table whose legacy ids it refers to
+FOREIGN_KEYS = {'pegawai_id': 'pegawai', 'instansi_id': 'instansi', 'penilai_id': 'penilai'}
+
+
+def _records(pd, frame, model, fields):
+    """
+    Convert a legacy table into field dicts for ``model`` column by column:
+    dates parsed, missing optional values as None, missing text as "".
+    Returns ``(legacy_ids, records, skipped)``; rows lacking a required
+    date or number are skipped.
+    """
+    columns = {}
+    required = pd.Series(True, index=frame.index)
+    for name in fields:
+        field = model._meta.get_field(name.removesuffix('_id') if name in FOREIGN_KEYS else name)
+        column = frame[name] if name in frame else pd.Series(None, index=frame.index, dtype=object)
+        if isinstance(field, models.DateField):
+            column = pd.to_datetime(column, errors='coerce').dt.date
+        elif isinstance(field, (models.CharField, models.TextField)):
+            column = column.astype(object).where(column.notna(), None if field.null else '')
+            column = column.map(lambda value: value if value is None else str(value).strip())
+        if not field.null and not isinstance(field, (models.CharField, models.TextField)):
+            required &= column.notna()
+        columns[name] = column.astype(object).where(column.notna(), None)
+
+    table = pd.DataFrame(columns)[required]
+    if 'nip' in fields:
+        # NIP is the natural key of pegawai and penilai
+        has_nip = table['nip'].fillna('') != ''
+        table = table[has_nip]
+    legacy_ids = frame.loc[table.index, 'id'].tolist()
+    return legacy_ids, table.to_dict('records'), len(frame) - len(table)
+
+
+def _group(rows, key_fields):
+    grouped = defaultdict(list)
+    for row in rows:
+        grouped[tuple(row[name] for name in key_fields)].append(row)
+    return grouped
+
+
+def _batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
 
 class Command(BaseCommand):
-    help = 'Import data from old pegawai.db'
+    help = (
+        'Import data from the old pegawai.db with bulk inserts inside one transaction '
+        '(replacing the current data, or only adding/updating rows with --incremental)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default='pegawai.db', help='Path of the legacy SQLite database')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+                            help='Rows per bulk INSERT/UPDATE statement')
+        parser.add_argument('--incremental', action='store_true',
+                            help='Keep the current data; insert new rows and update changed ones '
+                                 '(matched on NIP, nama_instansi, pegawai and period). Nothing is deleted.')
 
     def handle(self, *args, **options):
-        conn = sqlite3.connect('pegawai.db')
+        try:
+            import pandas as pd
+        except ImportError:
+            raise CommandError('import_data needs pandas (pip install pandas).')
+        if not os.path.exists(options['source']):
+            raise CommandError(f"Legacy database {options['source']} not found.")
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        self.batch_size = options['batch_size']
+        self.verbosity = options['verbosity']
+        self.incremental = options['incremental']
+
+        start = time.perf_counter()
+        conn = sqlite3.connect(f"file:{options['source']}?mode=ro", uri=True)
+        try:
+            frames = {table: pd.read_sql(f'SELECT * FROM {table} ORDER BY id', conn) for table, *_ in TABLES}
+        finally:
+            conn.close()
+        self.stdout.write(
+            f"Read {sum(len(frame) for frame in frames.values())} rows from {options['source']} "
+            f"in {time.perf_counter() - start:.2f}s."
+        )
+
+        totals = defaultdict(int)
+        id_maps = {}
+        with transaction.atomic():
+            if not self.incremental:
+                self._clear()
+            for table, model, fields, key_fields in TABLES:
+                legacy_ids, records, skipped = _records(pd, frames[table], model, fields)
+                records, legacy_ids, unmapped = self._map_foreign_keys(records, legacy_ids, id_maps)
+                stats = self._load(model, records, fields, key_fields)
+                stats['skipped'] = skipped + unmapped
+                # Legacy id -> new id, through the natural key (unique for the tables referred to)
+                if table in FOREIGN_KEYS.values():
+                    new_ids = {
+                        row[:-1]: row[-1] for row in model.objects.values_list(*key_fields, 'id')
+                    }
+                    id_maps[table] = {
+                        legacy_id: new_ids[tuple(record[name] for name in key_fields)]
+                        for legacy_id, record in zip(legacy_ids, records)
+                    }
+                for name, value in stats.items():
+                    totals[name] += value
+                self._report(model, len(frames[table]), stats)
+
+            self.stdout.write('Rebuilding credit summaries...')
+            rebuild_credit_summaries()
+
+        # Bulk writes bypass the signals that drop cached report PDFs
+        pdf_cache = get_pdf_cache()
+        if pdf_cache:
+            pdf_cache.clear()
+
+        elapsed = time.perf_counter() - start
+        rows = sum(len(frame) for frame in frames.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {rows} rows in {elapsed:.2f}s ({rows / elapsed:.0f} rows/s): "
+            f"{totals['created']} created, {totals['updated']} updated, "
+            f"{totals['unchanged']} unchanged, {totals['skipped']} skipped."
+        ))
 
-        # Clear existing data
+    def _clear(self):
         self.stdout.write('Clearing existing data...')
-        AK.objects.all().delete()
-        AngkaIntegrasi.objects.all().delete()
-        Penilai.objects.all().delete()
-        Pegawai.objects.all().delete()
-        Instansi.objects.all().delete()
-        self.stdout.write(self.style.SUCCESS('Successfully cleared existing data.'))
-
-        # Import Instansi
-        self.stdout.write('Importing Instansi...')
-        df_instansi = pd.read_sql('SELECT * FROM instansi', conn)
-        instansi_map = {}
-        for _, row in df_instansi.iterrows():
-            instansi = Instansi.objects.create(
-                nama_instansi=row['nama_instansi']
-            )
-            instansi_map[row['id']] = instansi
-        self.stdout.write(self.style.SUCCESS('Successfully imported Instansi.'))
-
-        # Import Pegawai
-        self.stdout.write('Importing Pegawai...')
-        df_pegawai = pd.read_sql('SELECT * FROM pegawai', conn)
-        pegawai_map = {}
-        for _, row in df_pegawai.iterrows():
-            pegawai = Pegawai.objects.create(
-                nama=row['nama'],
-                nip=row['nip'],
-                no_seri_karpeg=row['no_seri_karpeg'],
-                tempat_lahir=row['tempat_lahir'],
-                tanggal_lahir=row['tanggal_lahir'],
-                jenis_kelamin=row['jenis_kelamin'],
-                pangkat=row['pangkat'],
-                golongan=row['golongan'],
-                tmt_pangkat=row['tmt_pangkat'],
-                jabatan=row['jabatan'],
-                tmt_jabatan=row['tmt_jabatan'],
-                unit_kerja=row['unit_kerja'],
-            )
-            pegawai_map[row['id']] = pegawai
-        self.stdout.write(self.style.SUCCESS('Successfully imported Pegawai.'))
-
-        # Import Penilai
-        self.stdout.write('Importing Penilai...')
-        df_penilai = pd.read_sql('SELECT * FROM penilai', conn)
-        penilai_map = {}
-        for _, row in df_penilai.iterrows():
-            penilai = Penilai.objects.create(
-                nama=row['nama'],
-                nip=row['nip'],
-                no_seri_karpeg=row['no_seri_karpeg'],
-                tempat_lahir=row['tempat_lahir'],
-                tanggal_lahir=row['tanggal_lahir'],
-                jenis_kelamin=row['jenis_kelamin'],
-                pangkat=row['pangkat'],
-                golongan=row['golongan'],
-                tmt_pangkat=row['tmt_pangkat'],
-                jabatan=row['jabatan'],
-                tmt_jabatan=row['tmt_jabatan'],
-                unit_kerja=row['unit_kerja'],
-            )
-            penilai_map[row['id']] = penilai
-        self.stdout.write(self.style.SUCCESS('Successfully imported Penilai.'))
-
-        # Import AngkaIntegrasi
-        self.stdout.write('Importing AngkaIntegrasi...')
-        df_angka_integrasi = pd.read_sql('SELECT * FROM angka_integrasi', conn)
-        for _, row in df_angka_integrasi.iterrows():
-            pegawai = pegawai_map.get(row['pegawai_id'])
-            if pegawai:
-                AngkaIntegrasi.objects.create(
-                    pegawai=pegawai,
-                    jumlah_angka_integrasi=row['jumlah_angka_integrasi'],
-                )
-        self.stdout.write(self.style.SUCCESS('Successfully imported AngkaIntegrasi.'))
-
-        # Import AK
-        self.stdout.write('Importing AK...')
-        df_ak = pd.read_sql('SELECT * FROM ak', conn)
-        for _, row in df_ak.iterrows():
-            pegawai = pegawai_map.get(row['pegawai_id'])
-            instansi = instansi_map.get(row['instansi_id'])
-            penilai = penilai_map.get(row['penilai_id'])
-            if pegawai and instansi and penilai:
-                AK.objects.create(
-                    pegawai=pegawai,
-                    instansi=instansi,
-                    penilai=penilai,
-                    tanggal_awal_penilaian=row['tanggal_awal_penilaian'],
-                    tanggal_akhir_penilaian=row['tanggal_akhir_penilaian'],
-                    penilaian=row['penilaian'],
-                    prosentase=row['prosentase'],
-                    koefisien=row['koefisien'],
-                    jumlah_angka_kredit=row['jumlah_angka_kredit'],
-                    tanggal_ditetapkan=row['tanggal_ditetapkan'],
-                    tempat_ditetapkan=row['tempat_ditetapkan'],
-                    jenjang=row['jenjang'],
-                )
-        self.stdout.write(self.style.SUCCESS('Successfully imported AK.'))
-
-        conn.close()
\ No newline at end of file
+        # Children first; _raw_delete skips the per-row signals (the summaries
+        # are rebuilt and the PDF cache cleared at the end)
+        for model in (PegawaiCreditSummary, AK, AkPendidikan, AngkaIntegrasi, Penilai, Pegawai, Instansi):
+            model.objects.all()._raw_delete(model.objects.db)
+
+    def _map_foreign_keys(self, records, legacy_ids, id_maps):
+        """Replace legacy foreign key ids by the new ones, dropping rows whose parent was not imported."""
+        foreign_keys = [name for name in FOREIGN_KEYS if records and name in records[0]]
+        if not foreign_keys:
+            return records, legacy_ids, 0
+        mapped_records, mapped_ids = [], []
+        for legacy_id, record in zip(legacy_ids, records):
+            new_values = {name: id_maps[FOREIGN_KEYS[name]].get(record[name]) for name in foreign_keys}
+            if None in new_values.values():
+                continue
+            record.update(new_values)
+            mapped_records.append(record)
+            mapped_ids.append(legacy_id)
+        return mapped_records, mapped_ids, len(records) - len(mapped_records)
+
+    def _load(self, model, records, fields, key_fields):
+        """Insert (and with --incremental, update) ``records``; returns the counts per outcome."""
+        to_create, to_update = [], []
+        unchanged = 0
+        if self.incremental:
+            existing = _group(model.objects.order_by('id').values('id', *fields), key_fields)
+        else:
+            existing = {}
+        for key, group in _group(records, key_fields).items():
+            current_rows = existing.get(key, [])
+            for index, record in enumerate(group):
+                if index >= len(current_rows):
+                    to_create.append(model(**record))
+                elif any(current_rows[index][name] != record[name] for name in fields):
+                    to_update.append(model(id=current_rows[index]['id'], **record))
+                else:
+                    unchanged += 1
+
+        self._write(model, to_create, lambda batch: model.objects.bulk_create(batch), 'inserted')
+        if to_update:
+            # bulk_update does not apply auto_now, so updated_at is set here
+            now = timezone.now()
+            for instance in to_update:
+                instance.updated_at = now
+            self._write(model, to_update, lambda batch: model.objects.bulk_update(batch, [*fields, 'updated_at']),
+                        'updated')
+        return {'created': len(to_create), 'updated': len(to_update), 'unchanged': unchanged}
+
+    def _write(self, model, instances, write, verb):
+        done = 0
+        for batch in _batches(instances, self.batch_size):
+            write(batch)
+            done += len(batch)
+            if self.verbosity >= 2:
+                self.stdout.write(f'  {model._meta.object_name}: {done}/{len(instances)} {verb}')
+
+    def _report(self, model, read, stats):
+        self.stdout.write(
+            f"{model._meta.object_name}: {read} read, {stats['created']} created, {stats['updated']} updated, "
+            f"{stats['unchanged']} unchanged, {stats['skipped']} skipped."
+        )
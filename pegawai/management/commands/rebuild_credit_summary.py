@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+from pegawai.credit_summary import rebuild_credit_summaries, REBUILD_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Recompute the PegawaiCreditSummary rows from AK, AkPendidikan and AngkaIntegrasi'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pegawai', type=int, nargs='+', metavar='ID',
+                            help='Only rebuild these pegawai ids (default: all)')
+        parser.add_argument('--batch-size', type=int, default=REBUILD_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        written = rebuild_credit_summaries(options['pegawai'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {written} credit summaries in {time.perf_counter() - start:.2f}s.'
+        ))
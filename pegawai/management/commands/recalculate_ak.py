@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from pegawai.ak_credits import recalculate_ak, RECALCULATE_CHUNK_SIZE, RECALCULATED_FIELDS
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute prosentase, koefisien and jumlah_angka_kredit of the AK rows from the current '
+        'PENILAIAN_TO_PROSENTASE / JENJANG_TO_KOEFISIEN tables (vectorised with NumPy)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pegawai', type=int, nargs='+', metavar='ID',
+                            help='Only recalculate the AK rows of these pegawai ids (default: all)')
+        parser.add_argument('--chunk-size', type=int, default=RECALCULATE_CHUNK_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Only show the rows that would change')
+        parser.add_argument('--show', type=int, default=50,
+                            help='Number of changed rows to list (0 for none, -1 for all)')
+
+    def handle(self, *args, **options):
+        try:
+            import numpy  # noqa: F401
+        except ImportError:
+            raise CommandError('recalculate_ak needs NumPy (pip install numpy).')
+
+        shown = []
+
+        def show_change(pk, pegawai_id, old, new):
+            if options['show'] >= 0 and len(shown) >= options['show']:
+                return
+            shown.append(pk)
+            changes = ', '.join(
+                f'{field} {before:g} -> {after:g}'
+                for field, before, after in zip(RECALCULATED_FIELDS, old, new) if before != after
+            )
+            self.stdout.write(f'AK {pk} (pegawai {pegawai_id}): {changes}')
+
+        start = time.perf_counter()
+        checked, changed = recalculate_ak(
+            options['pegawai'], chunk_size=options['chunk_size'], dry_run=options['dry_run'],
+            on_change=show_change,
+        )
+        elapsed = time.perf_counter() - start
+        if len(shown) < changed:
+            self.stdout.write(f'... and {changed - len(shown)} more.')
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(
+                f'Dry run: {changed} of {checked} AK rows would change ({elapsed:.2f}s). Nothing was written.'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Updated {changed} of {checked} AK rows in {elapsed:.2f}s.'))
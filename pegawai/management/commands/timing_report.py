@@ -0,0 +1,108 @@
+import json
+import statistics
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+SORT_KEYS = {
+    'total': lambda row: row['total_p95'],
+    'queries': lambda row: row['queries_avg'],
+    'db': lambda row: row['db_avg'],
+    'count': lambda row: row['requests'],
+}
+
+
+def _percentile(values, percent):
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(percent / 100 * len(values)) - 1))
+    return values[index]
+
+
+def read_timing_lines(paths):
+    """Yield the JSON records of the given log files, skipping anything else."""
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                start = line.find('{')
+                if start < 0:
+                    continue
+                try:
+                    record = json.loads(line[start:])
+                except ValueError:
+                    continue
+                if isinstance(record, dict) and 'queries' in record and 'total_ms' in record:
+                    yield record
+
+
+def aggregate(records):
+    groups = defaultdict(list)
+    for record in records:
+        groups[record.get('url_name') or record.get('path') or '?'].append(record)
+
+    rows = []
+    for name, items in groups.items():
+        totals = [r['total_ms'] for r in items]
+        queries = [r['queries'] for r in items]
+        duplicated = Counter()
+        for r in items:
+            for duplicate in r.get('duplicates', []):
+                duplicated[duplicate['sql']] += duplicate['count']
+        rows.append({
+            'url_name': name,
+            'requests': len(items),
+            'total_p50': _percentile(totals, 50),
+            'total_p95': _percentile(totals, 95),
+            'queries_avg': statistics.mean(queries),
+            'queries_max': max(queries),
+            'db_avg': statistics.mean(r['db_ms'] for r in items),
+            'template_avg': statistics.mean(r.get('template_ms', 0) for r in items),
+            'duplicate_avg': statistics.mean(r.get('duplicate_queries', 0) for r in items),
+            'repeated_sql_avg': statistics.mean(r.get('repeated_sql', 0) for r in items),
+            'top_duplicate': duplicated.most_common(1)[0][0] if duplicated else '',
+        })
+    return rows
+
+
+class Command(BaseCommand):
+    help = 'Aggregate the request timing log (REQUEST_TIMING_ENABLED) into a per-URL-name report'
+
+    def add_arguments(self, parser):
+        parser.add_argument('logfiles', nargs='*', help='Log files (default: REQUEST_TIMING_LOG)')
+        parser.add_argument('--sort', choices=sorted(SORT_KEYS), default='total',
+                            help='Order by p95 total time, average queries, average DB time or request count')
+        parser.add_argument('--limit', type=int, default=0, help='Only show the first N URL names')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        paths = options['logfiles'] or [p for p in [getattr(settings, 'REQUEST_TIMING_LOG', '')] if p]
+        if not paths:
+            raise CommandError('No log file given and REQUEST_TIMING_LOG is not set.')
+        try:
+            rows = aggregate(read_timing_lines(paths))
+        except OSError as e:
+            raise CommandError(str(e))
+        rows.sort(key=SORT_KEYS[options['sort']], reverse=True)
+        if options['limit']:
+            rows = rows[:options['limit']]
+
+        if options['json']:
+            self.stdout.write(json.dumps(rows, indent=2))
+            return
+        if not rows:
+            self.stdout.write('No timing records found.')
+            return
+
+        self.stdout.write(
+            f"{'url name':<32} {'reqs':>5} {'p50 ms':>8} {'p95 ms':>8} {'queries':>8} {'max':>5} "
+            f"{'db ms':>7} {'tpl ms':>7} {'dup':>5} {'n+1':>5}"
+        )
+        for row in rows:
+            line = (
+                f"{row['url_name'][:32]:<32} {row['requests']:>5} {row['total_p50']:>8.1f} {row['total_p95']:>8.1f} "
+                f"{row['queries_avg']:>8.1f} {row['queries_max']:>5} {row['db_avg']:>7.1f} "
+                f"{row['template_avg']:>7.1f} {row['duplicate_avg']:>5.1f} {row['repeated_sql_avg']:>5.1f}"
+            )
+            self.stdout.write(self.style.WARNING(line) if row['duplicate_avg'] else line)
+            if row['top_duplicate']:
+                self.stdout.write(f"    most duplicated: {row['top_duplicate'][:150]}")
@@ -0,0 +1,116 @@
+# Generated by Django 4.2.30 on 2026-10-17 22:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+# Matches the SQL Django emits for nama__icontains on PostgreSQL:
+# UPPER("pegawai_pegawai"."nama"::text) LIKE UPPER('%...%')
+PEGAWAI_NAMA_TRGM_INDEX = 'pegawai_nama_trgm_idx'
+
+
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {PEGAWAI_NAMA_TRGM_INDEX} ON pegawai_pegawai '
+        'USING gin ((UPPER(nama::text)) gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {PEGAWAI_NAMA_TRGM_INDEX}')
+
+
+def build_summaries(apps, schema_editor):
+    from pegawai.credit_summary import rebuild_credit_summaries
+
+    rebuild_credit_summaries(apps=apps, using=schema_editor.connection.alias)
+
+
+def create_nama_fts(apps, schema_editor):
+    # Runs after every pegawai_pegawai change above: SQLite rebuilds the table
+    # for AddField, which would drop the search triggers
+    from pegawai.listing import create_nama_fts
+
+    create_nama_fts(schema_editor)
+
+
+def drop_nama_fts(apps, schema_editor):
+    from pegawai.listing import drop_nama_fts
+
+    drop_nama_fts(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pegawai', '0004_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PegawaiCreditSummary',
+            fields=[
+                ('pegawai', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='credit_summary', serialize=False, to='pegawai.pegawai')),
+                ('total_ak', models.FloatField(default=0.0, verbose_name='Total Angka Kredit')),
+                ('total_pendidikan', models.FloatField(default=0.0, verbose_name='Total AK Pendidikan')),
+                ('angka_integrasi', models.FloatField(blank=True, null=True, verbose_name='Angka Integrasi')),
+                ('jumlah_ak', models.IntegerField(default=0, verbose_name='Jumlah Data AK')),
+                ('jumlah_pendidikan', models.IntegerField(default=0, verbose_name='Jumlah Data AK Pendidikan')),
+                ('periode_awal', models.DateField(blank=True, null=True, verbose_name='Awal Periode Pertama')),
+                ('periode_akhir', models.DateField(blank=True, null=True, verbose_name='Akhir Periode Terakhir')),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='instansi',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='pegawai',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='penilai',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='ak',
+            index=models.Index(fields=['pegawai', 'tanggal_awal_penilaian'], name='ak_pegawai_awal_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ak',
+            index=models.Index(fields=['pegawai', 'tanggal_akhir_penilaian'], name='ak_pegawai_akhir_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='akpendidikan',
+            index=models.Index(fields=['pegawai', 'tanggal_awal_penilaian'], name='akpend_pegawai_awal_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='akpendidikan',
+            index=models.Index(fields=['pegawai', 'tanggal_akhir_penilaian'], name='akpend_pegawai_akhir_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pegawai',
+            index=models.Index(fields=['nama', 'id'], name='pegawai_nama_id_idx'),
+        ),
+        migrations.AddField(
+            model_name='pegawaicreditsummary',
+            name='latest_ak',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='pegawai.ak', verbose_name='AK Terakhir'),
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+        migrations.RunPython(create_nama_fts, drop_nama_fts),
+    ]
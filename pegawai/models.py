@@ -13,12 +13,21 @@ class Pegawai(models.Model):
     jabatan = models.CharField(max_length=255)
     tmt_jabatan = models.DateField()
     unit_kerja = models.CharField(max_length=255)
+    # Indexed for the MAX() of pegawai.conditional.data_version
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Lists are ordered by (pegawai__)nama, id; keyset pages seek on both
+            models.Index(fields=['nama', 'id'], name='pegawai_nama_id_idx'),
+        ]
 
     def __str__(self):
         return self.nama
 
 class Instansi(models.Model):
     nama_instansi = models.CharField(max_length=255, unique=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.nama_instansi
@@ -36,6 +45,7 @@ class Penilai(models.Model):
     jabatan = models.CharField(max_length=255)
     tmt_jabatan = models.DateField()
     unit_kerja = models.CharField(max_length=255)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.nama
@@ -44,6 +54,7 @@ class Penilai(models.Model):
 class AngkaIntegrasi(models.Model):
     pegawai = models.ForeignKey(Pegawai, on_delete=models.CASCADE)
     jumlah_angka_integrasi = models.FloatField()
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.pegawai.nama} - {self.jumlah_angka_integrasi}"
@@ -63,6 +74,7 @@ class AK(models.Model):
     tempat_ditetapkan = models.CharField(max_length=255)
     jenjang = models.CharField(max_length=255)
     Nomor_AK = models.CharField(max_length=255, blank=True, null=True, verbose_name="Nomor AK")
+    updated_at = models.DateTimeField(auto_now=True)
     # jumlah_angka_kredit = models.DecimalField(
     #     max_digits=10,
     #     decimal_places=3,
@@ -70,6 +82,13 @@ class AK(models.Model):
     #     blank=True
     # )
 
+    class Meta:
+        indexes = [
+            # Reports read a pegawai's rows ordered by period start, or look up the latest period end
+            models.Index(fields=['pegawai', 'tanggal_awal_penilaian'], name='ak_pegawai_awal_idx'),
+            models.Index(fields=['pegawai', 'tanggal_akhir_penilaian'], name='ak_pegawai_akhir_idx'),
+        ]
+
     def __str__(self):
         return f"{self.pegawai.nama} - {self.tanggal_awal_penilaian} to {self.tanggal_akhir_penilaian}"
 
@@ -91,48 +110,52 @@ class AkPendidikan(models.Model):
     tempat_ditetapkan = models.CharField(max_length=255, verbose_name="Tempat Ditentukan")
     nomor_sertifikat = models.CharField(max_length=255, verbose_name="Nomor Sertifikat", unique=True)
     file_sertifikat = models.FileField(upload_to='sertifikat_pendidikan/', verbose_name="File Sertifikat", blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Terakhir Diubah")
 
     def save(self, *args, **kwargs):
         # Only auto-calculate jumlah_angka_kredit if it's not already set (0 or None)
         if not self.jumlah_angka_kredit or self.jumlah_angka_kredit == 0:
             # Calculate jumlah_angka_kredit as 25% of the minimal credit required for promotion
             # based on the employee's current rank
-            from .constants import MINIMAL_AK_MAPPING, GOLONGAN_HIERARKI, PANGKAT_OPTIONS
+            from .constants import get_promotion
 
             try:
-                # Get the employee's current rank/golongan
-                current_golongan = self.pegawai.golongan
-
-                # Find the next rank for this employee
-                if current_golongan in GOLONGAN_HIERARKI:
-                    current_idx = GOLONGAN_HIERARKI.index(current_golongan)
-                    if current_idx < len(GOLONGAN_HIERARKI) - 1:
-                        next_golongan = GOLONGAN_HIERARKI[current_idx + 1]
-
-                        # Look up the minimal credit required for promotion
-                        key = (current_golongan, next_golongan)
-                        if key in MINIMAL_AK_MAPPING:
-                            pangkat_minimal, jenjang_minimal = MINIMAL_AK_MAPPING[key]
-
-                            # Use the higher of the two values for calculation
-                            minimal_credit = max(pangkat_minimal, jenjang_minimal) if jenjang_minimal is not None else pangkat_minimal
-
-                            # Calculate 25% of the minimal credit required for promotion
-                            self.jumlah_angka_kredit = minimal_credit * 0.25
-                        else:
-                            # If no mapping exists, set a default value or leave as 0
-                            self.jumlah_angka_kredit = 0.0
-                    else:
-                        # Employee is at the highest rank
-                        self.jumlah_angka_kredit = 0.0
-                else:
-                    # Current golongan not in hierarchy, set default
-                    self.jumlah_angka_kredit = 0.0
+                # 25% of the higher of the pangkat/jenjang minimal for the next rank;
+                # 0 at the highest rank or for a golongan outside the hierarchy
+                self.jumlah_angka_kredit = get_promotion(self.pegawai.golongan).pendidikan_ak
             except Exception as e:
                 # In case of any error, set to 0 to allow manual entry
                 self.jumlah_angka_kredit = 0.0
 
         super().save(*args, **kwargs)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['pegawai', 'tanggal_awal_penilaian'], name='akpend_pegawai_awal_idx'),
+            models.Index(fields=['pegawai', 'tanggal_akhir_penilaian'], name='akpend_pegawai_akhir_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.pegawai.nama} - {self.jenis_kegiatan} ({self.tanggal_pelaksanaan})"
+
+class PegawaiCreditSummary(models.Model):
+    """
+    Per-pegawai totals of AK, AkPendidikan and AngkaIntegrasi.
+
+    Kept up to date by pegawai.credit_summary (via the signals in
+    pegawai.signals); rebuild with ``manage.py rebuild_credit_summary``.
+    """
+
+    pegawai = models.OneToOneField(Pegawai, on_delete=models.CASCADE, primary_key=True, related_name='credit_summary')
+    total_ak = models.FloatField(default=0.0, verbose_name="Total Angka Kredit")
+    total_pendidikan = models.FloatField(default=0.0, verbose_name="Total AK Pendidikan")
+    angka_integrasi = models.FloatField(blank=True, null=True, verbose_name="Angka Integrasi")
+    jumlah_ak = models.IntegerField(default=0, verbose_name="Jumlah Data AK")
+    jumlah_pendidikan = models.IntegerField(default=0, verbose_name="Jumlah Data AK Pendidikan")
+    latest_ak = models.ForeignKey(AK, on_delete=models.SET_NULL, blank=True, null=True, related_name='+', verbose_name="AK Terakhir")
+    periode_awal = models.DateField(blank=True, null=True, verbose_name="Awal Periode Pertama")
+    periode_akhir = models.DateField(blank=True, null=True, verbose_name="Akhir Periode Terakhir")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
     def __str__(self):
-        return f"{self.pegawai.nama} - {self.jenis_kegiatan} ({self.tanggal_pelaksanaan})"
\ No newline at end of file
+        return f"{self.pegawai_id} - {self.total_ak}"
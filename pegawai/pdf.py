@@ -0,0 +1,199 @@
+"""
+Low-level HTML to PDF conversion with xhtml2pdf.
+
+This module must not import anything that needs the Django app registry
+(models, views, ...): its functions are executed inside worker processes
+that never call ``django.setup()``.
+
+Conversion goes through one resident ``PdfRenderer`` per process. It keeps
+the parsed stylesheets of the report templates between documents (the
+``<style>`` blocks and xhtml2pdf's default CSS are identical on every
+render) and records how long each phase of a conversion took.
+"""
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from io import BytesIO
+
+# Phases of a report PDF, in order. "template" is measured by the caller
+# (pegawai.utils), the others inside xhtml2pdf.
+PDF_PHASES = ('template', 'parse', 'layout', 'write')
+CSS_CACHE_SIZE = 64
+
+WARM_UP_HTML = """
+<html><head><style>
+  body { font-family: Times-Roman; font-size: 11pt; }
+  th { font-family: Helvetica-Bold; }
+</style></head>
+<body><table><tr><th>AppAK</th><td><b>PDF</b> <i>warm-up</i></td></tr></table></body></html>
+"""
+
+
+class PdfRenderError(Exception):
+    """Raised when xhtml2pdf reports errors while converting a document."""
+
+
+_local = threading.local()
+
+
+@contextmanager
+def _phase(name):
+    """Add the time spent in the block to phase ``name`` of the running conversion, if any."""
+    timings = getattr(_local, 'timings', None)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+
+def _css_cacheable(text):
+    # @page, @frame, @font-face and @import change the document (page
+    # templates, fonts) while they are parsed, so only plain rules and
+    # @media blocks can be parsed once and reused.
+    return '@' not in text.replace('@media', '')
+
+
+class PdfRenderer:
+    """
+    Process-wide xhtml2pdf renderer.
+
+    ``install()`` (done on first use) swaps the context and document classes
+    xhtml2pdf.document builds each conversion from for subclasses that reuse
+    parsed stylesheets and time the parse and layout phases. ReportLab keeps
+    its registered fonts for the life of the process, so a warm-up render
+    also leaves the standard fonts loaded.
+    """
+
+    def __init__(self, css_cache_size=CSS_CACHE_SIZE):
+        self.css_cache_size = css_cache_size
+        self._css_cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._installed = False
+        self.css_hits = 0
+        self.css_misses = 0
+
+    def install(self):
+        if self._installed:
+            return
+        with self._lock:
+            if self._installed:
+                return
+            from xhtml2pdf import document
+
+            renderer = self
+            base_context = document.pisaContext
+            base_doc = document.PmlBaseDoc
+            pisa_story = document.pisaStory
+
+            class ResidentContext(base_context):
+                def _parseCSSSource(self, text, sourceName):
+                    if not _css_cacheable(text):
+                        return super()._parseCSSSource(text, sourceName)
+                    return renderer._cached_stylesheet(
+                        (text, sourceName), lambda: super(ResidentContext, self)._parseCSSSource(text, sourceName)
+                    )
+
+            class TimedDoc(base_doc):
+                def build(self, *args, **kwargs):
+                    with _phase('layout'):
+                        return super().build(*args, **kwargs)
+
+                def multiBuild(self, *args, **kwargs):
+                    with _phase('layout'):
+                        return super().multiBuild(*args, **kwargs)
+
+            def timed_story(*args, **kwargs):
+                with _phase('parse'):
+                    return pisa_story(*args, **kwargs)
+
+            document.pisaContext = ResidentContext
+            document.PmlBaseDoc = TimedDoc
+            document.pisaStory = timed_story
+            self._installed = True
+
+    def _cached_stylesheet(self, key, parse):
+        with self._lock:
+            stylesheet = self._css_cache.get(key)
+            if stylesheet is not None:
+                self._css_cache.move_to_end(key)
+                self.css_hits += 1
+                return stylesheet
+        stylesheet = parse()
+        with self._lock:
+            self.css_misses += 1
+            self._css_cache[key] = stylesheet
+            while len(self._css_cache) > self.css_cache_size:
+                self._css_cache.popitem(last=False)
+        return stylesheet
+
+    def render(self, html):
+        """
+        Convert ``html`` to PDF. Returns ``(pdf_bytes, timings)`` where
+        timings maps "parse", "layout" and "write" to milliseconds.
+        Raises PdfRenderError on failure.
+        """
+        self.install()
+        from xhtml2pdf import pisa
+
+        timings = {}
+        _local.timings = timings
+        start = time.perf_counter()
+        try:
+            result = BytesIO()
+            pdf = pisa.CreatePDF(html, dest=result, encoding='utf-8')
+        finally:
+            _local.timings = None
+        total = (time.perf_counter() - start) * 1000
+        if pdf.err:
+            raise PdfRenderError(f"Error generating PDF: {pdf.err}")
+        timings['write'] = max(total - timings.get('parse', 0.0) - timings.get('layout', 0.0), 0.0)
+        return result.getvalue(), timings
+
+    def warm_up(self, documents=()):
+        """
+        Import xhtml2pdf/ReportLab, load the standard fonts and parse the
+        stylesheets of ``documents`` (HTML strings) ahead of the first request.
+        Returns the time taken in milliseconds; failures are ignored.
+        """
+        start = time.perf_counter()
+        for html in (WARM_UP_HTML, *documents):
+            try:
+                self.render(html)
+            except Exception:
+                pass
+        return (time.perf_counter() - start) * 1000
+
+
+renderer = PdfRenderer()
+
+
+def format_server_timing(timings):
+    """Format phase timings as a Server-Timing header value."""
+    return ', '.join(
+        f'pdf-{phase};dur={timings[phase]:.1f}' for phase in PDF_PHASES if phase in timings
+    )
+
+
+def html_to_pdf_timed(html):
+    """Convert an HTML string to PDF; returns ``(pdf_bytes, timings)``."""
+    return renderer.render(html)
+
+
+def html_to_pdf(html):
+    """Convert an HTML string to PDF bytes. Raises PdfRenderError on failure."""
+    return renderer.render(html)[0]
+
+
+def html_to_pdf_safe(html):
+    """
+    Like html_to_pdf, but returns ``(pdf_bytes, None)`` or ``(None, error_message)``
+    instead of raising, so a single bad document does not abort an
+    ``Executor.map`` over many documents.
+    """
+    try:
+        return html_to_pdf(html), None
+    except Exception as e:
+        return None, str(e) or e.__class__.__name__
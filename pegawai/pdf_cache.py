@@ -0,0 +1,183 @@
+"""
+Content-addressed cache for generated report PDFs.
+
+Entries are keyed on a hash of everything a report is built from (the
+pegawai, the selection parameters and the id/modification stamp of every
+row involved), so a changed row always produces a new key. On top of that
+the signal handlers in ``pegawai.signals`` drop a pegawai's entries as soon
+as one of its rows is edited, so stale PDFs do not linger until eviction.
+
+There are two tiers: a per-process in-memory LRU and a shared on-disk LRU,
+both bounded by size in bytes.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import date
+
+from django.conf import settings
+
+
+def _model_fields(instance):
+    if instance is None:
+        return None
+    return [(field.attname, getattr(instance, field.attname)) for field in instance._meta.concrete_fields]
+
+
+def report_cache_key(report_type, snapshot, **params):
+    """
+    Build the cache key of a report of ``report_type`` built from ``snapshot``
+    (a pegawai.reports.ReportSnapshot) with the given selection ``params``.
+    """
+    pegawai = snapshot.pegawai
+    rows = [('ak', ak.id, ak.updated_at) for ak in snapshot.ak_records]
+    if snapshot.angka_integrasi:
+        rows.append(('integrasi', snapshot.angka_integrasi.id, snapshot.angka_integrasi.updated_at))
+    rows += [('pendidikan', ak_pend.id, ak_pend.updated_at) for ak_pend in snapshot.ak_pendidikan_records]
+    stamps = [stamp for _, _, stamp in rows if stamp]
+
+    # Instansi and Penilai names are printed on the reports too
+    instansi = {ak.instansi_id: _model_fields(ak.instansi) for ak in snapshot.ak_records}
+    penilai = {ak.penilai_id: _model_fields(ak.penilai) for ak in snapshot.ak_records}
+
+    payload = {
+        'report': report_type,
+        'pegawai': _model_fields(pegawai),
+        'params': params,
+        'rows': [(kind, row_id) for kind, row_id, _ in rows],
+        'max_modified': max(stamps) if stamps else None,
+        'instansi': sorted(instansi.items()),
+        'penilai': sorted(penilai.items()),
+        # Reports without AK rows fall back to today's date
+        'today': date.today(),
+    }
+    digest = hashlib.sha256(json.dumps(payload, default=str, sort_keys=True).encode('utf-8')).hexdigest()
+    return f"{pegawai.pk}-{digest}"
+
+
+class PdfCache:
+    """Two-tier (memory + disk) LRU cache of PDF bytes."""
+
+    def __init__(self, directory, memory_max_bytes, disk_max_bytes):
+        self.directory = directory
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def get(self, key):
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                return data
+
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)  # Mark as recently used for disk eviction
+        except OSError:
+            return None
+        self._remember(key, data)
+        return data
+
+    def set(self, key, data):
+        self._remember(key, data)
+        if self.disk_max_bytes <= 0 or len(data) > self.disk_max_bytes:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+            self._evict_disk()
+        except OSError:
+            pass  # The disk tier is best effort
+
+    def _remember(self, key, data):
+        if len(data) > self.memory_max_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_bytes -= len(old)
+            self._memory[key] = data
+            self._memory_bytes += len(data)
+            while self._memory_bytes > self.memory_max_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    def _disk_entries(self, prefix=''):
+        try:
+            with os.scandir(self.directory) as it:
+                return [entry for entry in it if entry.name.startswith(prefix) and entry.name.endswith('.pdf')]
+        except OSError:
+            return []
+
+    def _evict_disk(self):
+        entries = []
+        for entry in self._disk_entries():
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def invalidate_pegawai(self, pegawai_id):
+        """Drop every cached report of one pegawai."""
+        prefix = f"{pegawai_id}-"
+        with self._lock:
+            for key in [k for k in self._memory if k.startswith(prefix)]:
+                self._memory_bytes -= len(self._memory.pop(key))
+        for entry in self._disk_entries(prefix):
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+        for entry in self._disk_entries():
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+_pdf_cache = None
+_pdf_cache_lock = threading.Lock()
+
+
+def get_pdf_cache():
+    """Return the process-wide PdfCache, or None when PDF_CACHE_ENABLED is off."""
+    global _pdf_cache
+    if not getattr(settings, 'PDF_CACHE_ENABLED', True):
+        return None
+    with _pdf_cache_lock:
+        if _pdf_cache is None:
+            _pdf_cache = PdfCache(
+                directory=getattr(settings, 'PDF_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'appak_pdf_cache')),
+                memory_max_bytes=getattr(settings, 'PDF_CACHE_MEMORY_MAX_BYTES', 32 * 1024 * 1024),
+                disk_max_bytes=getattr(settings, 'PDF_CACHE_DISK_MAX_BYTES', 256 * 1024 * 1024),
+            )
+        return _pdf_cache
@@ -0,0 +1,236 @@
+"""
+Background PDF rendering jobs.
+
+The report HTML is rendered in the request (it needs the database), the
+slow HTML to PDF conversion runs on a small worker pool. Job state and
+results live in PDF_JOB_DIR as ``<id>.json`` / ``<id>.pdf`` so any web worker
+can answer status and download requests; jobs older than PDF_JOB_TTL
+seconds are removed. A job not finished PDF_JOB_TIMEOUT seconds after it
+was queued (e.g. a hung conversion, or a worker that died) is reported as
+failed, so pages polling it stop waiting.
+
+That needs a process that keeps running after the response and a
+PDF_JOB_DIR shared by the workers, which a serverless deployment has
+neither of: there PDF_BACKGROUND_JOBS is off and the reports are rendered
+in the request.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+
+from .pdf import html_to_pdf_timed
+
+JOB_PENDING = 'pending'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+
+def pdf_jobs_enabled():
+    return getattr(settings, 'PDF_BACKGROUND_JOBS', True)
+
+
+class PdfJobStore:
+    """Filesystem storage of job metadata and rendered PDFs."""
+
+    def __init__(self, directory, ttl, timeout=300):
+        self.directory = directory
+        self.ttl = ttl
+        self.timeout = timeout
+
+    def _meta_path(self, job_id):
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def pdf_path(self, job_id):
+        return os.path.join(self.directory, f"{job_id}.pdf")
+
+    def _write_meta(self, job):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(job, f)
+        os.replace(tmp_path, self._meta_path(job['id']))
+
+    def create(self, filename, content_type='application/pdf', timeout=None):
+        job = {
+            'id': str(uuid.uuid4()),
+            'status': JOB_PENDING,
+            'filename': filename,
+            'content_type': content_type,
+            'error': '',
+            'created': time.time(),
+            'timeout': timeout or self.timeout,
+            'finished': None,
+            'timings': {},
+        }
+        self._write_meta(job)
+        return job
+
+    def get(self, job_id):
+        """
+        Return the job dict, or None if it does not exist or has expired.
+        An unfinished job past its timeout is marked failed.
+        """
+        try:
+            with open(self._meta_path(job_id)) as f:
+                job = json.load(f)
+        except (OSError, ValueError):
+            return None
+        age = time.time() - job['created']
+        if age > self.ttl:
+            self.delete(job_id)
+            return None
+        if job['status'] in (JOB_PENDING, JOB_RUNNING) and age > job.get('timeout', self.timeout):
+            job.update(status=JOB_FAILED, error='Waktu pembuatan PDF habis.', finished=time.time())
+            self._write_meta(job)
+        return job
+
+    def start(self, job_id):
+        """Mark a pending job running; None if it is gone or has already failed (timed out)."""
+        job = self.get(job_id)
+        if job is None or job['status'] != JOB_PENDING:
+            return None
+        return self.update(job_id, status=JOB_RUNNING)
+
+    def update(self, job_id, **changes):
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.update(changes)
+        self._write_meta(job)
+        return job
+
+    def save_pdf(self, job_id, pdf):
+        return self.save_result(job_id, lambda f: f.write(pdf))
+
+    def save_result(self, job_id, write):
+        """Store what ``write(file)`` writes to a binary file as the job's result and mark it done."""
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        job = self.get(job_id)
+        if job is None or job['status'] == JOB_FAILED:
+            # Timed out while writing: the job stays failed
+            os.remove(tmp_path)
+            return job
+        os.replace(tmp_path, self.pdf_path(job_id))
+        return self.update(job_id, status=JOB_DONE, finished=time.time())
+
+    def delete(self, job_id):
+        for path in (self._meta_path(job_id), self.pdf_path(job_id)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def prune(self):
+        """Remove expired jobs (and stray temporary files)."""
+        cutoff = time.time() - self.ttl
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return
+        for entry in entries:
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'PDF_JOB_WORKERS', 2),
+                thread_name_prefix='pdf-job',
+            )
+        return _executor
+
+
+def get_job_store():
+    return PdfJobStore(
+        directory=getattr(settings, 'PDF_JOB_DIR', os.path.join(tempfile.gettempdir(), 'appak_pdf_jobs')),
+        ttl=getattr(settings, 'PDF_JOB_TTL', 3600),
+        timeout=getattr(settings, 'PDF_JOB_TIMEOUT', 300),
+    )
+
+
+def _run_job(store, job_id, html, on_success, timings):
+    if store.start(job_id) is None:
+        return
+    try:
+        pdf, pdf_timings = html_to_pdf_timed(html)
+    except Exception as e:
+        store.update(job_id, status=JOB_FAILED, error=str(e) or e.__class__.__name__, finished=time.time())
+        return
+    timings = {**timings, **pdf_timings}
+    store.update(job_id, timings=timings)
+    store.save_pdf(job_id, pdf)
+    if on_success:
+        on_success(pdf)
+
+
+def submit_pdf_job(html, filename, on_success=None, timings=None):
+    """
+    Queue the conversion of ``html`` to PDF and return the new job dict.
+    ``on_success(pdf_bytes)`` is called on the worker thread when it finishes.
+    ``timings`` (e.g. the template render time) is stored with the job
+    together with the conversion's phase timings.
+    """
+    store = get_job_store()
+    store.prune()
+    job = store.create(filename)
+    _get_executor().submit(_run_job, store, job['id'], html, on_success, timings or {})
+    return job
+
+
+def _run_file_job(store, job_id, write):
+    if store.start(job_id) is None:
+        return
+    try:
+        store.save_result(job_id, write)
+    except Exception as e:
+        store.update(job_id, status=JOB_FAILED, error=str(e) or e.__class__.__name__, finished=time.time())
+    finally:
+        # ``write`` may query the database on this worker thread
+        connections.close_all()
+
+
+def submit_file_job(filename, write, content_type, timeout=None):
+    """
+    Queue ``write(file)``, which produces the whole result (e.g. the ZIP of
+    a batch of reports) into a binary file, and return the new job dict.
+    Unlike submit_pdf_job the work, database queries included, runs on the
+    worker thread. ``timeout`` overrides PDF_JOB_TIMEOUT for this job.
+    """
+    store = get_job_store()
+    store.prune()
+    job = store.create(filename, content_type=content_type, timeout=timeout)
+    _get_executor().submit(_run_file_job, store, job['id'], write)
+    return job
+
+
+def completed_pdf_job(pdf, filename):
+    """Record an already available PDF (e.g. from the PDF cache) as a finished job."""
+    store = get_job_store()
+    store.prune()
+    job = store.create(filename)
+    return store.save_pdf(job['id'], pdf)
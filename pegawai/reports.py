@@ -0,0 +1,326 @@
+from datetime import datetime
+
+from dateutil.relativedelta import relativedelta
+from django.utils.functional import cached_property
+
+from .constants import get_promotion, normalize_golongan
+from .models import AK, AngkaIntegrasi, AkPendidikan
+
+
+class ReportSnapshot:
+    """
+    In-memory snapshot of everything the Konversi, Akumulasi and Penetapan
+    reports need for one pegawai.
+
+    Each relation is loaded at most once (AK rows together with their instansi
+    and penilai), so building several reports from the same snapshot costs a
+    fixed number of queries regardless of how many periods are selected.
+    """
+
+    def __init__(self, pegawai):
+        self.pegawai = pegawai
+
+    @classmethod
+    def for_pegawai_list(cls, pegawai_list, chunk_size=500):
+        """
+        Build snapshots for many pegawai at once, using one query per relation
+        for every ``chunk_size`` pegawai instead of three queries per pegawai.
+        """
+        snapshots = [cls(pegawai) for pegawai in pegawai_list]
+        for start in range(0, len(snapshots), chunk_size):
+            by_id = {snapshot.pegawai.id: snapshot for snapshot in snapshots[start:start + chunk_size]}
+            for snapshot in by_id.values():
+                snapshot.__dict__.update(ak_records=[], angka_integrasi=None, ak_pendidikan_records=[])
+
+            ak_qs = (
+                AK.objects.filter(pegawai_id__in=by_id)
+                .select_related('instansi', 'penilai')
+                .order_by('tanggal_awal_penilaian', 'id')
+            )
+            for ak in ak_qs:
+                by_id[ak.pegawai_id].ak_records.append(ak)
+            # Reverse order so that the lowest id wins, like .first() does
+            for integrasi in AngkaIntegrasi.objects.filter(pegawai_id__in=by_id).order_by('-id'):
+                by_id[integrasi.pegawai_id].angka_integrasi = integrasi
+            for ak_pend in AkPendidikan.objects.filter(pegawai_id__in=by_id).order_by('id'):
+                by_id[ak_pend.pegawai_id].ak_pendidikan_records.append(ak_pend)
+        return snapshots
+
+    @cached_property
+    def ak_records(self):
+        """All AK rows of the pegawai, ordered by tanggal_awal_penilaian."""
+        return list(
+            AK.objects.filter(pegawai=self.pegawai)
+            .select_related('instansi', 'penilai')
+            .order_by('tanggal_awal_penilaian', 'id')
+        )
+
+    @cached_property
+    def angka_integrasi(self):
+        return AngkaIntegrasi.objects.filter(pegawai=self.pegawai).order_by('id').first()
+
+    @cached_property
+    def ak_pendidikan_records(self):
+        return list(AkPendidikan.objects.filter(pegawai=self.pegawai).order_by('id'))
+
+    @cached_property
+    def latest_ak(self):
+        """The AK row with the latest tanggal_akhir_penilaian, regardless of any selection."""
+        if not self.ak_records:
+            return None
+        return max(self.ak_records, key=lambda ak: (ak.tanggal_akhir_penilaian, ak.id))
+
+    @property
+    def ak_ids(self):
+        return [ak.id for ak in self.ak_records]
+
+    @property
+    def ak_pendidikan_total(self):
+        return sum(ak_pend.jumlah_angka_kredit for ak_pend in self.ak_pendidikan_records)
+
+    def default_selection(self):
+        """
+        The selection used when no period is chosen: every AK row, plus
+        integrasi and pendidikan when the pegawai has them.
+        Returns ``(ak_ids, include_integrasi, include_pendidikan)``.
+        """
+        return self.ak_ids, bool(self.angka_integrasi), bool(self.ak_pendidikan_records)
+
+    def select(self, ak_ids):
+        """Return the AK rows whose id is in ``ak_ids``, or all rows if ``ak_ids`` is empty."""
+        if not ak_ids:
+            return list(self.ak_records)
+        wanted = set()
+        for ak_id in ak_ids:
+            try:
+                wanted.add(int(ak_id))
+            except (TypeError, ValueError):
+                pass  # Ignore invalid IDs
+        return [ak for ak in self.ak_records if ak.id in wanted]
+
+
+def _jabatan_dan_tmt(pegawai):
+    # Use the actual job title from the employee record instead of defaulting to "Analis"
+    tmt_jabatan_str = pegawai.tmt_jabatan.strftime('%d-%m-%Y') if pegawai.tmt_jabatan else ""
+    return f"{pegawai.jabatan} / {tmt_jabatan_str}" if tmt_jabatan_str else pegawai.jabatan
+
+
+def _tahun(latest_ak):
+    if latest_ak and latest_ak.tanggal_akhir_penilaian:
+        return latest_ak.tanggal_akhir_penilaian.year
+    if latest_ak and latest_ak.tanggal_ditetapkan:
+        return latest_ak.tanggal_ditetapkan.year
+    return datetime.now().year
+
+
+def _periode_strings(ak_records):
+    min_tgl_awal = min((ak.tanggal_awal_penilaian for ak in ak_records if ak.tanggal_awal_penilaian), default=None)
+    max_tgl_akhir = max((ak.tanggal_akhir_penilaian for ak in ak_records if ak.tanggal_akhir_penilaian), default=None)
+    periode_awal_str = min_tgl_awal.strftime('%d-%m-%Y') if min_tgl_awal else ''
+    periode_akhir_str = max_tgl_akhir.strftime('%d-%m-%Y') if max_tgl_akhir else ''
+    return periode_awal_str, periode_akhir_str
+
+
+def _penetapan_fields(ak):
+    """Signature block fields shared by all three reports, taken from ``ak``."""
+    return {
+        'tempat_ditetapkan': ak.tempat_ditetapkan if ak else '',
+        'tanggal_ditetapkan': ak.tanggal_ditetapkan if ak else datetime.now().date(),
+        'nama_penilai': ak.penilai.nama if ak and ak.penilai else '',
+        'nip_penilai': ak.penilai.nip if ak and ak.penilai else '',
+        'pangkat_penilai': ak.penilai.pangkat if ak and ak.penilai else '',
+        'golongan_penilai': ak.penilai.golongan if ak and ak.penilai else '',
+        'crud_angka_kredit': ak.Nomor_AK if ak and ak.Nomor_AK else '',
+    }
+
+
+def build_konversi_report(snapshot, ak_record_ids, include_integrasi, include_pendidikan=False):
+    """Build the Konversi report data. Returns ``(report_data, ak_list_for_report)``."""
+    pegawai = snapshot.pegawai
+    ak_list_for_report = snapshot.select(ak_record_ids)
+    latest_ak = snapshot.latest_ak
+
+    periode_awal_str, periode_akhir_str = _periode_strings(ak_list_for_report)
+
+    total_angka_kredit = 0.0
+    for ak_item in ak_list_for_report:
+        total_angka_kredit += ak_item.jumlah_angka_kredit
+
+    angka_integrasi_value = 0.0
+    if include_integrasi:
+        angka_integrasi_obj = snapshot.angka_integrasi
+        if angka_integrasi_obj:
+            angka_integrasi_value = angka_integrasi_obj.jumlah_angka_integrasi
+            total_angka_kredit += angka_integrasi_value
+
+    # Handle Ak Pendidikan
+    ak_pendidikan_value = 0.0
+    ak_pendidikan_list = []
+    if include_pendidikan:
+        for ak_pend in snapshot.ak_pendidikan_records:
+            ak_pendidikan_value += ak_pend.jumlah_angka_kredit
+            # Create a dictionary representation for display in the template
+            ak_pendidikan_list.append({
+                'id': f'pendidikan_{ak_pend.id}',
+                'jenis_kegiatan': ak_pend.jenis_kegiatan,
+                'tanggal_pelaksanaan': ak_pend.tanggal_pelaksanaan,
+                'jumlah_angka_kredit': ak_pend.jumlah_angka_kredit,
+                'is_pendidikan_item': True,
+                'nomor_sertifikat': ak_pend.nomor_sertifikat,
+            })
+
+        total_angka_kredit += ak_pendidikan_value
+
+    report_data = {
+        'pegawai': pegawai,
+        'ak_list': ak_list_for_report,
+        'tahun': _tahun(latest_ak),
+        'nama_instansi': latest_ak.instansi.nama_instansi if latest_ak else '',
+        'periode_awal_str': periode_awal_str,
+        'periode_akhir_str': periode_akhir_str,
+        'jabatan_dan_tmt': _jabatan_dan_tmt(pegawai),
+        'total_angka_kredit': total_angka_kredit,
+        'include_angka_integrasi': include_integrasi,
+        'angka_integrasi_value': angka_integrasi_value,
+        'include_ak_pendidikan': include_pendidikan,
+        'ak_pendidikan_value': ak_pendidikan_value,
+        'ak_pendidikan_list': ak_pendidikan_list,
+    }
+    report_data.update(_penetapan_fields(latest_ak))
+    return report_data, ak_list_for_report
+
+
+def build_akumulasi_report(snapshot, selected_ak_ids, include_integrasi_filter, include_pendidikan_filter=False):
+    """Build the Akumulasi report data."""
+    pegawai = snapshot.pegawai
+    ak_list_for_report = snapshot.select(selected_ak_ids)
+    latest_ak_unfiltered = snapshot.latest_ak
+    latest_ak = ak_list_for_report[-1] if ak_list_for_report else None
+
+    periode_awal_str, periode_akhir_str = _periode_strings(ak_list_for_report)
+
+    total_angka_kredit = sum(ak.jumlah_angka_kredit for ak in ak_list_for_report)
+
+    for ak_item in ak_list_for_report:
+        if ak_item.tanggal_awal_penilaian and ak_item.tanggal_akhir_penilaian:
+            rdelta = relativedelta(ak_item.tanggal_akhir_penilaian, ak_item.tanggal_awal_penilaian)
+            months = rdelta.years * 12 + rdelta.months
+            if rdelta.days > 0: months += 1
+            if months == 0: months = 1
+            ak_item.periode_bulan = months
+        else:
+            ak_item.periode_bulan = 0
+
+    angka_integrasi_obj = None
+    if include_integrasi_filter:
+        angka_integrasi_obj = snapshot.angka_integrasi
+        if angka_integrasi_obj:
+            angka_integrasi_value = angka_integrasi_obj.jumlah_angka_integrasi
+            total_angka_kredit += angka_integrasi_value
+            ak_list_for_report.insert(0, {
+                'penilaian': 'AK Integrasi',
+                'jumlah_angka_kredit': angka_integrasi_value,
+                'is_integrasi_item': True,
+                'periode_bulan': None,
+            })
+
+    # Handle Ak Pendidikan
+    if include_pendidikan_filter and snapshot.ak_pendidikan_records:
+        ak_pendidikan_total = snapshot.ak_pendidikan_total
+        total_angka_kredit += ak_pendidikan_total
+        # Insert after integrasi if present, otherwise at the beginning
+        insert_index = 1 if angka_integrasi_obj else 0
+        ak_list_for_report.insert(insert_index, {
+            'penilaian': 'AK Pendidikan',
+            'jumlah_angka_kredit': ak_pendidikan_total,
+            'is_pendidikan_item': True,
+            'periode_bulan': None,
+        })
+
+    report_data = {
+        'pegawai': pegawai,
+        'ak_list': ak_list_for_report,
+        'tahun': _tahun(latest_ak_unfiltered),
+        'nama_instansi': latest_ak.instansi.nama_instansi if latest_ak else '',
+        'periode_awal_str': periode_awal_str,
+        'periode_akhir_str': periode_akhir_str,
+        'jabatan_dan_tmt': _jabatan_dan_tmt(pegawai),
+        'total_angka_kredit': total_angka_kredit,
+    }
+    report_data.update(_penetapan_fields(latest_ak))
+    return report_data
+
+
+def build_penetapan_report(snapshot, selected_ak_ids, include_integrasi_filter, include_pendidikan_filter=False):
+    """Build the Penetapan report data."""
+    pegawai = snapshot.pegawai
+    ak_list_for_report = snapshot.select(selected_ak_ids)
+    latest_ak_unfiltered = snapshot.latest_ak
+
+    # === NORMALISASI GOLONGAN ===
+    promotion = get_promotion(normalize_golongan(pegawai.golongan))
+
+    total_lama = promotion.lama
+
+    periode_awal_str, periode_akhir_str = _periode_strings(ak_list_for_report)
+    total_baru = sum(ak.jumlah_angka_kredit for ak in ak_list_for_report)
+
+    # Tambahkan integrasi jika diminta
+    angka_integrasi_obj = None
+    if include_integrasi_filter:
+        angka_integrasi_obj = snapshot.angka_integrasi
+        if angka_integrasi_obj:
+            integrasi_value = angka_integrasi_obj.jumlah_angka_integrasi
+            total_baru += integrasi_value
+            ak_list_for_report.insert(0, {
+                'penilaian': 'AK Integrasi',
+                'jumlah_angka_kredit': integrasi_value,
+                'is_integrasi_item': True
+            })
+
+    # Tambahkan pendidikan jika diminta
+    ak_pendidikan_total = 0
+    if include_pendidikan_filter and snapshot.ak_pendidikan_records:
+        ak_pendidikan_total = snapshot.ak_pendidikan_total
+        # NOTE: For penetapan report, pendidikan is shown in a separate row, not added to total_baru
+        # Insert after integrasi if present, otherwise at the beginning
+        insert_index = 1 if angka_integrasi_obj else 0
+        ak_list_for_report.insert(insert_index, {
+            'penilaian': 'AK Pendidikan',
+            'jumlah_angka_kredit': ak_pendidikan_total,
+            'is_pendidikan_item': True
+        })
+
+    # === TERAPKAN PENGURANGAN SESUAI GOLONGAN ===
+    pengurangan = promotion.pengurangan
+    total_baru = max(0.0, total_baru - pengurangan)  # Hindari nilai negatif
+
+    # For penetapan report, total_jumlah includes ak_pendidikan_total if included
+    total_jumlah = total_lama + total_baru + ak_pendidikan_total
+
+    # Hitung kenaikan pangkat
+    pangkat_minimal, jenjang_minimal = promotion.pangkat_minimal, promotion.jenjang_minimal
+    teks_tujuan = promotion.teks_tujuan
+
+    report_data = {
+        'pegawai': pegawai,
+        'ak_list': ak_list_for_report,
+        'tahun': _tahun(latest_ak_unfiltered),
+        'nama_instansi': latest_ak_unfiltered.instansi.nama_instansi if latest_ak_unfiltered and latest_ak_unfiltered.instansi else '',
+        'periode_awal_str': periode_awal_str,
+        'periode_akhir_str': periode_akhir_str,
+        'jabatan_dan_tmt': _jabatan_dan_tmt(pegawai),
+        'total_lama': total_lama,
+        'total_baru': total_baru,          # <-- SUDAH DIKURANGI SESUAI ATURAN
+        'total_jumlah': total_jumlah,
+        'ak_pendidikan_value': ak_pendidikan_total,
+        'total_performance_only': total_lama + total_baru,
+        'total_baru_with_pendidikan': total_baru + ak_pendidikan_total,
+        'pangkat_minimal': pangkat_minimal,
+        'jenjang_minimal': jenjang_minimal,
+        'hasil_pangkat': total_jumlah - pangkat_minimal,
+        'hasil_jenjang': total_jumlah - jenjang_minimal,
+        'teks_tujuan': teks_tujuan,
+    }
+    report_data.update(_penetapan_fields(latest_ak_unfiltered))
+    return report_data
@@ -0,0 +1,52 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Pegawai, Instansi, Penilai, AngkaIntegrasi, AK, AkPendidikan
+from .credit_summary import refresh_credit_summary
+from .pdf_cache import get_pdf_cache
+
+
+@receiver([post_save, post_delete], sender=AK)
+@receiver([post_save, post_delete], sender=AngkaIntegrasi)
+@receiver([post_save, post_delete], sender=AkPendidikan)
+def invalidate_pegawai_reports(sender, instance, **kwargs):
+    """Drop the cached report PDFs of the pegawai that owns the changed row."""
+    pdf_cache = get_pdf_cache()
+    if pdf_cache:
+        pdf_cache.invalidate_pegawai(instance.pegawai_id)
+
+
+@receiver([post_save, post_delete], sender=Pegawai)
+def invalidate_pegawai_reports_on_pegawai_change(sender, instance, **kwargs):
+    pdf_cache = get_pdf_cache()
+    if pdf_cache:
+        pdf_cache.invalidate_pegawai(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Instansi)
+@receiver([post_save, post_delete], sender=Penilai)
+def invalidate_all_reports(sender, instance, **kwargs):
+    """Instansi and Penilai appear on the reports of many pegawai, so drop everything."""
+    pdf_cache = get_pdf_cache()
+    if pdf_cache:
+        pdf_cache.clear()
+
+
+@receiver(pre_save, sender=AK)
+@receiver(pre_save, sender=AngkaIntegrasi)
+@receiver(pre_save, sender=AkPendidikan)
+def remember_previous_pegawai(sender, instance, **kwargs):
+    """Keep the old owner of a row that is being moved to another pegawai, so both summaries get refreshed."""
+    instance._previous_pegawai_id = None
+    if instance.pk:
+        instance._previous_pegawai_id = sender.objects.filter(pk=instance.pk).values_list('pegawai_id', flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=AK)
+@receiver([post_save, post_delete], sender=AngkaIntegrasi)
+@receiver([post_save, post_delete], sender=AkPendidikan)
+def refresh_pegawai_credit_summary(sender, instance, **kwargs):
+    refresh_credit_summary(instance.pegawai_id)
+    previous_pegawai_id = getattr(instance, '_previous_pegawai_id', None)
+    if previous_pegawai_id and previous_pegawai_id != instance.pegawai_id:
+        refresh_credit_summary(previous_pegawai_id)
@@ -0,0 +1,57 @@
+"""
+Synthetic data for the diagnostic commands (explain_indexes, bench_reports).
+
+The rows are written with bulk_create, so the caller is expected to run
+inside a transaction it rolls back afterwards.
+"""
+from datetime import date, timedelta
+
+from .models import Pegawai, Instansi, Penilai, AK, AngkaIntegrasi, AkPendidikan
+
+SYNTHETIC_MARKER = '__synthetic__'
+
+PERSON_FIELDS = {
+    'tempat_lahir': 'Kota', 'tanggal_lahir': date(1980, 1, 1), 'jenis_kelamin': 'Laki-laki',
+    'pangkat': 'Penata', 'golongan': 'III/c', 'tmt_pangkat': date(2015, 4, 1),
+    'jabatan': 'Analis', 'tmt_jabatan': date(2015, 4, 1), 'unit_kerja': 'Unit',
+}
+
+
+def seed_synthetic_data(count, ak_per_pegawai=6, pendidikan_per_pegawai=1, with_integrasi=False, batch_size=1000):
+    """
+    Create ``count`` pegawai with ``ak_per_pegawai`` yearly AK periods and
+    ``pendidikan_per_pegawai`` AkPendidikan rows each (and an AngkaIntegrasi
+    when ``with_integrasi``). Returns the list of new Pegawai.
+    """
+    instansi = Instansi.objects.create(nama_instansi=SYNTHETIC_MARKER)
+    penilai = Penilai.objects.create(nama='Penilai', nip=SYNTHETIC_MARKER, **PERSON_FIELDS)
+    pegawai_list = Pegawai.objects.bulk_create(
+        [Pegawai(nama=f'PEGAWAI {i:06d} ANALIS', nip=f'__synthetic_{i}', **PERSON_FIELDS) for i in range(count)],
+        batch_size=500,
+    )
+    ak_rows = []
+    pendidikan_rows = []
+    integrasi_rows = []
+    for pegawai in pegawai_list:
+        for n in range(ak_per_pegawai):
+            start = date(2015 + n, 1, 1)
+            ak_rows.append(AK(
+                pegawai=pegawai, instansi=instansi, penilai=penilai,
+                tanggal_awal_penilaian=start, tanggal_akhir_penilaian=start + timedelta(days=364),
+                penilaian='Baik', prosentase=100, koefisien=12.5, jumlah_angka_kredit=12.5,
+                tanggal_ditetapkan=start, tempat_ditetapkan='Kota', jenjang='KEAHLIAN - AHLI MUDA',
+            ))
+        for n in range(pendidikan_per_pegawai):
+            pendidikan_rows.append(AkPendidikan(
+                pegawai=pegawai, instansi=instansi, penilai=penilai,
+                tanggal_awal_penilaian=date(2020, 1, 1), tanggal_akhir_penilaian=date(2020, 12, 31),
+                jenis_kegiatan='Pelatihan', tanggal_pelaksanaan=date(2020, 6, 1), durasi_pelatihan=20,
+                jumlah_angka_kredit=5.0, tanggal_ditetapkan=date(2020, 12, 31), tempat_ditetapkan='Kota',
+                nomor_sertifikat=f'__synthetic_{pegawai.pk}_{n}',
+            ))
+        if with_integrasi:
+            integrasi_rows.append(AngkaIntegrasi(pegawai=pegawai, jumlah_angka_integrasi=25.0))
+    AK.objects.bulk_create(ak_rows, batch_size=batch_size)
+    AkPendidikan.objects.bulk_create(pendidikan_rows, batch_size=batch_size)
+    AngkaIntegrasi.objects.bulk_create(integrasi_rows, batch_size=batch_size)
+    return pegawai_list
@@ -1,3 +1,1465 @@
-from django.test import TestCase
+import base64
+import csv
+import hashlib
+import hmac
+import io
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import uuid
+import zipfile
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager, redirect_stdout
+from datetime import date, timedelta
+from importlib.util import find_spec
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.conf import settings
+from django.db import DatabaseError, connection, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from AppAk2.blob_clients import BlobNotFoundError, LocalBlobClient, VercelBlobClient
+from AppAk2.bootstrap import TEMPLATE_ALIAS, build_sqlite_template, prepare_database, read_stamp, schema_stamp
+from AppAk2.desktop_server import StaticFilesApp
+from AppAk2.middleware import QueryTimingMiddleware
+from AppAk2.storage_backends import VercelBlobStorage
+import desktop_launcher
+import migrate_to_production
+from .ak_credits import recalculate_ak
+from .batch import generate_reports_zip
+from .conditional import code_version
+from .constants import GOLONGAN_HIERARKI, UNKNOWN_PROMOTION, get_promotion, normalize_golongan
+from .credit_summary import rebuild_credit_summaries
+from .direct_upload import DirectUploadError, check_direct_upload_storage, sign_upload, verify_upload
+from .listing import filter_by_nama
+from .models import Pegawai, Instansi, Penilai, AK, AngkaIntegrasi, AkPendidikan, PegawaiCreditSummary
+from .pdf_cache import get_pdf_cache, report_cache_key
+from .pdf_jobs import PdfJobStore, _run_file_job
+from .reports import ReportSnapshot
+from .utils import PEGAWAI_IMPORT_FIELDS, import_pegawai_from_csv, export_pegawai_to_csv
+from .views import _calculate_ak_fields
+
+PEGAWAI_COUNT = 300
+AK_PER_PEGAWAI = 8
+PENDIDIKAN_PER_PEGAWAI = 3
+
+PERSON_FIELDS = {
+    'tempat_lahir': 'Kota', 'tanggal_lahir': date(1980, 1, 1), 'jenis_kelamin': 'Laki-laki',
+    'pangkat': 'Penata', 'golongan': 'III/c', 'tmt_pangkat': date(2015, 4, 1),
+    'jabatan': 'Analis', 'tmt_jabatan': date(2015, 4, 1), 'unit_kerja': 'Unit',
+}
+
+
+class QueryCountTestCase(TestCase):
+    """
+    Pins an upper bound on the number of queries of the list and report
+    views, against a fixture of PEGAWAI_COUNT pegawai with AK, AkPendidikan
+    and AngkaIntegrasi rows. A view whose query count grows with the number
+    of rows (N+1) fails here.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.instansi = Instansi.objects.create(nama_instansi='Instansi Uji')
+        cls.penilai = Penilai.objects.create(nama='Penilai Uji', nip='198001012010011001', **PERSON_FIELDS)
+        pegawai_list = Pegawai.objects.bulk_create([
+            Pegawai(nama=f'PEGAWAI {i:04d}', nip=f'1990{i:014d}', **PERSON_FIELDS)
+            for i in range(PEGAWAI_COUNT)
+        ])
+
+        ak_rows, pendidikan_rows, integrasi_rows = [], [], []
+        for pegawai in pegawai_list:
+            for n in range(AK_PER_PEGAWAI):
+                start = date(2015 + n, 1, 1)
+                ak_rows.append(AK(
+                    pegawai=pegawai, instansi=cls.instansi, penilai=cls.penilai,
+                    tanggal_awal_penilaian=start, tanggal_akhir_penilaian=start + timedelta(days=364),
+                    penilaian='Baik', prosentase=100, koefisien=12.5, jumlah_angka_kredit=12.5,
+                    tanggal_ditetapkan=start, tempat_ditetapkan='Kota', jenjang='KEAHLIAN - AHLI MUDA',
+                    Nomor_AK=f'{pegawai.pk}/{n}',
+                ))
+            for n in range(PENDIDIKAN_PER_PEGAWAI):
+                pendidikan_rows.append(AkPendidikan(
+                    pegawai=pegawai, instansi=cls.instansi, penilai=cls.penilai,
+                    tanggal_awal_penilaian=date(2020, 1, 1), tanggal_akhir_penilaian=date(2020, 12, 31),
+                    jenis_kegiatan='Pelatihan', tanggal_pelaksanaan=date(2020, 6, 1), durasi_pelatihan=20,
+                    jumlah_angka_kredit=1.5, tanggal_ditetapkan=date(2020, 12, 31), tempat_ditetapkan='Kota',
+                    nomor_sertifikat=f'{pegawai.pk}-{n}',
+                ))
+            integrasi_rows.append(AngkaIntegrasi(pegawai=pegawai, jumlah_angka_integrasi=25.0))
+        AK.objects.bulk_create(ak_rows, batch_size=500)
+        AkPendidikan.objects.bulk_create(pendidikan_rows, batch_size=500)
+        AngkaIntegrasi.objects.bulk_create(integrasi_rows, batch_size=500)
+        # bulk_create bypasses the signals that keep the summaries current
+        rebuild_credit_summaries()
+
+        cls.pegawai = pegawai_list[0]
+        # Same pegawai shape with a single AK row, to show report queries do not scale with rows
+        cls.small_pegawai = Pegawai.objects.create(nama='PEGAWAI KECIL', nip='199100000000000001', **PERSON_FIELDS)
+        AK.objects.create(
+            pegawai=cls.small_pegawai, instansi=cls.instansi, penilai=cls.penilai,
+            tanggal_awal_penilaian=date(2020, 1, 1), tanggal_akhir_penilaian=date(2020, 12, 31),
+            penilaian='Baik', prosentase=100, koefisien=12.5, jumlah_angka_kredit=12.5,
+            tanggal_ditetapkan=date(2020, 12, 31), tempat_ditetapkan='Kota', jenjang='KEAHLIAN - AHLI MUDA',
+        )
+        AkPendidikan.objects.create(
+            pegawai=cls.small_pegawai, instansi=cls.instansi, penilai=cls.penilai,
+            tanggal_awal_penilaian=date(2020, 1, 1), tanggal_akhir_penilaian=date(2020, 12, 31),
+            jenis_kegiatan='Pelatihan', tanggal_pelaksanaan=date(2020, 6, 1), durasi_pelatihan=20,
+            jumlah_angka_kredit=1.5, tanggal_ditetapkan=date(2020, 12, 31), tempat_ditetapkan='Kota',
+            nomor_sertifikat='kecil-0',
+        )
+        AngkaIntegrasi.objects.create(pegawai=cls.small_pegawai, jumlah_angka_integrasi=25.0)
+
+    @contextmanager
+    def assertMaxNumQueries(self, limit):
+        """Like assertNumQueries, but only fails when more than ``limit`` queries run."""
+        with CaptureQueriesContext(connection) as context:
+            yield context
+        executed = len(context.captured_queries)
+        if executed > limit:
+            queries = '\n'.join(
+                f"{i}. {query['sql']}" for i, query in enumerate(context.captured_queries, start=1)
+            )
+            self.fail(f"{executed} queries executed, at most {limit} expected.\nCaptured queries were:\n{queries}")
+
+    def count_queries(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(url, data or {})
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+
+# GET pages run one extra query for their ETag (pegawai.conditional.data_version)
+ETAG_QUERIES = 1
+
+
+class ListViewQueryTests(QueryCountTestCase):
+    def assertListQueries(self, url_name, limit, **params):
+        with self.assertMaxNumQueries(limit):
+            response = self.client.get(reverse(url_name), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page_obj']), 5)
+
+    def test_pegawai_list(self):
+        self.assertListQueries('pegawai_list', 2 + ETAG_QUERIES)
+        self.assertListQueries('pegawai_list', 2 + ETAG_QUERIES, page=7, search='PEGAWAI')
+
+    def test_ak_list(self):
+        self.assertListQueries('ak_list', 2 + ETAG_QUERIES)
+        self.assertListQueries('ak_list', 2 + ETAG_QUERIES, page=20, search='PEGAWAI')
+
+    def test_ak_pendidikan_list(self):
+        self.assertListQueries('ak_pendidikan_list', 2 + ETAG_QUERIES)
+        self.assertListQueries('ak_pendidikan_list', 2 + ETAG_QUERIES, page=20, search='PEGAWAI')
+
+    def test_angka_integrasi_list(self):
+        self.assertListQueries('angka_integrasi_list', 2 + ETAG_QUERIES)
+        self.assertListQueries('angka_integrasi_list', 2 + ETAG_QUERIES, page=7, search='PEGAWAI')
+
+
+class ReportViewQueryTests(QueryCountTestCase):
+    # (url name, max queries for choosing a pegawai, max queries for generating the report)
+    REPORT_VIEWS = [
+        ('konversi', 5 + ETAG_QUERIES, 6),
+        ('akumulasi', 14 + ETAG_QUERIES, 14),
+        ('penetapan', 14 + ETAG_QUERIES, 14),
+        ('merge_report', 5 + ETAG_QUERIES, 5),
+    ]
+
+    def report_post_data(self, url_name, pegawai):
+        data = {'pegawai_id': pegawai.pk}
+        if url_name == 'merge_report':
+            data['generate_report'] = '1'
+        return data
+
+    def test_select_pegawai(self):
+        for url_name, select_limit, _ in self.REPORT_VIEWS:
+            with self.subTest(view=url_name), self.assertMaxNumQueries(select_limit):
+                response = self.client.get(reverse(url_name), {'pegawai_id': self.pegawai.pk})
+                self.assertEqual(response.status_code, 200)
+
+    def test_generate_report(self):
+        for url_name, _, report_limit in self.REPORT_VIEWS:
+            with self.subTest(view=url_name), self.assertMaxNumQueries(report_limit):
+                response = self.client.post(reverse(url_name), self.report_post_data(url_name, self.pegawai))
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.context['report_generated'])
+
+    def test_report_queries_do_not_scale_with_rows(self):
+        for url_name, _, _ in self.REPORT_VIEWS:
+            with self.subTest(view=url_name):
+                url = reverse(url_name)
+                self.assertEqual(
+                    self.count_queries('post', url, self.report_post_data(url_name, self.pegawai)),
+                    self.count_queries('post', url, self.report_post_data(url_name, self.small_pegawai)),
+                )
+
+
+@override_settings(LIST_KEYSET_PAGINATION=True)
+class KeysetListTests(QueryCountTestCase):
+    def walk(self, url_name, **params):
+        """Follow the next links from the first page; returns the rows of every page."""
+        rows = []
+        response = self.client.get(reverse(url_name), params)
+        while True:
+            page_obj = response.context['page_obj']
+            rows.extend(page_obj)
+            if not page_obj.has_next():
+                return rows
+            with self.assertMaxNumQueries(1 + ETAG_QUERIES):
+                response = self.client.get(reverse(url_name), {**params, 'after': page_obj.next_cursor})
+
+    def test_pegawai_pages_follow_nama_id_order(self):
+        rows = self.walk('pegawai_list')
+        expected = list(Pegawai.objects.order_by('nama', 'id'))
+        self.assertEqual(rows, expected)
+
+    def test_ak_pages_follow_pegawai_nama_order(self):
+        rows = self.walk('ak_list', search='PEGAWAI 00')
+        expected = list(AK.objects.filter(pegawai__nama__icontains='PEGAWAI 00').order_by('pegawai__nama', 'id'))
+        self.assertEqual(rows, expected)
+
+    def test_previous_page(self):
+        first = self.client.get(reverse('pegawai_list')).context['page_obj']
+        second = self.client.get(reverse('pegawai_list'), {'after': first.next_cursor}).context['page_obj']
+        self.assertTrue(second.has_previous())
+        back = self.client.get(reverse('pegawai_list'), {'before': second.previous_cursor}).context['page_obj']
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+
+    def test_malformed_cursor_gives_first_page(self):
+        first = self.client.get(reverse('pegawai_list')).context['page_obj']
+        page_obj = self.client.get(reverse('pegawai_list'), {'after': 'not-a-cursor'}).context['page_obj']
+        self.assertEqual(list(page_obj), list(first))
+
+    @override_settings(LIST_APPROXIMATE_COUNT=True)
+    def test_approximate_count(self):
+        with self.assertMaxNumQueries(2 + ETAG_QUERIES):
+            page_obj = self.client.get(reverse('pegawai_list')).context['page_obj']
+        self.assertGreaterEqual(page_obj.approximate_count, PEGAWAI_COUNT)
+
+
+class NamaSearchTests(QueryCountTestCase):
+    def assertSameAsIcontains(self, search_query):
+        found = filter_by_nama(Pegawai.objects.all(), search_query)
+        self.assertQuerysetEqual(
+            found.order_by('id'), Pegawai.objects.filter(nama__icontains=search_query).order_by('id'),
+        )
+
+    def test_matches_icontains(self):
+        for search_query in ['PEGAWAI', 'pegawai 01', '0042', 'ai 0', 'KECIL', 'Ke', 'x', 'tidak ada', '"']:
+            with self.subTest(search_query=search_query):
+                self.assertSameAsIcontains(search_query)
+
+    def test_index_follows_changes(self):
+        Pegawai.objects.filter(pk=self.pegawai.pk).update(nama='NAMA BARU')
+        self.assertSameAsIcontains('NAMA BARU')
+        self.assertSameAsIcontains('PEGAWAI 0000')
+        self.small_pegawai.delete()
+        self.assertSameAsIcontains('KECIL')
+
+
+class ApiTests(QueryCountTestCase):
+    def get_json(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_list_pages_with_cursor(self):
+        url = reverse('api_list', args=['pegawai'])
+        ids = []
+        data = self.get_json(url, limit=120)
+        while True:
+            ids.extend(row['id'] for row in data['results'])
+            if not data['next_cursor']:
+                break
+            with self.assertMaxNumQueries(1):
+                data = self.get_json(url, limit=120, cursor=data['next_cursor'])
+        self.assertEqual(ids, list(Pegawai.objects.order_by('id').values_list('id', flat=True)))
+
+    def test_fields_and_ids(self):
+        ak_ids = list(AK.objects.filter(pegawai=self.pegawai).values_list('id', flat=True)[:3])
+        data = self.get_json(
+            reverse('api_list', args=['ak']), ids=','.join(map(str, ak_ids)), fields='jumlah_angka_kredit,pegawai',
+        )
+        self.assertEqual(data['results'], [
+            {'id': ak_id, 'jumlah_angka_kredit': 12.5, 'pegawai': self.pegawai.pk} for ak_id in sorted(ak_ids)
+        ])
+
+    def test_filter_by_pegawai(self):
+        data = self.get_json(reverse('api_list', args=['ak-pendidikan']), pegawai=self.pegawai.pk)
+        self.assertEqual(len(data['results']), PENDIDIKAN_PER_PEGAWAI)
+        self.assertIsNone(data['results'][0]['file_sertifikat'])
+        self.assertEqual(data['results'][0]['tanggal_pelaksanaan'], '2020-06-01')
+
+    def test_detail(self):
+        data = self.get_json(reverse('api_detail', args=['pegawai', self.pegawai.pk]), fields='nama')
+        self.assertEqual(data, {'id': self.pegawai.pk, 'nama': self.pegawai.nama})
+        response = self.client.get(reverse('api_detail', args=['angka-integrasi', 0]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_errors(self):
+        for resource, params in [
+            ('pegawai', {'fields': 'nama,gaji'}),
+            ('pegawai', {'ids': '1,x'}),
+            ('pegawai', {'pegawai': '1'}),
+            ('ak', {'limit': '0'}),
+        ]:
+            with self.subTest(params=params):
+                response = self.client.get(reverse('api_list', args=[resource]), params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+        self.assertEqual(self.client.get(reverse('api_list', args=['penilaian'])).status_code, 404)
+        self.assertEqual(self.client.post(reverse('api_list', args=['ak'])).status_code, 405)
+
+    def test_etag(self):
+        url = reverse('api_detail', args=['pegawai', self.pegawai.pk])
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        Pegawai.objects.filter(pk=self.pegawai.pk).update(nama='NAMA BARU')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ConditionalGetTests(QueryCountTestCase):
+    PAGES = [
+        ('pegawai_list', {}),
+        ('ak_list', {'search': 'PEGAWAI 01'}),
+        ('konversi', {'pegawai_id': 0}),
+        ('penetapan', {'pegawai_id': 0}),
+        ('akumulasi_pdf', {'pegawai_id': 0, 'include_angka_integrasi': 'true'}),
+    ]
+
+    def get(self, url_name, params, etag=None):
+        params = {key: self.pegawai.pk if key == 'pegawai_id' else value for key, value in params.items()}
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(reverse(url_name), params, **headers)
+
+    def assertRefreshes(self, expected_status):
+        for url_name, params in self.PAGES:
+            with self.subTest(page=url_name):
+                etag = self.etags[url_name]
+                with CaptureQueriesContext(connection) as context:
+                    response = self.get(url_name, params, etag)
+                self.assertEqual(response.status_code, expected_status)
+                if expected_status == 304:
+                    # Only the version key is read
+                    self.assertEqual(len(context.captured_queries), ETAG_QUERIES)
+                self.etags[url_name] = response['ETag']
+
+    def setUp(self):
+        # The CSRF cookie is part of the ETag; start with one, as a returning browser does
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = 'a' * 32
+        self.etags = {}
+        for url_name, params in self.PAGES:
+            response = self.get(url_name, params)
+            self.assertEqual(response.status_code, 200)
+            self.etags[url_name] = response['ETag']
+
+    def test_unchanged_page_is_not_modified(self):
+        self.assertRefreshes(304)
+        self.assertRefreshes(304)
+
+    def test_pegawai_change(self):
+        pegawai = Pegawai.objects.get(pk=self.pegawai.pk)
+        pegawai.nama = 'NAMA BARU'
+        pegawai.save()
+        self.assertRefreshes(200)
+        self.assertRefreshes(304)
+
+    def test_ak_change_and_delete(self):
+        ak = AK.objects.filter(pegawai=self.pegawai).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            ak.jumlah_angka_kredit = 99.0
+            ak.save()
+        self.assertRefreshes(200)
+        with self.captureOnCommitCallbacks(execute=True):
+            ak.delete()
+        self.assertRefreshes(200)
+
+    def test_instansi_penilai_change(self):
+        self.instansi.nama_instansi = 'Instansi Baru'
+        self.instansi.save()
+        self.assertRefreshes(200)
+        Penilai.objects.create(nama='Penilai Baru', nip='198001012010011002', **PERSON_FIELDS)
+        self.assertRefreshes(200)
+
+    def test_csv_import_updates_version(self):
+        csv_text = export_pegawai_to_csv().replace('PEGAWAI 0000', 'PEGAWAI IMPOR')
+        import_pegawai_from_csv(io.BytesIO(csv_text.encode('utf-8')))
+        self.assertRefreshes(200)
+
+    def test_csrf_cookie_change(self):
+        # The pages embed a CSRF token derived from the cookie
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = 'b' * 32
+        self.assertRefreshes(200)
+        self.assertRefreshes(304)
+
+    def test_project_templates_change(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            template = os.path.join(tmp, 'base.html')
+            with open(template, 'w') as f:
+                f.write('')
+            os.utime(template, (4102444800, 4102444800))
+            code_version.cache_clear()
+            self.addCleanup(code_version.cache_clear)
+            with mock.patch('pegawai.conditional._code_dirs', lambda: [tmp]):
+                self.assertEqual(code_version(), 4102444800)
+                self.assertRefreshes(200)
+
+    def test_post_is_not_conditional(self):
+        response = self.client.post(
+            reverse('penetapan'), {'pegawai_id': self.pegawai.pk}, HTTP_IF_NONE_MATCH=self.etags['penetapan'],
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+
+
+
+@override_settings(PDF_CACHE_ENABLED=False)
+class PdfJobTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        instansi = Instansi.objects.create(nama_instansi='Instansi Uji')
+        penilai = Penilai.objects.create(nama='Penilai Uji', nip='198001012010011001', **PERSON_FIELDS)
+        cls.pegawai = Pegawai.objects.create(nama='PEGAWAI PDF', nip='199001012020011099', **PERSON_FIELDS)
+        AK.objects.create(
+            pegawai=cls.pegawai, instansi=instansi, penilai=penilai,
+            tanggal_awal_penilaian=date(2020, 1, 1), tanggal_akhir_penilaian=date(2020, 12, 31),
+            penilaian='Baik', prosentase=100, koefisien=12.5, jumlah_angka_kredit=12.5,
+            tanggal_ditetapkan=date(2020, 12, 31), tempat_ditetapkan='Kota', jenjang='KEAHLIAN - AHLI MUDA',
+        )
+
+    def post_report(self):
+        job = {'id': str(uuid.UUID(int=1)), 'status': 'pending', 'timeout': 300}
+        with mock.patch('pegawai.utils.html_to_pdf_timed', lambda html: (b'%PDF-1.4 uji', {})), \
+                mock.patch('pegawai.views.submit_pdf_job', return_value=job) as submit:
+            response = self.client.post(reverse('akumulasi_pdf'), {'pegawai_id': self.pegawai.pk})
+        return response, submit
+
+    def test_post_queues_job(self):
+        response, submit = self.post_report()
+        self.assertTrue(submit.called)
+        self.assertEqual(response.status_code, 202)
+
+    @override_settings(PDF_BACKGROUND_JOBS=False)
+    def test_post_renders_in_request_without_background_jobs(self):
+        # Serverless: no thread may outlive the response, so the PDF comes back directly
+        response, submit = self.post_report()
+        self.assertFalse(submit.called)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(response.content, b'%PDF-1.4 uji')
+        page = self.client.get(reverse('akumulasi'), {'pegawai_id': self.pegawai.pk})
+        self.assertContains(page, 'const PDF_JOBS_ENABLED = false;')
+
+
+class PdfJobTimeoutTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store = PdfJobStore(tmp.name, ttl=3600, timeout=60)
+        self.job = self.store.create('laporan.pdf')
+
+    def later(self, seconds):
+        return mock.patch('pegawai.pdf_jobs.time.time', return_value=self.job['created'] + seconds)
+
+    def test_unfinished_job_fails_after_timeout(self):
+        self.store.start(self.job['id'])
+        with self.later(30):
+            self.assertEqual(self.store.get(self.job['id'])['status'], 'running')
+        with self.later(61):
+            job = self.store.get(self.job['id'])
+        self.assertEqual((job['status'], job['error']), ('failed', 'Waktu pembuatan PDF habis.'))
+
+    def test_late_result_does_not_revive_job(self):
+        with self.later(61):
+            self.assertIsNone(self.store.start(self.job['id']))
+            self.store.save_pdf(self.job['id'], b'%PDF-1.4 terlambat')
+        self.assertEqual(self.store.get(self.job['id'])['status'], 'failed')
+        self.assertFalse(os.path.exists(self.store.pdf_path(self.job['id'])))
+
+    def test_job_timeout_overrides_default(self):
+        job = self.store.create('laporan.zip', content_type='application/zip', timeout=600)
+        with mock.patch('pegawai.pdf_jobs.time.time', return_value=job['created'] + 300):
+            self.assertEqual(self.store.get(job['id'])['status'], 'pending')
+
+
+class RecordingBlobClient(LocalBlobClient):
+    def __init__(self, root):
+        super().__init__(root)
+        self.ranges = []
+        self.put_bodies = []
+        self.heads = 0
+
+    def head(self, url_or_path, **kwargs):
+        self.heads += 1
+        return super().head(url_or_path, **kwargs)
+
+    def put(self, path, body, **kwargs):
+        self.put_bodies.append(body)
+        return super().put(path, body, **kwargs)
+
+    def read_range(self, blob, start, end):
+        self.ranges.append((start, end))
+        return super().read_range(blob, start, end)
+
+
+@override_settings(BLOB_READ_CHUNK_SIZE=64 * 1024, BLOB_MULTIPART_THRESHOLD=128 * 1024)
+class BlobStorageTests(SimpleTestCase):
+    """VercelBlobStorage against the filesystem stand-in of the blob client."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.client = RecordingBlobClient(tmp.name)
+        self.storage = VercelBlobStorage(client=self.client)
+        self.data = os.urandom(300 * 1024 + 7)
+        self.name = self.storage.save('sertifikat_pendidikan/ijazah.pdf', ContentFile(self.data))
+
+    def test_upload_is_streamed(self):
+        # The file object itself is handed to the client, not its bytes
+        self.assertNotIsInstance(self.client.put_bodies[0], (bytes, str))
+        self.assertEqual(self.storage.size(self.name), len(self.data))
+
+    def test_open_is_lazy_and_seeks_with_range_reads(self):
+        f = self.storage.open(self.name)
+        self.assertEqual(self.client.ranges, [])
+        self.assertEqual(f.size, len(self.data))
+        f.seek(200 * 1024)
+        self.assertEqual(f.read(10), self.data[200 * 1024:200 * 1024 + 10])
+        self.assertEqual(self.client.ranges, [(200 * 1024, 264 * 1024)])
+
+    def test_chunks_read_whole_file(self):
+        with self.storage.open(self.name) as f:
+            self.assertEqual(b''.join(f.chunks()), self.data)
+        self.assertTrue(all(end - start <= 64 * 1024 for start, end in self.client.ranges))
+
+    def test_missing_and_delete(self):
+        self.assertFalse(self.storage.exists('sertifikat_pendidikan/lain.pdf'))
+        with self.assertRaises(BlobNotFoundError):
+            self.storage.open('sertifikat_pendidikan/lain.pdf')
+        self.storage.delete(self.name)
+        self.assertFalse(self.storage.exists(self.name))
+
+    def test_metadata_is_cached(self):
+        # Populated by save: no head() for exists/size/open of the saved file
+        self.assertTrue(self.storage.exists(self.name))
+        self.assertEqual(self.storage.size(self.name), len(self.data))
+        self.storage.open(self.name).close()
+        missing = 'sertifikat_pendidikan/lain.pdf'
+        self.assertFalse(self.storage.exists(missing))
+        self.assertFalse(self.storage.exists(missing))
+        self.assertEqual(self.client.heads, 1 + 1)  # get_available_name in save(), then the missing name once
+        self.assertEqual(self.storage.metadata_cache.stats()['misses'], 2)
+
+    def test_delete_invalidates(self):
+        self.assertTrue(self.storage.exists(self.name))
+        self.storage.delete(self.name)
+        self.assertFalse(self.storage.exists(self.name))
+
+    @override_settings(BLOB_METADATA_CACHE_TTL=0)
+    def test_cache_disabled(self):
+        storage = VercelBlobStorage(client=self.client)
+        heads = self.client.heads
+        storage.exists(self.name)
+        storage.exists(self.name)
+        self.assertEqual(self.client.heads, heads + 2)
+
+    @override_settings(BLOB_METADATA_CACHE_ALIAS='default')
+    def test_shared_cache(self):
+        caches['default'].clear()
+        self.addCleanup(caches['default'].clear)
+        first = VercelBlobStorage(client=self.client)
+        first.size(self.name)
+        heads = self.client.heads
+        # Another process: a new storage with an empty LRU finds it in the Django cache
+        second = VercelBlobStorage(client=self.client)
+        self.assertEqual(second.size(self.name), len(self.data))
+        self.assertFalse(second.exists('sertifikat_pendidikan/lain.pdf'))
+        self.assertFalse(VercelBlobStorage(client=self.client).exists('sertifikat_pendidikan/lain.pdf'))
+        self.assertEqual(self.client.heads, heads + 1)
+        # The delete reaches the shared cache (other processes' LRUs expire after the TTL)
+        second.delete(self.name)
+        self.assertFalse(VercelBlobStorage(client=self.client).exists(self.name))
+
+
+@override_settings(SERTIFIKAT_DIRECT_UPLOAD=True, SERTIFIKAT_MAX_UPLOAD_BYTES=1024 * 1024)
+class DirectUploadTests(TestCase):
+    """The signed direct upload of certificate files against FileSystemStorage."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.instansi = Instansi.objects.create(nama_instansi='Instansi Uji')
+        cls.penilai = Penilai.objects.create(nama='Penilai Uji', nip='198001012010011001', **PERSON_FIELDS)
+        cls.pegawai = Pegawai.objects.create(nama='PEGAWAI UNGGAH', nip='199001012020011001', **PERSON_FIELDS)
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=media.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.data = b'%PDF-1.4 sertifikat' * 100
+
+    def request_target(self, filename='ijazah.pdf', size=None):
+        return self.client.post(
+            reverse('sertifikat_upload_target'),
+            json.dumps({'filename': filename, 'size': len(self.data) if size is None else size,
+                        'content_type': 'application/pdf'}),
+            content_type='application/json',
+        )
+
+    def put(self, target, data):
+        return self.client.generic('PUT', target['url'], data, content_type='application/pdf')
+
+    def form_data(self, token):
+        return {
+            'pegawai': self.pegawai.pk, 'instansi': self.instansi.pk, 'penilai': self.penilai.pk,
+            'tanggal_awal_penilaian': '2024-01-01', 'tanggal_akhir_penilaian': '2024-12-31',
+            'jenis_kegiatan': 'Pelatihan', 'tanggal_pelaksanaan': '2024-06-01', 'durasi_pelatihan': 20,
+            'tanggal_ditetapkan': '2024-12-31', 'tempat_ditetapkan': 'Kota', 'nomor_sertifikat': 'unggah-1',
+            'sertifikat_upload_token': token,
+        }
+
+    def test_upload_and_record_key(self):
+        self.assertContains(self.client.get(reverse('ak_pendidikan_new')), 'data-direct-upload-url="')
+        response = self.request_target()
+        self.assertEqual(response.status_code, 200)
+        upload = response.json()
+        self.assertTrue(upload['key'].startswith('sertifikat_pendidikan/'))
+        self.assertEqual(self.put(upload['target'], self.data).status_code, 201)
+
+        response = self.client.post(reverse('ak_pendidikan_new'), self.form_data(upload['token']))
+        self.assertRedirects(response, reverse('ak_pendidikan_list'), fetch_redirect_response=False)
+        record = AkPendidikan.objects.get(nomor_sertifikat='unggah-1')
+        self.assertEqual(record.file_sertifikat.name, upload['key'])
+        with record.file_sertifikat.open('rb') as f:
+            self.assertEqual(f.read(), self.data)
+
+    def test_token_cannot_be_reused(self):
+        upload = self.request_target().json()
+        self.put(upload['target'], self.data)
+        self.client.post(reverse('ak_pendidikan_new'), self.form_data(upload['token']))
+        data = dict(self.form_data(upload['token']), nomor_sertifikat='unggah-2')
+        response = self.client.post(reverse('ak_pendidikan_new'), data)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('file_sertifikat', response.context['form'].errors)
+        self.assertFalse(AkPendidikan.objects.filter(nomor_sertifikat='unggah-2').exists())
+
+    def test_rejects_bad_announcements(self):
+        self.assertEqual(self.request_target(filename='skrip.exe').status_code, 400)
+        self.assertEqual(self.request_target(size=2 * 1024 * 1024).status_code, 400)
+
+    def test_put_checks_token_and_size(self):
+        upload = self.request_target().json()
+        forged = dict(upload['target'], url=upload['target']['url'].replace(upload['token'], upload['token'] + 'x'))
+        self.assertEqual(self.put(forged, self.data).status_code, 403)
+        self.assertEqual(self.put(upload['target'], self.data + b'tambahan').status_code, 413)
+        self.assertEqual(self.put(upload['target'], self.data).status_code, 201)
+        self.assertEqual(self.put(upload['target'], self.data).status_code, 409)
+
+    def test_vercel_blob_target(self):
+        read_write_token = 'vercel_blob_rw_Store123_rahasia'
+        storage = VercelBlobStorage(client=VercelBlobClient(token=read_write_token))
+        with mock.patch('pegawai.direct_upload.default_storage', storage):
+            upload = self.request_target().json()
+            # No proxying through Django's PUT endpoint
+            proxied = dict(upload['target'], url=reverse('sertifikat_upload_put', args=[upload['token']]))
+            self.assertEqual(self.put(proxied, self.data).status_code, 404)
+        target = upload['target']
+        self.assertEqual(target['method'], 'PUT')
+        self.assertTrue(target['url'].startswith('https://vercel.com/api/blob?pathname=sertifikat_pendidikan%2F'))
+        self.assertEqual(target['headers']['x-vercel-blob-access'], 'private')
+        # The client token is signed with the read-write token and limited to this key and size
+        prefix = 'vercel_blob_client_Store123_'
+        client_token = target['headers']['authorization'].removeprefix('Bearer ')
+        self.assertTrue(client_token.startswith(prefix))
+        signature, payload = base64.b64decode(client_token[len(prefix):]).decode().split('.')
+        expected = hmac.new(read_write_token.encode(), payload.encode(), hashlib.sha256).hexdigest()
+        self.assertEqual(signature, expected)
+        claims = json.loads(base64.b64decode(payload))
+        self.assertEqual(claims['pathname'], upload['key'])
+        self.assertEqual(claims['maximumSizeInBytes'], len(self.data))
+        self.assertEqual(claims['allowedContentTypes'], ['application/pdf'])
+
+    def test_refused_without_upload_target(self):
+        # The local blob client cannot mint client tokens: the file would go through Django
+        with tempfile.TemporaryDirectory() as tmp:
+            storage = VercelBlobStorage(client=LocalBlobClient(tmp))
+            with mock.patch('pegawai.direct_upload.default_storage', storage):
+                self.assertEqual([error.id for error in check_direct_upload_storage()], ['pegawai.E001'])
+                self.assertEqual(self.request_target().status_code, 404)
+                response = self.client.get(reverse('ak_pendidikan_new'))
+                self.assertNotContains(response, 'data-direct-upload-url="')
+
+    def test_verify_is_not_fooled_by_cached_absence(self):
+        # Submitted before the browser's upload finished, then again once it has
+        with tempfile.TemporaryDirectory() as tmp:
+            client = RecordingBlobClient(tmp)
+            storage = VercelBlobStorage(client=client)
+            _, claims = sign_upload('ijazah.pdf', len(self.data))
+            with self.assertRaises(DirectUploadError):
+                verify_upload(claims, storage)
+            client.put(claims['key'], self.data)
+            verify_upload(claims, storage)
+            self.assertEqual(client.heads, 2)
+            self.assertTrue(storage.exists(claims['key']))
+            self.assertEqual(client.heads, 2)
+
+    def test_form_verifies_upload(self):
+        # A valid token whose file never reached storage
+        token, _ = sign_upload('ijazah.pdf', len(self.data))
+        response = self.client.post(reverse('ak_pendidikan_new'), self.form_data(token))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('file_sertifikat', response.context['form'].errors)
+        response = self.client.post(reverse('ak_pendidikan_new'), self.form_data('palsu'))
+        self.assertIn('file_sertifikat', response.context['form'].errors)
+        self.assertFalse(AkPendidikan.objects.filter(nomor_sertifikat='unggah-1').exists())
+
+    @override_settings(SERTIFIKAT_DIRECT_UPLOAD=False)
+    def test_disabled(self):
+        self.assertEqual(self.request_target().status_code, 404)
+        response = self.client.get(reverse('ak_pendidikan_new'))
+        self.assertNotContains(response, 'data-direct-upload-url="')
+
+
+class BreakingExecutor:
+    """ProcessPoolExecutor stand-in whose pool breaks after ``survivors`` results."""
+    survivors = 2
+
+    def __init__(self, max_workers=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def map(self, fn, items):
+        for index, item in enumerate(items):
+            if index == self.survivors:
+                raise BrokenProcessPool('worker died')
+            yield fn(item)
+
+
+class BatchZipTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.pegawai_list = [
+            Pegawai.objects.create(nama=f'PEGAWAI BATCH {i}', nip=f'19900101202001{i:04d}', **PERSON_FIELDS)
+            for i in range(5)
+        ]
+
+    def test_broken_pool_keeps_pdfs_with_their_pegawai(self):
+        # The "PDF" is the HTML itself, so each file shows whose report it is
+        fake_pdf = lambda html: (html.encode('utf-8'), None)
+        with mock.patch('pegawai.batch.ProcessPoolExecutor', BreakingExecutor), \
+                mock.patch('pegawai.batch.html_to_pdf_safe', fake_pdf):
+            dest = io.BytesIO()
+            statuses = generate_reports_zip(self.pegawai_list, ['konversi'], dest, max_workers=4)
+
+        self.assertEqual([status['status'] for status in statuses], ['OK'] * 5)
+        with zipfile.ZipFile(dest) as archive:
+            self.assertEqual(len(archive.namelist()), 5 + 1)
+            for pegawai in self.pegawai_list:
+                content = archive.read(f'konversi/konversi_{pegawai.nip}.pdf').decode('utf-8')
+                self.assertIn(pegawai.nama, content)
+                others = [other.nama for other in self.pegawai_list if other != pegawai]
+                self.assertFalse(any(nama in content for nama in others))
+
+    def post_batch(self, **headers):
+        return self.client.post(reverse('batch_reports'), {
+            'nip_list': ' '.join(pegawai.nip for pegawai in self.pegawai_list),
+            'report_types': ['konversi'],
+        }, **headers)
+
+    def test_batch_runs_as_job(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        store = PdfJobStore(tmp.name, ttl=3600)
+
+        def run_now(filename, write, content_type, timeout=None):
+            # Same steps as the worker thread, but inside this test's transaction
+            job = store.create(filename, content_type=content_type, timeout=timeout)
+            with mock.patch('pegawai.pdf_jobs.connections'):
+                _run_file_job(store, job['id'], write)
+            return job
+
+        fake_pdf = lambda html: (html.encode('utf-8'), None)
+        with override_settings(PDF_BACKGROUND_JOBS=True, BATCH_SYNC_MAX_REPORTS=1),                 mock.patch('pegawai.views.submit_file_job', run_now),                 mock.patch('pegawai.batch.html_to_pdf_safe', fake_pdf),                 mock.patch('pegawai.batch.ProcessPoolExecutor', BreakingExecutor),                 mock.patch.object(BreakingExecutor, 'survivors', 100):
+            response = self.post_batch(HTTP_ACCEPT='application/json')
+
+        self.assertEqual(response.status_code, 202)
+        job = store.get(response.json()['job_id'])
+        self.assertEqual((job['status'], job['content_type']), ('done', 'application/zip'))
+        with zipfile.ZipFile(store.pdf_path(job['id'])) as archive:
+            self.assertEqual(len(archive.namelist()), 5 + 1)
+
+    def test_failed_batch_job_is_marked_failed(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        store = PdfJobStore(tmp.name, ttl=3600)
+        job = store.create('laporan.zip', content_type='application/zip')
+
+        def write(f):
+            raise RuntimeError('pool rusak')
+
+        with mock.patch('pegawai.pdf_jobs.connections'):
+            _run_file_job(store, job['id'], write)
+        job = store.get(job['id'])
+        self.assertEqual((job['status'], job['error']), ('failed', 'pool rusak'))
+        self.assertEqual(os.listdir(tmp.name), [f"{job['id']}.json"])
+
+    @override_settings(PDF_BACKGROUND_JOBS=False, BATCH_SYNC_MAX_REPORTS=3)
+    def test_large_batch_refused_without_background_jobs(self):
+        with mock.patch('pegawai.views.generate_reports_zip') as generate:
+            response = self.post_batch()
+            json_response = self.post_batch(HTTP_ACCEPT='application/json')
+
+        self.assertFalse(generate.called)
+        self.assertContains(response, 'Terlalu banyak laporan (5)')
+        self.assertEqual(json_response.status_code, 400)
+
+
+class SqliteTemplateTests(SimpleTestCase):
+    def test_committed_template_is_current(self):
+        # Shipped to Vercel as is: rebuild it (manage.py build_sqlite_template) after adding a migration
+        self.assertEqual(read_stamp(settings.SQLITE_TEMPLATE_PATH), schema_stamp())
+
+    def test_cold_start_copies_template(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'db.sqlite3')
+            database = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': db_path}
+            with mock.patch.dict(settings.DATABASES, {'coldstart': database}):
+                self.assertEqual(prepare_database('coldstart'), 'template copy')
+                self.assertEqual(prepare_database('coldstart'), 'up to date')
+            self.assertEqual(read_stamp(db_path), schema_stamp())
+            self.assertFalse(os.path.exists(db_path + '.stamp'))
+
+    def test_replaced_database_is_migrated(self):
+        # The stamp lives in the database, so a file put in its place is checked on its own
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'db.sqlite3')
+            database = connections.configure_settings({
+                'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': db_path},
+            })['default']
+            with mock.patch.dict(settings.DATABASES, {'coldstart': database}):
+                try:
+                    self.assertEqual(prepare_database('coldstart'), 'template copy')
+                    os.remove(db_path)
+                    sqlite3.connect(db_path).close()  # e.g. an empty backup restored over it
+                    self.assertEqual(prepare_database('coldstart'), 'migrate')
+                    self.assertEqual(prepare_database('coldstart'), 'up to date')
+                finally:
+                    connections['coldstart'].close()
+                    del connections['coldstart']
+
+    def test_build_leaves_default_database_alone(self):
+        default_name = connection.settings_dict['NAME']
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'template.sqlite3')
+            self.assertEqual(build_sqlite_template(path), read_stamp(path))
+            self.assertTrue(os.path.getsize(path))
+        self.assertEqual(connection.settings_dict['NAME'], default_name)
+        self.assertNotIn(TEMPLATE_ALIAS, connections.settings)
+
+
+class StaticFilesAppTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        with open(os.path.join(tmp.name, 'app.css'), 'w') as f:
+            f.write('body {}')
+        with override_settings(STATIC_ROOT=tmp.name, STATICFILES_DIRS=[]):
+            self.app = StaticFilesApp(lambda environ, start_response: [b'django'])
+
+    def get(self, path):
+        environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': path}
+        return self.app(environ, lambda status, headers: None)
+
+    def test_file_is_closed_without_server_file_wrapper(self):
+        response = self.get('/static/app.css')
+        self.assertEqual(b''.join(response), b'body {}')
+        response.close()
+        self.assertTrue(response.filelike.closed)
+
+    def test_misses_are_not_cached(self):
+        for n in range(3):
+            self.assertEqual(self.get(f'/static/tidak-ada-{n}.css'), [b'django'])
+        self.get('/static/app.css')
+        self.assertEqual(list(self.app._static_paths), ['app.css'])
+
+
+class MigrateToProductionTests(TestCase):
+    """migrate_to_production.py with the local blob client and the test database as target."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        self.checkpoint_path = os.path.join(self.tmp, 'checkpoint.json')
+        # Source: an empty migrated database with a few rows written through sqlite3
+        self.source = os.path.join(self.tmp, 'source.sqlite3')
+        with open(settings.SQLITE_TEMPLATE_PATH, 'rb') as src, open(self.source, 'wb') as dest:
+            dest.write(src.read())
+        self.write_source(Instansi(id=1, nama_instansi='Instansi Sumber'))
+        for n in range(1, 6):
+            self.write_source(Pegawai(id=n, nama=f'PEGAWAI SUMBER {n}', nip=f'19900101202001{n:04d}', **PERSON_FIELDS))
+
+    def write_source(self, obj):
+        fields = obj._meta.concrete_fields
+        values = [field.get_db_prep_save(field.pre_save(obj, True), connection) for field in fields]
+        with sqlite3.connect(self.source) as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO {obj._meta.db_table} ({', '.join(f.column for f in fields)}) "
+                f"VALUES ({', '.join('?' * len(fields))})",
+                values,
+            )
+        conn.close()
+
+    def migrate(self, **kwargs):
+        checkpoint = migrate_to_production.Checkpoint(self.checkpoint_path)
+        with redirect_stdout(io.StringIO()):
+            migrate_to_production.migrate_data(checkpoint, self.source, batch_size=2, **kwargs)
+        return checkpoint
+
+    def test_rerun_pushes_edits_to_migrated_rows(self):
+        checkpoint = self.migrate()
+        self.assertEqual(Pegawai.objects.count(), 5)
+        self.assertEqual(checkpoint.data['tables'], {})
+        self.write_source(Pegawai(id=1, nama='NAMA DIUBAH', nip='199001012020010001', **PERSON_FIELDS))
+        self.migrate()
+        self.assertEqual(Pegawai.objects.get(pk=1).nama, 'NAMA DIUBAH')
+
+    def test_resumes_after_failed_batch(self):
+        real_upsert = migrate_to_production._bulk_upsert
+        copied = []
+
+        def upsert(Model, columns, rows, batch_size):
+            if Model is Pegawai and len(copied) == 2:
+                raise RuntimeError('koneksi terputus')
+            real_upsert(Model, columns, rows, batch_size)
+            if Model is Pegawai:
+                copied.extend(row['id'] for row in rows)
+
+        with mock.patch('migrate_to_production._bulk_upsert', upsert), self.assertRaises(RuntimeError):
+            self.migrate()
+        self.assertEqual(migrate_to_production.Checkpoint(self.checkpoint_path).last_id('pegawai_pegawai'), 2)
+        self.assertEqual(Pegawai.objects.count(), 2)
+
+        with mock.patch('migrate_to_production._bulk_upsert', wraps=real_upsert) as resumed:
+            checkpoint = self.migrate()
+        pegawai_rows = [call.args[2] for call in resumed.call_args_list if call.args[0] is Pegawai]
+        self.assertEqual([row['id'] for rows in pegawai_rows for row in rows], [3, 4, 5])
+        self.assertEqual(Pegawai.objects.count(), 5)
+        self.assertEqual(checkpoint.data['tables'], {})
+
+    def media_files(self):
+        media_root = os.path.join(self.tmp, 'mediafiles')
+        os.makedirs(os.path.join(media_root, 'sertifikat_pendidikan'))
+        for name in ('a.pdf', 'b.pdf'):
+            with open(os.path.join(media_root, 'sertifikat_pendidikan', name), 'wb') as f:
+                f.write(name.encode() * 100)
+        return media_root
+
+    def upload(self, client, media_root):
+        checkpoint = migrate_to_production.Checkpoint(self.checkpoint_path)
+        with mock.patch.dict(os.environ, {'BLOB_LOCAL_ROOT': client.root}), \
+                mock.patch('AppAk2.blob_clients.get_blob_client', return_value=client), \
+                mock.patch.object(client, 'upload_file', wraps=client.upload_file) as upload_file, \
+                redirect_stdout(io.StringIO()):
+            migrate_to_production.upload_files_to_blob(checkpoint, workers=2, media_root=media_root)
+        return sorted(call.args[1] for call in upload_file.call_args_list)
+
+    def test_upload_skips_unchanged_files(self):
+        media_root = self.media_files()
+        client = LocalBlobClient(os.path.join(self.tmp, 'blobs'))
+        names = ['sertifikat_pendidikan/a.pdf', 'sertifikat_pendidikan/b.pdf']
+        self.assertEqual(self.upload(client, media_root), names)
+        self.assertEqual(self.upload(client, media_root), [])
+
+        # A changed file and a blob missing from the store go up again
+        with open(os.path.join(media_root, 'sertifikat_pendidikan', 'a.pdf'), 'ab') as f:
+            f.write(b'diubah')
+        client.delete('sertifikat_pendidikan/b.pdf')
+        self.assertEqual(self.upload(client, media_root), names)
+        self.assertEqual(client.get('sertifikat_pendidikan/a.pdf').content[-6:], b'diubah')
+
+    def test_dry_run_writes_nothing(self):
+        self.media_files()
+        blob_root = os.path.join(self.tmp, 'blobs')
+        env = {'BLOB_LOCAL_ROOT': blob_root, 'DB_NAME': 'x', 'DB_USER': 'x', 'DB_PASSWORD': 'x', 'DB_HOST': 'x'}
+        with mock.patch.dict(os.environ, env), mock.patch('migrate_to_production.BASE_DIR', self.tmp), \
+                redirect_stdout(io.StringIO()):
+            migrate_to_production.main(['--dry-run', '--checkpoint', self.checkpoint_path, '--sqlite', self.source])
+        self.assertFalse(os.path.exists(self.checkpoint_path))
+        self.assertEqual(list(LocalBlobClient(blob_root).iter_objects()), [])
+        self.assertFalse(Pegawai.objects.exists())
+        self.assertFalse(Instansi.objects.exists())
+
+
+class DesktopWarmUpTests(SimpleTestCase):
+    def test_warm_up_starts_on_first_report_page(self):
+        app = desktop_launcher._warm_up_on_report_page(lambda environ, start_response: [b'ok'], None)
+        with mock.patch('desktop_launcher.start_pdf_warm_up') as warm_up:
+            app({'PATH_INFO': '/pegawai/'}, None)
+            self.assertFalse(warm_up.called)
+            for _ in range(2):
+                app({'PATH_INFO': '/pegawai/konversi/'}, None)
+        self.assertEqual(warm_up.call_count, 1)
+
+
+class RecalculateAkTests(TestCase):
+    # Month ends, a leap day, a period ending before it starts, a one-day
+    # period and values missing from the constants mappings
+    PERIODS = [
+        (date(2020, 1, 1), date(2020, 12, 31), 'Baik', 'KEAHLIAN - AHLI MUDA'),
+        (date(2020, 1, 31), date(2020, 2, 29), 'Sangat Baik', 'KEAHLIAN - AHLI PERTAMA'),
+        (date(2020, 2, 29), date(2021, 2, 28), 'Butuh Perbaikan', 'KETERAMPILAN - MAHIR'),
+        (date(2021, 3, 31), date(2021, 4, 30), 'Kurang', 'KEAHLIAN - AHLI MADYA'),
+        (date(2021, 5, 15), date(2021, 5, 16), 'Sangat Kurang', 'KETERAMPILAN - PEMULA'),
+        (date(2021, 6, 10), date(2021, 6, 10), 'Baik', 'KETERAMPILAN - PENYELIA'),
+        (date(2022, 8, 31), date(2022, 1, 15), 'Baik', 'KEAHLIAN - AHLI UTAMA'),
+        (date(2022, 1, 1), date(2023, 6, 30), 'Tidak Dikenal', 'KEAHLIAN - AHLI MUDA'),
+        (date(2022, 7, 1), date(2022, 12, 31), 'Baik', 'JENJANG LAMA'),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        instansi = Instansi.objects.create(nama_instansi='Instansi Uji')
+        penilai = Penilai.objects.create(nama='Penilai Uji', nip='198001012010011001', **PERSON_FIELDS)
+        cls.pegawai = Pegawai.objects.create(nama='PEGAWAI HITUNG', nip='199001012020011077', **PERSON_FIELDS)
+        for awal, akhir, penilaian, jenjang in cls.PERIODS:
+            # Stale derived values, as after a change of the constants
+            AK.objects.create(
+                pegawai=cls.pegawai, instansi=instansi, penilai=penilai,
+                tanggal_awal_penilaian=awal, tanggal_akhir_penilaian=akhir,
+                penilaian=penilaian, prosentase=1, koefisien=1.0, jumlah_angka_kredit=1.0,
+                tanggal_ditetapkan=akhir, tempat_ditetapkan='Kota', jenjang=jenjang,
+            )
+
+    def test_matches_per_row_calculation(self):
+        checked, changed = recalculate_ak(chunk_size=4)
+
+        self.assertEqual((checked, changed), (len(self.PERIODS), len(self.PERIODS)))
+        for ak in AK.objects.order_by('pk'):
+            expected = _calculate_ak_fields(AK(
+                penilaian=ak.penilaian, jenjang=ak.jenjang,
+                tanggal_awal_penilaian=ak.tanggal_awal_penilaian, tanggal_akhir_penilaian=ak.tanggal_akhir_penilaian,
+            ))
+            self.assertEqual(
+                (ak.prosentase, ak.koefisien, ak.jumlah_angka_kredit),
+                (expected.prosentase, expected.koefisien, expected.jumlah_angka_kredit),
+                ak.tanggal_awal_penilaian,
+            )
+        self.assertEqual(recalculate_ak(), (len(self.PERIODS), 0))
+
+
+class PdfCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.instansi = Instansi.objects.create(nama_instansi='Instansi Lama')
+        penilai = Penilai.objects.create(nama='Penilai Uji', nip='198001012010011001', **PERSON_FIELDS)
+        cls.pegawai = Pegawai.objects.create(nama='PEGAWAI CACHE', nip='199001012020011088', **PERSON_FIELDS)
+        cls.other = Pegawai.objects.create(nama='PEGAWAI LAIN', nip='199001012020011089', **PERSON_FIELDS)
+        cls.ak = AK.objects.create(
+            pegawai=cls.pegawai, instansi=cls.instansi, penilai=penilai,
+            tanggal_awal_penilaian=date(2020, 1, 1), tanggal_akhir_penilaian=date(2020, 12, 31),
+            penilaian='Baik', prosentase=100, koefisien=25, jumlah_angka_kredit=25,
+            tanggal_ditetapkan=date(2020, 12, 31), tempat_ditetapkan='Kota', jenjang='KEAHLIAN - AHLI MUDA',
+        )
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache_dir = tmp.name
+        overrides = override_settings(PDF_CACHE_ENABLED=True, PDF_CACHE_DIR=tmp.name, PDF_BACKGROUND_JOBS=False)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        # The "PDF" is the report HTML, so the response shows what it was built from
+        self.convert = mock.Mock(side_effect=lambda html: (html.encode('utf-8'), {}))
+        # A fresh process-wide cache, created in the temporary directory
+        for patcher in (mock.patch('pegawai.pdf_cache._pdf_cache', None),
+                        mock.patch('pegawai.utils.html_to_pdf_timed', self.convert)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def get_pdf(self):
+        response = self.client.get(reverse('akumulasi_pdf'), {'pegawai_id': self.pegawai.pk})
+        self.assertEqual(response.status_code, 200)
+        return response.content
+
+    def cache_key(self):
+        return report_cache_key('akumulasi', ReportSnapshot(Pegawai.objects.get(pk=self.pegawai.pk)))
+
+    def test_repeated_report_is_served_from_cache(self):
+        first = self.get_pdf()
+        self.assertEqual(self.get_pdf(), first)
+        self.assertEqual(self.convert.call_count, 1)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+
+    def test_key_changes_when_report_inputs_change(self):
+        key = self.cache_key()
+        self.assertEqual(self.cache_key(), key)
+        AK.objects.filter(pk=self.ak.pk).update(penilaian='Sangat Baik', updated_at=self.ak.updated_at + timedelta(seconds=1))
+        edited_ak_key = self.cache_key()
+        self.assertNotEqual(edited_ak_key, key)
+        Instansi.objects.filter(pk=self.instansi.pk).update(nama_instansi='Instansi Baru')
+        self.assertNotEqual(self.cache_key(), edited_ak_key)
+        self.assertTrue(key.startswith(f'{self.pegawai.pk}-'))
+
+    def test_row_change_drops_only_that_pegawais_reports(self):
+        pdf_cache = get_pdf_cache()
+        pdf_cache.set(f'{self.pegawai.pk}-lama', b'%PDF lama')
+        pdf_cache.set(f'{self.other.pk}-lain', b'%PDF lain')
+
+        self.ak.save()
+        self.assertIsNone(pdf_cache.get(f'{self.pegawai.pk}-lama'))
+        self.assertEqual(pdf_cache.get(f'{self.other.pk}-lain'), b'%PDF lain')
+        self.assertEqual(os.listdir(self.cache_dir), [f'{self.other.pk}-lain.pdf'])
+
+    def test_instansi_change_clears_cache(self):
+        pdf_cache = get_pdf_cache()
+        pdf_cache.set(f'{self.other.pk}-lain', b'%PDF lain')
+        self.instansi.save()
+        self.assertIsNone(pdf_cache.get(f'{self.other.pk}-lain'))
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+    def test_edits_produce_fresh_pdf(self):
+        self.assertIn(b'Instansi Lama', self.get_pdf())
+
+        self.ak.penilaian = 'Sangat Baik'
+        self.ak.save()
+        self.get_pdf()
+        self.assertEqual(self.convert.call_count, 2)
+
+        self.instansi.nama_instansi = 'Instansi Baru'
+        self.instansi.save()
+        pdf = self.get_pdf()
+        self.assertEqual(self.convert.call_count, 3)
+        self.assertIn(b'Instansi Baru', pdf)
+        self.assertNotIn(b'Instansi Lama', pdf)
+
+
+class CreditSummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.instansi = Instansi.objects.create(nama_instansi='Instansi Uji')
+        cls.penilai = Penilai.objects.create(nama='Penilai Uji', nip='198001012010011001', **PERSON_FIELDS)
+        cls.pegawai = Pegawai.objects.create(nama='PEGAWAI RINGKASAN', nip='199001012020011066', **PERSON_FIELDS)
+        cls.other = Pegawai.objects.create(nama='PEGAWAI TUJUAN', nip='199001012020011067', **PERSON_FIELDS)
+
+    def make_ak(self, pegawai, year, jumlah):
+        return AK(
+            pegawai=pegawai, instansi=self.instansi, penilai=self.penilai,
+            tanggal_awal_penilaian=date(year, 1, 1), tanggal_akhir_penilaian=date(year, 12, 31),
+            penilaian='Baik', prosentase=100, koefisien=25, jumlah_angka_kredit=jumlah,
+            tanggal_ditetapkan=date(year, 12, 31), tempat_ditetapkan='Kota', jenjang='KEAHLIAN - AHLI MUDA',
+        )
+
+    def summary(self, pegawai):
+        return PegawaiCreditSummary.objects.get(pegawai=pegawai)
+
+    def test_rebuild_totals(self):
+        # bulk_create skips the signals, so only the rebuild fills the summaries in
+        AK.objects.bulk_create([self.make_ak(self.pegawai, 2020, 12.5), self.make_ak(self.pegawai, 2021, 25.0)])
+        AkPendidikan.objects.bulk_create([AkPendidikan(
+            pegawai=self.pegawai, instansi=self.instansi, penilai=self.penilai,
+            tanggal_awal_penilaian=date(2021, 1, 1), tanggal_akhir_penilaian=date(2021, 12, 31),
+            jenis_kegiatan='Diklat', tanggal_pelaksanaan=date(2021, 6, 1), durasi_pelatihan=40,
+            jumlah_angka_kredit=6.25, tanggal_ditetapkan=date(2021, 12, 31), tempat_ditetapkan='Kota',
+            nomor_sertifikat='SERT-001',
+        )])
+        AngkaIntegrasi.objects.bulk_create([AngkaIntegrasi(pegawai=self.pegawai, jumlah_angka_integrasi=40.0)])
+
+        self.assertEqual(rebuild_credit_summaries([self.pegawai.pk, self.other.pk]), 2)
+
+        summary = self.summary(self.pegawai)
+        self.assertEqual((summary.total_ak, summary.jumlah_ak), (37.5, 2))
+        self.assertEqual((summary.total_pendidikan, summary.jumlah_pendidikan), (6.25, 1))
+        self.assertEqual(summary.angka_integrasi, 40.0)
+        self.assertEqual((summary.periode_awal, summary.periode_akhir), (date(2020, 1, 1), date(2021, 12, 31)))
+        self.assertEqual(summary.latest_ak.tanggal_akhir_penilaian, date(2021, 12, 31))
+        empty = self.summary(self.other)
+        self.assertEqual((empty.total_ak, empty.jumlah_ak, empty.latest_ak, empty.angka_integrasi), (0.0, 0, None, None))
+
+    def test_save_refreshes_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            ak = self.make_ak(self.pegawai, 2020, 12.5)
+            ak.save()
+        self.assertFalse(PegawaiCreditSummary.objects.filter(pegawai=self.pegawai).exists())
+        for callback in callbacks:
+            callback()
+        summary = self.summary(self.pegawai)
+        self.assertEqual((summary.total_ak, summary.latest_ak_id), (12.5, ak.pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ak.delete()
+        self.assertEqual((self.summary(self.pegawai).total_ak, self.summary(self.pegawai).latest_ak), (0.0, None))
+
+    def test_moved_row_refreshes_both_summaries(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            older = self.make_ak(self.pegawai, 2020, 12.5)
+            older.save()
+            newer = self.make_ak(self.pegawai, 2021, 25.0)
+            newer.save()
+        self.assertEqual(self.summary(self.pegawai).latest_ak_id, newer.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            newer.pegawai = self.other
+            newer.save()
+
+        moved_from = self.summary(self.pegawai)
+        self.assertEqual((moved_from.total_ak, moved_from.jumlah_ak, moved_from.latest_ak_id), (12.5, 1, older.pk))
+        moved_to = self.summary(self.other)
+        self.assertEqual((moved_to.total_ak, moved_to.jumlah_ak, moved_to.latest_ak_id), (25.0, 1, newer.pk))
+
+
+class PegawaiCsvImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.existing = Pegawai.objects.create(nama='PEGAWAI LAMA', nip='199001012020011055', **PERSON_FIELDS)
+
+    def csv_file(self, *rows):
+        out = io.StringIO()
+        writer = csv.DictWriter(out, fieldnames=['nip', *PEGAWAI_IMPORT_FIELDS])
+        writer.writeheader()
+        for nip, nama, *tanggal_lahir in rows:
+            writer.writerow({
+                **PERSON_FIELDS, 'nip': nip, 'nama': nama, 'no_seri_karpeg': '',
+                'tanggal_lahir': tanggal_lahir[0] if tanggal_lahir else '1980-01-01',
+            })
+        return io.BytesIO(out.getvalue().encode('utf-8'))
+
+    def test_insert_and_update(self):
+        imported, errors = import_pegawai_from_csv(self.csv_file(
+            ('199001012020011055', 'PEGAWAI DIUBAH'),
+            ('199001012020011056', 'PEGAWAI BARU', '01-02-1985'),
+        ))
+
+        self.assertEqual((imported, errors), (2, []))
+        self.assertEqual(Pegawai.objects.get(pk=self.existing.pk).nama, 'PEGAWAI DIUBAH')
+        baru = Pegawai.objects.get(nip='199001012020011056')
+        self.assertEqual((baru.nama, baru.tanggal_lahir), ('PEGAWAI BARU', date(1985, 2, 1)))
+
+    def test_duplicate_nip_counted_once(self):
+        imported, errors = import_pegawai_from_csv(self.csv_file(
+            ('199001012020011056', 'PEGAWAI PERTAMA'),
+            ('199001012020011056', 'PEGAWAI KEDUA'),
+        ))
+
+        self.assertEqual(imported, 1)
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(errors[0].startswith('Row 2: NIP 199001012020011056'))
+        self.assertEqual(Pegawai.objects.get(nip='199001012020011056').nama, 'PEGAWAI KEDUA')
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        imported, errors = import_pegawai_from_csv(self.csv_file(
+            ('', 'TANPA NIP'),
+            ('199001012020011057', 'TANGGAL SALAH', '1985/02/01'),
+            ('199001012020011058', 'PEGAWAI VALID'),
+        ))
+
+        self.assertEqual(imported, 1)
+        self.assertEqual([error.split(':')[0] for error in errors], ['Row 2', 'Row 3'])
+        self.assertEqual(set(Pegawai.objects.values_list('nip', flat=True)), {'199001012020011055', '199001012020011058'})
+
+    def test_failed_write_rolls_back(self):
+        # Without upsert support inserts and updates are separate writes; the
+        # failing update must take the already inserted rows with it
+        with mock.patch.object(connection.features, 'supports_update_conflicts_with_target', False), \
+                mock.patch.object(Pegawai.objects, 'bulk_update', side_effect=DatabaseError('disk penuh')):
+            with self.assertRaises(DatabaseError):
+                import_pegawai_from_csv(self.csv_file(
+                    ('199001012020011055', 'PEGAWAI DIUBAH'),
+                    ('199001012020011056', 'PEGAWAI BARU'),
+                ))
+
+        self.assertFalse(Pegawai.objects.filter(nip='199001012020011056').exists())
+        self.assertEqual(Pegawai.objects.get(pk=self.existing.pk).nama, 'PEGAWAI LAMA')
+
+
+LEGACY_PERSON_COLUMNS = [
+    'nama', 'nip', 'no_seri_karpeg', 'tempat_lahir', 'tanggal_lahir', 'jenis_kelamin',
+    'pangkat', 'golongan', 'tmt_pangkat', 'jabatan', 'tmt_jabatan', 'unit_kerja',
+]
+LEGACY_AK_COLUMNS = [
+    'id', 'pegawai_id', 'instansi_id', 'penilai_id', 'tanggal_awal_penilaian', 'tanggal_akhir_penilaian',
+    'penilaian', 'prosentase', 'koefisien', 'jumlah_angka_kredit', 'tanggal_ditetapkan',
+    'tempat_ditetapkan', 'jenjang',
+]
+
+
+@skipUnless(find_spec('pandas'), 'import_data needs pandas')
+@override_settings(PDF_CACHE_ENABLED=False)
+class ImportDataCommandTests(TestCase):
+    """import_data against a small legacy pegawai.db."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.source = os.path.join(tmp.name, 'pegawai.db')
+        with sqlite3.connect(self.source) as conn:
+            person_columns = ', '.join(LEGACY_PERSON_COLUMNS)
+            conn.execute('CREATE TABLE instansi (id INTEGER PRIMARY KEY, nama_instansi TEXT)')
+            conn.execute(f'CREATE TABLE pegawai (id INTEGER PRIMARY KEY, {person_columns})')
+            conn.execute(f'CREATE TABLE penilai (id INTEGER PRIMARY KEY, {person_columns})')
+            conn.execute('CREATE TABLE angka_integrasi (id INTEGER PRIMARY KEY, pegawai_id INTEGER, jumlah_angka_integrasi REAL)')
+            conn.execute(f'CREATE TABLE ak ({", ".join(LEGACY_AK_COLUMNS)})')
+            conn.execute("INSERT INTO instansi VALUES (1, 'Instansi Lama')")
+            for table, legacy_id, nama, nip in [
+                ('pegawai', 10, 'PEGAWAI SATU', '199001012020011010'),
+                ('pegawai', 11, 'PEGAWAI DUA', '199001012020011011'),
+                ('pegawai', 12, 'PEGAWAI TANPA NIP', ''),
+                ('penilai', 20, 'PENILAI', '198001012010011020'),
+            ]:
+                conn.execute(
+                    f'INSERT INTO {table} VALUES (?, {", ".join("?" * len(LEGACY_PERSON_COLUMNS))})',
+                    [legacy_id, nama, nip, '', 'Kota', '1980-01-01', 'Laki-laki', 'Penata', 'III/c',
+                     '2015-04-01', 'Analis', '2015-04-01', 'Unit'],
+                )
+            # The second row belongs to a pegawai that is not in the legacy data
+            conn.executemany('INSERT INTO angka_integrasi VALUES (?, ?, ?)', [(1, 10, 40.0), (2, 99, 15.0)])
+            self.insert_ak(conn, [
+                (1, 10, '2020-01-01', 12.5),
+                (2, 10, '2021-01-01', 25.0),
+                (3, 11, '2020-01-01', 12.5),
+                (4, 99, '2020-01-01', 12.5),  # orphan
+                (5, 11, None, 12.5),  # no start date
+            ])
+
+    def insert_ak(self, conn, rows):
+        for ak_id, pegawai_id, awal, jumlah in rows:
+            akhir = f'{awal[:4]}-12-31' if awal else '2020-12-31'
+            conn.execute(
+                f'INSERT INTO ak VALUES ({", ".join("?" * len(LEGACY_AK_COLUMNS))})',
+                [ak_id, pegawai_id, 1, 20, awal, akhir, 'Baik', 100, 25.0, jumlah, akhir, 'Kota', 'KEAHLIAN - AHLI MUDA'],
+            )
+
+    def run_import(self, *args):
+        out = io.StringIO()
+        call_command('import_data', '--source', self.source, *args, stdout=out)
+        match = re.search(r'(\d+) created, (\d+) updated, (\d+) unchanged, (\d+) skipped\.\s*$', out.getvalue())
+        return tuple(int(count) for count in match.groups())
+
+    def test_full_incremental_and_changed_imports(self):
+        # Skipped: the pegawai without NIP, the orphan integrasi and AK rows, the AK without start date
+        self.assertEqual(self.run_import(), (8, 0, 0, 4))
+        self.assertEqual(AK.objects.count(), 3)
+        self.assertEqual(list(AngkaIntegrasi.objects.values_list('jumlah_angka_integrasi', flat=True)), [40.0])
+
+        self.assertEqual(self.run_import('--incremental'), (0, 0, 8, 4))
+
+        with sqlite3.connect(self.source) as conn:
+            conn.execute("UPDATE pegawai SET nama = 'PEGAWAI SATU BARU' WHERE id = 10")
+            conn.execute('UPDATE ak SET jumlah_angka_kredit = 30.0 WHERE id = 2')
+            self.insert_ak(conn, [(6, 11, '2021-01-01', 25.0)])
+        self.assertEqual(self.run_import('--incremental'), (1, 2, 6, 4))
+
+        pegawai = Pegawai.objects.get(nip='199001012020011010')
+        self.assertEqual(pegawai.nama, 'PEGAWAI SATU BARU')
+        self.assertEqual(AK.objects.count(), 4)
+        self.assertEqual(pegawai.credit_summary.total_ak, 42.5)
+        self.assertEqual(Pegawai.objects.get(nip='199001012020011011').credit_summary.total_ak, 37.5)
+
+
+class QueryTimingMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.pegawai = Pegawai.objects.create(nama='PEGAWAI TIMING', nip='199001012020011044', **PERSON_FIELDS)
+
+    def view(self, request):
+        # Three queries, one of them repeated with the same parameters
+        list(Pegawai.objects.filter(pk=self.pegawai.pk))
+        list(Pegawai.objects.filter(pk=self.pegawai.pk))
+        list(Pegawai.objects.filter(pk=0))
+        response = HttpResponse('ok')
+        response['Server-Timing'] = 'pdf;dur=5.0'
+        return response
+
+    @override_settings(REQUEST_TIMING_ENABLED=True)
+    def test_counts_queries_and_extends_server_timing(self):
+        middleware = QueryTimingMiddleware(self.view)
+        with self.assertLogs('appak.timing', 'INFO') as logs:
+            response = middleware(RequestFactory().get('/uji/'))
+
+        timing = response['Server-Timing']
+        self.assertTrue(timing.startswith('pdf;dur=5.0, db;dur='))
+        self.assertIn('desc="3 queries"', timing)
+        self.assertIn('tpl;dur=', timing)
+        self.assertIn('total;dur=', timing)
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual((entry['path'], entry['status'], entry['queries']), ('/uji/', 200, 3))
+        self.assertEqual((entry['duplicate_queries'], entry['repeated_sql']), (1, 2))
+        self.assertEqual(entry['duplicates'][0]['count'], 2)
+
+    @override_settings(REQUEST_TIMING_ENABLED=True)
+    def test_header_on_real_request(self):
+        with CaptureQueriesContext(connection) as queries, self.assertLogs('appak.timing', 'INFO'):
+            response = self.client.get(reverse('pegawai_list'))
+        self.assertIn(f'desc="{len(queries)} queries"', response['Server-Timing'])
+
+    @override_settings(REQUEST_TIMING_ENABLED=False)
+    def test_disabled_removes_itself(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            QueryTimingMiddleware(self.view)
+        response = self.client.get(reverse('pegawai_list'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+class PromotionTests(SimpleTestCase):
+    def test_aliases_normalize(self):
+        for raw in ('IIIC', 'iiic', ' 3c ', '3C', 'III/c'):
+            self.assertEqual(normalize_golongan(raw), 'III/c', raw)
+        self.assertEqual(normalize_golongan('IV/a'), 'IV/a')
+
+    def test_promotion_steps(self):
+        promotion = get_promotion(normalize_golongan('3a'))
+        self.assertEqual((promotion.next_golongan, promotion.teks_tujuan), ('III/b', 'Penata Muda Tingkat I III/b'))
+        self.assertEqual((promotion.pangkat_minimal, promotion.jenjang_minimal, promotion.pendidikan_ak), (50, 100, 25.0))
+        self.assertEqual((promotion.lama, promotion.pengurangan), (0.0, 0))
+
+    def test_jenjang_not_available_for_iv_d(self):
+        promotion = get_promotion('IV/d')
+        self.assertEqual(promotion.next_golongan, 'IV/e')
+        self.assertIsNone(promotion.jenjang_minimal)
+        self.assertEqual(promotion.pendidikan_ak, 50.0)
+
+    def test_top_and_unknown_golongan(self):
+        top = get_promotion(GOLONGAN_HIERARKI[-1])
+        self.assertEqual((top.next_golongan, top.teks_tujuan, top.pendidikan_ak), ('Tertinggi', 'Tertinggi', 0.0))
+        for raw in ('II/a', '', 'V/z'):
+            self.assertIs(get_promotion(normalize_golongan(raw)), UNKNOWN_PROMOTION)
+        self.assertEqual((UNKNOWN_PROMOTION.next_golongan, UNKNOWN_PROMOTION.pangkat_minimal), ('N/A', 0.0))
+
+
+class ExplainIndexesCommandTests(TestCase):
+    def explain(self, *args):
+        out = io.StringIO()
+        call_command('explain_indexes', '--repeat', '1', *args, stdout=out)
+        return {line.split('  ')[0]: line for line in out.getvalue().splitlines()}, out.getvalue()
+
+    def test_index_walks_reported_apart_from_seeks(self):
+        lines, _ = self.explain()
+        self.assertIn('index search', lines['report: AK by pegawai, by period start'])
+        self.assertIn('index scan (pegawai_pegawai)', lines['list: pegawai page ordered by nama'])
+
+    @skipUnless(connection.vendor == 'sqlite', 'trigram search fallback is SQLite only')
+    def test_short_search_warns_about_like_fallback(self):
+        _, output = self.explain()
+        self.assertNotIn('shorter than a trigram', output)
+        _, output = self.explain('--search', 'AN')
+        self.assertIn("--search 'AN' is shorter than a trigram", output)
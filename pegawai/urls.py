@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, direct_upload, views
 
 
 urlpatterns = [
@@ -26,6 +26,12 @@ urlpatterns = [
     path('merge_report/', views.merge_report_view, name='merge_report'),
     path('merge_report/pdf/', views.merge_report_pdf_view, name='merge_report_pdf'),
 
+    path('batch_reports/', views.batch_reports_view, name='batch_reports'),
+
+    # Background PDF jobs (POST to a *_pdf URL to create one)
+    path('pdf_jobs/<uuid:job_id>/', views.pdf_job_status, name='pdf_job_status'),
+    path('pdf_jobs/<uuid:job_id>/download/', views.pdf_job_download, name='pdf_job_download'),
+
     path('angka_integrasi/', views.angka_integrasi_list, name='angka_integrasi_list'),
     path('angka_integrasi/new/', views.AngkaIntegrasiCreateView.as_view(), name='angka_integrasi_new'),
     path('angka_integrasi/edit/<int:pk>/', views.AngkaIntegrasiUpdateView.as_view(), name='angka_integrasi_edit'),
@@ -40,11 +46,13 @@ urlpatterns = [
     path('penilai/new/', views.PenilaiCreateView.as_view(), name='penilai_new'),
     path('penilai/edit/<int:pk>/', views.PenilaiUpdateView.as_view(), name='penilai_edit'),
     path('penilai/delete/<int:pk>/', views.PenilaiDeleteView.as_view(), name='penilai_delete'),
+    path('penilai/export/', views.export_penilai_csv, name='penilai_export'),
 
     path('ak/', views.ak_list, name='ak_list'),
     path('ak/new/', views.AKCreateView.as_view(), name='ak_new'),
     path('ak/edit/<int:pk>/', views.AKUpdateView.as_view(), name='ak_edit'),
     path('ak/delete/<int:pk>/', views.AKDeleteView.as_view(), name='ak_delete'),
+    path('ak/export/', views.export_ak_csv, name='ak_export'),
     path('isi-nomor-ak/', views.isi_nomor_ak_view, name='isi_nomor_ak'),
 
     # Ak Pendidikan URLs
@@ -52,6 +60,14 @@ urlpatterns = [
     path('ak_pendidikan/new/', views.AkPendidikanCreateView.as_view(), name='ak_pendidikan_new'),
     path('ak_pendidikan/edit/<int:pk>/', views.AkPendidikanUpdateView.as_view(), name='ak_pendidikan_edit'),
     path('ak_pendidikan/delete/<int:pk>/', views.AkPendidikanDeleteView.as_view(), name='ak_pendidikan_delete'),
+    path('ak_pendidikan/export/', views.export_ak_pendidikan_csv, name='ak_pendidikan_export'),
+    # Direct certificate uploads (SERTIFIKAT_DIRECT_UPLOAD)
+    path('ak_pendidikan/upload/', direct_upload.sertifikat_upload_target, name='sertifikat_upload_target'),
+    path('ak_pendidikan/upload/<str:token>/', direct_upload.sertifikat_upload_put, name='sertifikat_upload_put'),
+
+    # Read-only JSON API (see pegawai/api.py)
+    path('api/<slug:resource>/', api.api_list, name='api_list'),
+    path('api/<slug:resource>/<int:pk>/', api.api_detail, name='api_detail'),
 
     # Instruction manual
     path('manual/', views.instruction_manual_pdf, name='instruction_manual'),
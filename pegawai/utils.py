@@ -1,14 +1,69 @@
 import csv
 import io
-from django.http import HttpResponse
+import logging
+import time
+from datetime import datetime
+
+from django.db import connection, transaction
+from django.http import HttpResponse, StreamingHttpResponse
 from django.template.loader import get_template
-from .models import Pegawai
-from io import BytesIO
+from django.utils import timezone
+from .models import Pegawai, Penilai, AK, AkPendidikan
+from .pdf import html_to_pdf_timed, format_server_timing, renderer, PdfRenderError
 import os
 
+logger = logging.getLogger(__name__)
+
+# Templates warmed up at startup (see warm_up_pdf_renderer)
+PDF_REPORT_TEMPLATES = [
+    'pegawai/konversi_report_template.html',
+    'pegawai/akumulasi_report_template.html',
+    'pegawai/penetapan_report_template.html',
+    'pegawai/merge_report_pdf_template.html',
+]
+
+_compiled_templates = {}
+
+
+def get_compiled_template(template_src):
+    """
+    get_template, but the compiled template is kept for the life of the
+    process (Django only caches templates when DEBUG is off). It is compiled
+    again when its file changes.
+    """
+    entry = _compiled_templates.get(template_src)
+    if entry is not None:
+        template, path, mtime = entry
+        try:
+            if path is None or os.stat(path).st_mtime == mtime:
+                return template
+        except OSError:
+            pass
+    template = get_template(template_src)
+    path = getattr(getattr(template, 'origin', None), 'name', None)
+    try:
+        mtime = os.stat(path).st_mtime if path else None
+    except OSError:
+        path = mtime = None
+    _compiled_templates[template_src] = (template, path, mtime)
+    return template
+
+
+def render_template_timed(template_src, context_dict):
+    """Render ``template_src`` to HTML; returns ``(html, timings)`` with the "template" phase."""
+    start = time.perf_counter()
+    html = get_compiled_template(template_src).render(context_dict)
+    return html, {'template': (time.perf_counter() - start) * 1000}
+
+
+def log_pdf_timings(name, timings):
+    logger.info('PDF %s: %s', name, format_server_timing(timings))
+
+
 def render_to_pdf(template_src, context_dict=None):
     """
-    Render HTML template to PDF using xhtml2pdf
+    Render HTML template to PDF using xhtml2pdf.
+    The phase timings are sent in a Server-Timing header.
     """
     if context_dict is None:
         context_dict = {}
@@ -19,133 +74,301 @@ def render_to_pdf(template_src, context_dict=None):
         return HttpResponse(f"xhtml2pdf import error: {e}", status=500)
 
     try:
-        template = get_template(template_src)
-        html = template.render(context_dict)
-        result = BytesIO()
-        pdf = pisa.CreatePDF(html, dest=result, encoding='utf-8')
-        if not pdf.err:
-            return HttpResponse(result.getvalue(), content_type='application/pdf')
-        return HttpResponse(f"Error generating PDF: {pdf.err}", status=500)
+        html, timings = render_template_timed(template_src, context_dict)
+        pdf, pdf_timings = html_to_pdf_timed(html)
+        timings.update(pdf_timings)
+        log_pdf_timings(template_src, timings)
+        response = HttpResponse(pdf, content_type='application/pdf')
+        response['Server-Timing'] = format_server_timing(timings)
+        return response
+    except PdfRenderError as e:
+        return HttpResponse(str(e), status=500)
     except Exception as e:
         import traceback
         traceback.print_exc()
         return HttpResponse(f"Error generating PDF: {str(e)}", status=500)
 
+
+def warm_up_pdf_renderer(templates=PDF_REPORT_TEMPLATES):
+    """
+    Compile the report templates and convert each (rendered without data) once,
+    so the first real report does not pay for imports, fonts and CSS parsing.
+    Returns the time taken in milliseconds.
+    """
+    start = time.perf_counter()
+    documents = []
+    for template_src in templates:
+        try:
+            documents.append(get_compiled_template(template_src).render({}))
+        except Exception:
+            pass
+    renderer.warm_up(documents)
+    return (time.perf_counter() - start) * 1000
+
+CSV_EXPORT_CHUNK_SIZE = 2000
+
+
+def _csv_date(value):
+    return value.strftime('%d-%m-%Y') if value else ''
+
+
+def _csv_nip(value):
+    # Format NIP to prevent Excel from converting to scientific notation
+    return f'="{value}"' if value else ''
+
+
+# Column definitions for each streaming export: (header, values_list lookup, formatter)
+PEGAWAI_CSV_COLUMNS = [
+    ('id', 'id', None),
+    ('nama', 'nama', None),
+    ('nip', 'nip', _csv_nip),
+    ('no_seri_karpeg', 'no_seri_karpeg', None),
+    ('tempat_lahir', 'tempat_lahir', None),
+    ('tanggal_lahir', 'tanggal_lahir', _csv_date),
+    ('jenis_kelamin', 'jenis_kelamin', None),
+    ('pangkat', 'pangkat', None),
+    ('golongan', 'golongan', None),
+    ('tmt_pangkat', 'tmt_pangkat', _csv_date),
+    ('jabatan', 'jabatan', None),
+    ('tmt_jabatan', 'tmt_jabatan', _csv_date),
+    ('unit_kerja', 'unit_kerja', None),
+]
+
+PENILAI_CSV_COLUMNS = PEGAWAI_CSV_COLUMNS
+
+AK_CSV_COLUMNS = [
+    ('id', 'id', None),
+    ('nip_pegawai', 'pegawai__nip', _csv_nip),
+    ('nama_pegawai', 'pegawai__nama', None),
+    ('instansi', 'instansi__nama_instansi', None),
+    ('nip_penilai', 'penilai__nip', _csv_nip),
+    ('nama_penilai', 'penilai__nama', None),
+    ('tanggal_awal_penilaian', 'tanggal_awal_penilaian', _csv_date),
+    ('tanggal_akhir_penilaian', 'tanggal_akhir_penilaian', _csv_date),
+    ('penilaian', 'penilaian', None),
+    ('prosentase', 'prosentase', None),
+    ('koefisien', 'koefisien', None),
+    ('jumlah_angka_kredit', 'jumlah_angka_kredit', None),
+    ('tanggal_ditetapkan', 'tanggal_ditetapkan', _csv_date),
+    ('tempat_ditetapkan', 'tempat_ditetapkan', None),
+    ('jenjang', 'jenjang', None),
+    ('nomor_ak', 'Nomor_AK', None),
+]
+
+AK_PENDIDIKAN_CSV_COLUMNS = [
+    ('id', 'id', None),
+    ('nip_pegawai', 'pegawai__nip', _csv_nip),
+    ('nama_pegawai', 'pegawai__nama', None),
+    ('instansi', 'instansi__nama_instansi', None),
+    ('nip_penilai', 'penilai__nip', _csv_nip),
+    ('nama_penilai', 'penilai__nama', None),
+    ('tanggal_awal_penilaian', 'tanggal_awal_penilaian', _csv_date),
+    ('tanggal_akhir_penilaian', 'tanggal_akhir_penilaian', _csv_date),
+    ('jenis_kegiatan', 'jenis_kegiatan', None),
+    ('tingkat', 'tingkat', None),
+    ('tanggal_pelaksanaan', 'tanggal_pelaksanaan', _csv_date),
+    ('durasi_pelatihan', 'durasi_pelatihan', None),
+    ('jumlah_angka_kredit', 'jumlah_angka_kredit', None),
+    ('tanggal_ditetapkan', 'tanggal_ditetapkan', _csv_date),
+    ('tempat_ditetapkan', 'tempat_ditetapkan', None),
+    ('nomor_sertifikat', 'nomor_sertifikat', None),
+    ('file_sertifikat', 'file_sertifikat', None),
+]
+
+
+class _Echo:
+    """File-like object whose write() just returns the value, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv_rows(queryset, columns, chunk_size=CSV_EXPORT_CHUNK_SIZE):
+    """
+    Yield CSV lines (header first) for ``queryset`` using ``columns``.
+
+    Rows are fetched with ``values_list().iterator()`` in chunks of
+    ``chunk_size``, so neither model instances nor the whole file are held
+    in memory.
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow([header for header, _, _ in columns])
+
+    lookups = [lookup for _, lookup, _ in columns]
+    formatters = [formatter for _, _, formatter in columns]
+    for row in queryset.values_list(*lookups).iterator(chunk_size=chunk_size):
+        yield writer.writerow([
+            formatter(value) if formatter else value
+            for value, formatter in zip(row, formatters)
+        ])
+
+
+def iter_pegawai_csv(chunk_size=CSV_EXPORT_CHUNK_SIZE):
+    return iter_csv_rows(Pegawai.objects.order_by('id'), PEGAWAI_CSV_COLUMNS, chunk_size)
+
+
+def iter_penilai_csv(chunk_size=CSV_EXPORT_CHUNK_SIZE):
+    return iter_csv_rows(Penilai.objects.order_by('id'), PENILAI_CSV_COLUMNS, chunk_size)
+
+
+def iter_ak_csv(chunk_size=CSV_EXPORT_CHUNK_SIZE):
+    return iter_csv_rows(AK.objects.order_by('id'), AK_CSV_COLUMNS, chunk_size)
+
+
+def iter_ak_pendidikan_csv(chunk_size=CSV_EXPORT_CHUNK_SIZE):
+    return iter_csv_rows(AkPendidikan.objects.order_by('id'), AK_PENDIDIKAN_CSV_COLUMNS, chunk_size)
+
+
+def streaming_csv_response(rows, filename):
+    """Wrap an iterator of CSV lines in a StreamingHttpResponse download."""
+    response = StreamingHttpResponse(rows, content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
 def export_pegawai_to_csv():
     """Export all Pegawai data to CSV format."""
-    # Create a StringIO buffer to write CSV data
-    buffer = io.StringIO()
-
-    # Define the fieldnames based on the Pegawai model
-    fieldnames = [
-        'id',
-        'nama',
-        'nip',
-        'no_seri_karpeg',
-        'tempat_lahir',
-        'tanggal_lahir',
-        'jenis_kelamin',
-        'pangkat',
-        'golongan',
-        'tmt_pangkat',
-        'jabatan',
-        'tmt_jabatan',
-        'unit_kerja'
-    ]
-
-    writer = csv.DictWriter(buffer, fieldnames=fieldnames)
-    writer.writeheader()
-
-    # Write all Pegawai objects to the CSV
-    for pegawai in Pegawai.objects.all():
-        writer.writerow({
-            'id': pegawai.id,
-            'nama': pegawai.nama,
-            'nip': f'="{pegawai.nip}"',  # Format NIP to prevent Excel from converting to scientific notation
-            'no_seri_karpeg': pegawai.no_seri_karpeg,
-            'tempat_lahir': pegawai.tempat_lahir,
-            'tanggal_lahir': pegawai.tanggal_lahir.strftime('%d-%m-%Y') if pegawai.tanggal_lahir else '',
-            'jenis_kelamin': pegawai.jenis_kelamin,
-            'pangkat': pegawai.pangkat,
-            'golongan': pegawai.golongan,
-            'tmt_pangkat': pegawai.tmt_pangkat.strftime('%d-%m-%Y') if pegawai.tmt_pangkat else '',
-            'jabatan': pegawai.jabatan,
-            'tmt_jabatan': pegawai.tmt_jabatan.strftime('%d-%m-%Y') if pegawai.tmt_jabatan else '',
-            'unit_kerja': pegawai.unit_kerja
-        })
-
-    # Get the CSV content
-    csv_content = buffer.getvalue()
-    buffer.close()
-
-    return csv_content
-
-def import_pegawai_from_csv(csv_file):
-    """Import Pegawai data from a CSV file."""
+    return ''.join(iter_pegawai_csv())
+
+PEGAWAI_IMPORT_BATCH_SIZE = 500
+
+# Pegawai fields written by the CSV import, besides the ``nip`` key
+PEGAWAI_IMPORT_FIELDS = [
+    'nama',
+    'no_seri_karpeg',
+    'tempat_lahir',
+    'tanggal_lahir',
+    'jenis_kelamin',
+    'pangkat',
+    'golongan',
+    'tmt_pangkat',
+    'jabatan',
+    'tmt_jabatan',
+    'unit_kerja',
+]
+PEGAWAI_IMPORT_DATE_FIELDS = ['tanggal_lahir', 'tmt_pangkat', 'tmt_jabatan']
+CSV_DATE_FORMATS = ['%Y-%m-%d', '%d-%m-%Y']
+
+
+def clean_csv_nip(nip):
+    """Undo the ways Excel mangles a NIP (formula wrapping, scientific notation)."""
+    # Handle different Excel formats that might appear
+    if nip.startswith('="') and nip.endswith('"'):
+        nip = nip[2:-1]  # Remove =" and " from the beginning and end
+    elif nip.startswith('=') and len(nip) > 1:
+        # Handle other Excel formulas like =123456789012345678
+        nip = nip[1:]
+
+    # Handle scientific notation (convert back to full number)
+    if 'E+' in nip.upper() or 'E-' in nip.upper():
+        try:
+            # Convert scientific notation back to full number string
+            nip = str(int(float(nip)))
+        except ValueError:
+            # If conversion fails, keep original
+            pass
+
+    # Remove any leading/trailing whitespace
+    return nip.strip()
+
+
+def parse_csv_date(value):
+    """Parse a CSV date in YYYY-MM-DD or DD-MM-YYYY (the export format)."""
+    value = value.strip()
+    for date_format in CSV_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(f"format tanggal tidak dikenali '{value}' (gunakan YYYY-MM-DD atau DD-MM-YYYY)")
+
+
+def _parse_pegawai_row(row):
+    """Validate one CSV row and return ``(nip, values)`` for Pegawai."""
+    nip = clean_csv_nip(row.get('nip') or '')
+    if not nip:
+        raise ValueError("NIP kosong")
+
+    values = {}
+    for field_name in PEGAWAI_IMPORT_FIELDS:
+        value = (row.get(field_name) or '').strip()
+        if field_name in PEGAWAI_IMPORT_DATE_FIELDS:
+            if not value:
+                raise ValueError(f"{field_name} wajib diisi")
+            value = parse_csv_date(value)
+        else:
+            max_length = Pegawai._meta.get_field(field_name).max_length
+            if max_length and len(value) > max_length:
+                raise ValueError(f"{field_name} melebihi {max_length} karakter")
+        values[field_name] = value
+    return nip, values
+
+
+def import_pegawai_from_csv(csv_file, batch_size=PEGAWAI_IMPORT_BATCH_SIZE):
+    """
+    Import Pegawai data from a CSV file.
+
+    The whole file is parsed and validated first; valid rows are then
+    upserted on ``nip`` with batched bulk writes inside one transaction.
+    Rows that fail validation are reported in ``errors`` and skipped, rows
+    identical to the stored data are not written again. When a NIP appears
+    more than once, the last row wins and the earlier ones are reported in
+    ``errors``. ``imported_count`` is the number of distinct NIPs imported.
+    """
     decoded_file = csv_file.read().decode('utf-8-sig')
     io_string = io.StringIO(decoded_file)
     reader = csv.DictReader(io_string)
 
-    imported_count = 0
     errors = []
+    parsed = {}
+    parsed_rows = {}
 
     for row_num, row in enumerate(reader, start=2):  # Start at 2 to account for header
         try:
-            # Clean the NIP field to handle various Excel formats
-            nip = row['nip']
-
-            # Handle different Excel formats that might appear
-            if nip.startswith('="') and nip.endswith('"'):
-                nip = nip[2:-1]  # Remove =" and " from the beginning and end
-            elif nip.startswith('=') and len(nip) > 1:
-                # Handle other Excel formulas like =123456789012345678
-                nip = nip[1:]
-
-            # Handle scientific notation (convert back to full number)
-            if 'E+' in nip.upper() or 'E-' in nip.upper():
-                try:
-                    # Convert scientific notation back to full number string
-                    nip = str(int(float(nip)))
-                except ValueError:
-                    # If conversion fails, keep original
-                    pass
-
-            # Remove any leading/trailing whitespace
-            nip = nip.strip()
-
-            # Convert date strings to date objects if they exist
-            tanggal_lahir = None
-            if row.get('tanggal_lahir'):
-                tanggal_lahir = row['tanggal_lahir']
-
-            tmt_pangkat = None
-            if row.get('tmt_pangkat'):
-                tmt_pangkat = row['tmt_pangkat']
-
-            tmt_jabatan = None
-            if row.get('tmt_jabatan'):
-                tmt_jabatan = row['tmt_jabatan']
-
-            # Create or update the Pegawai object
-            pegawai, created = Pegawai.objects.update_or_create(
-                nip=nip,
-                defaults={
-                    'nama': row.get('nama', ''),
-                    'no_seri_karpeg': row.get('no_seri_karpeg', ''),
-                    'tempat_lahir': row.get('tempat_lahir', ''),
-                    'tanggal_lahir': tanggal_lahir,
-                    'jenis_kelamin': row.get('jenis_kelamin', ''),
-                    'pangkat': row.get('pangkat', ''),
-                    'golongan': row.get('golongan', ''),
-                    'tmt_pangkat': tmt_pangkat,
-                    'jabatan': row.get('jabatan', ''),
-                    'tmt_jabatan': tmt_jabatan,
-                    'unit_kerja': row.get('unit_kerja', '')
-                }
-            )
-            imported_count += 1
-
+            nip, values = _parse_pegawai_row(row)
         except Exception as e:
             errors.append(f"Row {row_num}: Error importing - {str(e)}")
+            continue
+        if nip in parsed_rows:
+            errors.append(f"Row {parsed_rows[nip]}: NIP {nip} muncul lagi di baris {row_num}, data baris {row_num} yang dipakai")
+        parsed[nip] = values
+        parsed_rows[nip] = row_num
+
+    imported_count = len(parsed)
+    if not parsed:
+        return imported_count, errors
+
+    existing = {
+        row[0]: row[1:]
+        for row in Pegawai.objects.values_list('nip', 'id', *PEGAWAI_IMPORT_FIELDS)
+    }
+
+    to_create = []
+    to_update = []
+    for nip, values in parsed.items():
+        current = existing.get(nip)
+        if current is None:
+            to_create.append(Pegawai(nip=nip, **values))
+        elif tuple(current[1:]) != tuple(values[field_name] for field_name in PEGAWAI_IMPORT_FIELDS):
+            to_update.append(Pegawai(nip=nip, **values))
+
+    with transaction.atomic():
+        if connection.features.supports_update_conflicts_with_target:
+            # A single upsert also covers NIPs inserted concurrently since the lookup above
+            Pegawai.objects.bulk_create(
+                to_create + to_update,
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=['nip'],
+                update_fields=[*PEGAWAI_IMPORT_FIELDS, 'updated_at'],
+            )
+        else:
+            # bulk_update does not apply auto_now, so updated_at is set here
+            now = timezone.now()
+            for pegawai in to_update:
+                pegawai.id = existing[pegawai.nip][0]
+                pegawai.updated_at = now
+            Pegawai.objects.bulk_create(to_create, batch_size=batch_size)
+            Pegawai.objects.bulk_update(to_update, [*PEGAWAI_IMPORT_FIELDS, 'updated_at'], batch_size=batch_size)
 
-    return imported_count, errors
\ No newline at end of file
+    return imported_count, errors
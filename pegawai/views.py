@@ -1,23 +1,35 @@
 import csv
+import tempfile
+from functools import partial
 from django.shortcuts import render, get_object_or_404
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, FileResponse
 from django.contrib import messages
-from .models import Pegawai, AngkaIntegrasi, Instansi, Penilai, AK, AkPendidikan
+from .models import Pegawai, AngkaIntegrasi, Instansi, Penilai, AK, AkPendidikan, PegawaiCreditSummary
 from .forms import AKForm, PegawaiForm, AngkaIntegrasiForm, InstansiForm, PenilaiForm, AkPendidikanForm
 from datetime import datetime
 from django.db import models
 from dateutil.relativedelta import relativedelta
-from .utils import render_to_pdf, export_pegawai_to_csv, import_pegawai_from_csv
+from .utils import (
+    render_to_pdf, render_template_timed, import_pegawai_from_csv, streaming_csv_response,
+    iter_pegawai_csv, iter_penilai_csv, iter_ak_csv, iter_ak_pendidikan_csv,
+)
+from .reports import ReportSnapshot, build_konversi_report, build_akumulasi_report, build_penetapan_report
+from .batch import REPORT_TYPES, filter_pegawai, generate_reports_zip
+from .pdf_cache import get_pdf_cache, report_cache_key
+from .credit_summary import get_credit_summary
+from .pdf_jobs import JOB_DONE, completed_pdf_job, get_job_store, pdf_jobs_enabled, submit_file_job, submit_pdf_job
+from .listing import filter_by_nama, paginate_list
+from .conditional import conditional_page
 from django.conf import settings
 # pegawai/views.py
 from django.http import HttpResponse
 
 from .constants import (
-    PANGKAT_OPTIONS, GOLONGAN_HIERARKI, JENJANG_OPTIONS,
-    PENILAIAN_TO_PROSENTASE, JENJANG_TO_KOEFISIEN, MINIMAL_AK_MAPPING,
-    GOLONGAN_TO_LAMA
+    GOLONGAN_HIERARKI, JENJANG_OPTIONS,
+    PENILAIAN_TO_PROSENTASE, JENJANG_TO_KOEFISIEN,
+    get_promotion, normalize_golongan
 )
 
 
@@ -92,32 +104,34 @@ def dashboard(request):
     total_instansi = Instansi.objects.count()
     total_penilai = Penilai.objects.count()
     total_ak = AK.objects.count()
+    # Credit totals come from the per-pegawai summary rows instead of summing every AK
+    credit_totals = PegawaiCreditSummary.objects.aggregate(
+        total_nilai_ak=models.Sum('total_ak'),
+        total_nilai_pendidikan=models.Sum('total_pendidikan'),
+    )
     context = {
         'total_pegawai': total_pegawai,
         'total_instansi': total_instansi,
         'total_penilai': total_penilai,
         'total_ak': total_ak,
+        'total_nilai_ak': credit_totals['total_nilai_ak'] or 0,
+        'total_nilai_pendidikan': credit_totals['total_nilai_pendidikan'] or 0,
     }
     return render(request, 'pegawai/dashboard.html', context)
 
-from django.core.paginator import Paginator
-
+@conditional_page
 def pegawai_list(request):
     # Get the search query from the GET parameters
     search_query = request.GET.get('search', '')
 
-    # Start with all Pegawai objects, ordered by name in ascending order
-    pegawai_list = Pegawai.objects.order_by('nama')
+    pegawai_list = Pegawai.objects.all()
 
     # If there's a search query, filter by employee name
     if search_query:
-        pegawai_list = pegawai_list.filter(nama__icontains=search_query)
+        pegawai_list = filter_by_nama(pegawai_list, search_query)
 
-    # Apply pagination
-    paginator = Paginator(pegawai_list, 5)  # Show 5 employees per page
-
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # 5 employees per page, ordered by name
+    page_obj = paginate_list(request, pegawai_list, ('nama', 'id'), search_query)
 
     return render(request, 'pegawai/pegawai_list.html', {
         'page_obj': page_obj,
@@ -144,11 +158,19 @@ class PegawaiDeleteView(DeleteView):
 
 def export_pegawai_csv(request):
     """Export all Pegawai data to CSV file."""
-    csv_content = export_pegawai_to_csv()
+    return streaming_csv_response(iter_pegawai_csv(), 'pegawai_data.csv')
 
-    response = HttpResponse(csv_content, content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="pegawai_data.csv"'
-    return response
+def export_penilai_csv(request):
+    """Export all Penilai data to CSV file."""
+    return streaming_csv_response(iter_penilai_csv(), 'penilai_data.csv')
+
+def export_ak_csv(request):
+    """Export all AK data to CSV file."""
+    return streaming_csv_response(iter_ak_csv(), 'ak_data.csv')
+
+def export_ak_pendidikan_csv(request):
+    """Export all Ak Pendidikan data to CSV file."""
+    return streaming_csv_response(iter_ak_pendidikan_csv(), 'ak_pendidikan_data.csv')
 
 def import_pegawai_csv(request):
     """Import Pegawai data from CSV file."""
@@ -189,101 +211,14 @@ def pegawai_export_import(request):
     """Display the export/import page for Pegawai data."""
     return render(request, 'pegawai/pegawai_export_import.html')
 
-def _get_konversi_report_data(pegawai, ak_record_ids, include_integrasi, include_pendidikan=False):
+def _get_konversi_report_data(pegawai, ak_record_ids, include_integrasi, include_pendidikan=False, snapshot=None):
     """Helper function to generate data for the Konversi report."""
-
-    ak_records_for_report_qs = AK.objects.filter(pegawai=pegawai)
-    if ak_record_ids:
-        ak_records_for_report_qs = ak_records_for_report_qs.filter(id__in=ak_record_ids)
-
-    ak_records_for_report_qs = ak_records_for_report_qs.order_by('tanggal_awal_penilaian')
-
-    # Get the overall latest AK (unfiltered) to fetch Nomor_AK and other reference data
-    latest_ak = AK.objects.filter(pegawai=pegawai).order_by('tanggal_akhir_penilaian').last()
-
-    tahun = datetime.now().year
-    if latest_ak and latest_ak.tanggal_akhir_penilaian:
-        tahun = latest_ak.tanggal_akhir_penilaian.year
-    elif latest_ak and latest_ak.tanggal_ditetapkan:
-        tahun = latest_ak.tanggal_ditetapkan.year
-
-    jenjang_raw = ""
-    if latest_ak and latest_ak.jenjang:
-        jenjang_raw = latest_ak.jenjang
-
-    # Use the actual job title from the employee record instead of defaulting to "Analis"
-    tmt_jabatan_str = ""
-    if pegawai.tmt_jabatan:
-        tmt_jabatan_str = pegawai.tmt_jabatan.strftime('%d-%m-%Y')
-    jabatan_dan_tmt = f"{pegawai.jabatan} / {tmt_jabatan_str}" if tmt_jabatan_str else pegawai.jabatan
-
-    periode_awal_str = ''
-    periode_akhir_str = ''
-    if ak_records_for_report_qs.exists():
-        min_tgl_awal = ak_records_for_report_qs.aggregate(models.Min('tanggal_awal_penilaian'))['tanggal_awal_penilaian__min']
-        max_tgl_akhir = ak_records_for_report_qs.aggregate(models.Max('tanggal_akhir_penilaian'))['tanggal_akhir_penilaian__max']
-        if min_tgl_awal:
-            periode_awal_str = min_tgl_awal.strftime('%d-%m-%Y')
-        if max_tgl_akhir:
-            periode_akhir_str = max_tgl_akhir.strftime('%d-%m-%Y')
-
-    total_angka_kredit = 0.0
-    ak_list_for_report = list(ak_records_for_report_qs)
-    for ak_item in ak_list_for_report:
-        total_angka_kredit += ak_item.jumlah_angka_kredit
-
-    angka_integrasi_value = 0.0
-    if include_integrasi:
-        angka_integrasi_obj = AngkaIntegrasi.objects.filter(pegawai=pegawai).first()
-        if angka_integrasi_obj:
-            angka_integrasi_value = angka_integrasi_obj.jumlah_angka_integrasi
-            total_angka_kredit += angka_integrasi_value
-
-    # Handle Ak Pendidikan
-    ak_pendidikan_value = 0.0
-    ak_pendidikan_list = []
-    if include_pendidikan:
-        ak_pendidikan_records = AkPendidikan.objects.filter(pegawai=pegawai)
-        for ak_pend in ak_pendidikan_records:
-            ak_pendidikan_value += ak_pend.jumlah_angka_kredit
-            # Create a dictionary representation for display in the template
-            ak_pend_dict = {
-                'id': f'pendidikan_{ak_pend.id}',
-                'jenis_kegiatan': ak_pend.jenis_kegiatan,
-                'tanggal_pelaksanaan': ak_pend.tanggal_pelaksanaan,
-                'jumlah_angka_kredit': ak_pend.jumlah_angka_kredit,
-                'is_pendidikan_item': True,
-                'nomor_sertifikat': ak_pend.nomor_sertifikat,
-            }
-            ak_pendidikan_list.append(ak_pend_dict)
-
-        total_angka_kredit += ak_pendidikan_value
-
-    report_data = {
-        'pegawai': pegawai,
-        'ak_list': ak_list_for_report,
-        'tahun': tahun,
-        'nama_instansi': latest_ak.instansi.nama_instansi if latest_ak else '',
-        'periode_awal_str': periode_awal_str,
-        'periode_akhir_str': periode_akhir_str,
-        'jabatan_dan_tmt': jabatan_dan_tmt,
-        'total_angka_kredit': total_angka_kredit,
-        'include_angka_integrasi': include_integrasi,
-        'angka_integrasi_value': angka_integrasi_value,
-        'include_ak_pendidikan': include_pendidikan,
-        'ak_pendidikan_value': ak_pendidikan_value,
-        'ak_pendidikan_list': ak_pendidikan_list,
-        'tempat_ditetapkan': latest_ak.tempat_ditetapkan if latest_ak else '',
-        'tanggal_ditetapkan': latest_ak.tanggal_ditetapkan if latest_ak else datetime.now().date(),
-        'nama_penilai': latest_ak.penilai.nama if latest_ak and latest_ak.penilai else '',
-        'nip_penilai': latest_ak.penilai.nip if latest_ak and latest_ak.penilai else '',
-        'pangkat_penilai': latest_ak.penilai.pangkat if latest_ak and latest_ak.penilai else '',
-        'golongan_penilai': latest_ak.penilai.golongan if latest_ak and latest_ak.penilai else '',
-        'crud_angka_kredit': latest_ak.Nomor_AK if latest_ak and latest_ak.Nomor_AK else '',
-    }
-    return report_data, ak_list_for_report
+    if snapshot is None:
+        snapshot = ReportSnapshot(pegawai)
+    return build_konversi_report(snapshot, ak_record_ids, include_integrasi, include_pendidikan)
 
 
+@conditional_page
 def konversi_view(request):
     pegawai_options = Pegawai.objects.all()
     report_data = {}
@@ -335,31 +270,110 @@ def konversi_view(request):
     return render(request, 'pegawai/konversi.html', context)
 
 
+def _report_params(request):
+    """Report PDF parameters: the POST body when it has them (job requests), else the query string."""
+    if request.method == 'POST' and 'pegawai_id' in request.POST:
+        return request.POST
+    return request.GET
+
+
+def _pdf_job_response(job):
+    return JsonResponse({
+        'job_id': job['id'],
+        'status': job['status'],
+        'status_url': reverse('pdf_job_status', args=[job['id']]),
+        'download_url': reverse('pdf_job_download', args=[job['id']]),
+        'timeout': job['timeout'],
+    }, status=202)
+
+
+def _cached_pdf_response(cache_key, template_src, context, request=None, filename=None):
+    """
+    Like render_to_pdf, but serves and stores the PDF through the report PDF cache.
+
+    For a POST ``request`` the conversion is queued as a background job
+    instead (see pegawai.pdf_jobs) and a 202 response with the job id and
+    its status/download URLs is returned, unless PDF_BACKGROUND_JOBS is off.
+    """
+    pdf_cache = get_pdf_cache()
+    cached_pdf = pdf_cache.get(cache_key) if pdf_cache else None
+
+    if request is not None and request.method == 'POST' and pdf_jobs_enabled():
+        if cached_pdf is not None:
+            return _pdf_job_response(completed_pdf_job(cached_pdf, filename))
+        try:
+            html, timings = render_template_timed(template_src, context)
+        except Exception as e:
+            return JsonResponse({'error': f"Error rendering template: {e}"}, status=500)
+        on_success = (lambda pdf: pdf_cache.set(cache_key, pdf)) if pdf_cache else None
+        return _pdf_job_response(submit_pdf_job(html, filename, on_success=on_success, timings=timings))
+
+    if cached_pdf is not None:
+        response = HttpResponse(cached_pdf, content_type='application/pdf')
+    else:
+        response = render_to_pdf(template_src, context)
+        if pdf_cache and response.status_code == 200:
+            pdf_cache.set(cache_key, response.content)
+    if filename and response.status_code == 200:
+        response['Content-Disposition'] = f'inline; filename="{filename}"'
+    return response
+
+
+def pdf_job_status(request, job_id):
+    """Status of a background PDF job (JSON)."""
+    job = get_job_store().get(str(job_id))
+    if job is None:
+        return JsonResponse({'error': 'Job tidak ditemukan atau sudah kedaluwarsa.'}, status=404)
+    data = {'job_id': job['id'], 'status': job['status'], 'error': job['error'], 'timings': job.get('timings', {})}
+    if job['status'] == JOB_DONE:
+        data['download_url'] = reverse('pdf_job_download', args=[job['id']])
+    return JsonResponse(data)
+
+
+def pdf_job_download(request, job_id):
+    """Download the PDF of a finished background job."""
+    store = get_job_store()
+    job = store.get(str(job_id))
+    if job is None:
+        return HttpResponse("Job tidak ditemukan atau sudah kedaluwarsa.", status=404)
+    if job['status'] != JOB_DONE:
+        return HttpResponse(f"PDF belum selesai (status: {job['status']}).", status=409)
+    as_attachment = request.GET.get('download') == '1'
+    return FileResponse(open(store.pdf_path(job['id']), 'rb'), content_type=job.get('content_type', 'application/pdf'),
+                        as_attachment=as_attachment, filename=job['filename'] or 'laporan.pdf')
+
+
+@conditional_page
 def konversi_pdf_view(request):
-    pegawai_id = request.GET.get('pegawai_id')
+    params = _report_params(request)
+    pegawai_id = params.get('pegawai_id')
     if not pegawai_id:
         return HttpResponse("Pegawai ID is required.", status=400)
 
-    selected_period_ids = request.GET.getlist('selected_periods')
-    include_angka_integrasi_str = request.GET.get('include_angka_integrasi', 'false')
+    selected_period_ids = params.getlist('selected_periods')
+    include_angka_integrasi_str = params.get('include_angka_integrasi', 'false')
     include_angka_integrasi = include_angka_integrasi_str.lower() == 'true'
-    include_ak_pendidikan_str = request.GET.get('include_ak_pendidikan', 'false')
+    include_ak_pendidikan_str = params.get('include_ak_pendidikan', 'false')
     include_ak_pendidikan = include_ak_pendidikan_str.lower() == 'true'
 
     pegawai = get_object_or_404(Pegawai, id=pegawai_id)
+    snapshot = ReportSnapshot(pegawai)
 
     # If no periods are passed, get all of them for the report
     if not selected_period_ids:
-        selected_period_ids = list(AK.objects.filter(pegawai=pegawai).values_list('id', flat=True))
+        selected_period_ids = snapshot.ak_ids
 
-    report_data, ak_list_for_report = _get_konversi_report_data(pegawai, selected_period_ids, include_angka_integrasi, include_ak_pendidikan)
+    report_data, ak_list_for_report = _get_konversi_report_data(pegawai, selected_period_ids, include_angka_integrasi, include_ak_pendidikan, snapshot=snapshot)
 
     context = {
         'report_data': report_data,
         'ak_list': ak_list_for_report,
         'base_dir': settings.BASE_DIR,
     }
-    pdf = render_to_pdf('pegawai/konversi_report_template.html', context)
+    cache_key = report_cache_key('konversi', snapshot, selected_periods=[str(p) for p in selected_period_ids],
+                                 include_integrasi=include_angka_integrasi, include_pendidikan=include_ak_pendidikan)
+    pdf = _cached_pdf_response(cache_key, 'pegawai/konversi_report_template.html', context,
+                               request=request, filename=f"konversi_{pegawai.nip}.pdf")
     if pdf:
         return pdf
     return HttpResponse("Error generating PDF", status=500)
@@ -369,6 +383,7 @@ def isi_nomor_ak_view(request):
     pegawai_options = Pegawai.objects.all()
     selected_pegawai = None
     latest_ak = None
+    credit_summary = None
     success_message = ""
     error_message = ""
 
@@ -380,7 +395,8 @@ def isi_nomor_ak_view(request):
             try:
                 selected_pegawai = Pegawai.objects.get(id=pegawai_id)
                 # Get the latest AK record for this pegawai
-                latest_ak = AK.objects.filter(pegawai=selected_pegawai).order_by('tanggal_akhir_penilaian').last()
+                credit_summary = get_credit_summary(selected_pegawai)
+                latest_ak = credit_summary.latest_ak
 
                 if latest_ak:
                     latest_ak.Nomor_AK = nomor_ak
@@ -399,7 +415,8 @@ def isi_nomor_ak_view(request):
         if pegawai_id:
             try:
                 selected_pegawai = Pegawai.objects.get(id=pegawai_id)
-                latest_ak = AK.objects.filter(pegawai=selected_pegawai).order_by('tanggal_akhir_penilaian').last()
+                credit_summary = get_credit_summary(selected_pegawai)
+                latest_ak = credit_summary.latest_ak
             except Pegawai.DoesNotExist:
                 error_message = "Pegawai tidak ditemukan."
 
@@ -407,12 +424,14 @@ def isi_nomor_ak_view(request):
         'pegawai_options': pegawai_options,
         'selected_pegawai': selected_pegawai,
         'latest_ak': latest_ak,
+        'credit_summary': credit_summary,
         'success_message': success_message,
         'error_message': error_message,
     }
     return render(request, 'pegawai/isi_nomor_ak.html', context)
 
 
+@conditional_page
 def akumulasi_view(request):
     pegawai_options = Pegawai.objects.all()
     report_data = {}
@@ -647,13 +666,15 @@ def akumulasi_view(request):
     return render(request, 'pegawai/akumulasi.html', context)
 
 
+@conditional_page
 def akumulasi_pdf_view(request):
-    pegawai_id = request.GET.get('pegawai_id')
+    params = _report_params(request)
+    pegawai_id = params.get('pegawai_id')
     if not pegawai_id:
         return HttpResponse("Pegawai ID is required.", status=400)
 
-    selected_periods = request.GET.getlist('selected_periods') # Get selected period IDs
-    include_ak_pendidikan_str = request.GET.get('include_ak_pendidikan', 'false')
+    selected_periods = params.getlist('selected_periods') # Get selected period IDs
+    include_ak_pendidikan_str = params.get('include_ak_pendidikan', 'false')
     include_ak_pendidikan = include_ak_pendidikan_str.lower() == 'true'
 
     pegawai = get_object_or_404(Pegawai, id=pegawai_id)
@@ -674,27 +695,32 @@ def akumulasi_pdf_view(request):
                 except ValueError:
                     pass # Ignore invalid IDs
 
+    snapshot = ReportSnapshot(pegawai)
+
     # If no periods are passed, get all of them for the report
     if not selected_periods:
-        selected_ak_ids = list(AK.objects.filter(pegawai=pegawai).values_list('id', flat=True))
-        if AngkaIntegrasi.objects.filter(pegawai=pegawai).exists():
+        selected_ak_ids = snapshot.ak_ids
+        if snapshot.angka_integrasi:
             include_integrasi_filter = True
-        if AkPendidikan.objects.filter(pegawai=pegawai).exists():
+        if snapshot.ak_pendidikan_records:
             include_pendidikan_filter = True
 
-
-    report_data = _get_akumulasi_report_data(pegawai, selected_ak_ids, include_integrasi_filter, include_pendidikan_filter)
+    report_data = _get_akumulasi_report_data(pegawai, selected_ak_ids, include_integrasi_filter, include_pendidikan_filter, snapshot=snapshot)
 
     context = {
         'report_data': report_data,
         'ak_list': report_data.get('ak_list', []),
         'base_dir': settings.BASE_DIR,
     }
-    pdf = render_to_pdf('pegawai/akumulasi_report_template.html', context)
+    cache_key = report_cache_key('akumulasi', snapshot, selected_periods=selected_ak_ids,
+                                 include_integrasi=include_integrasi_filter, include_pendidikan=include_pendidikan_filter)
+    pdf = _cached_pdf_response(cache_key, 'pegawai/akumulasi_report_template.html', context,
+                               request=request, filename=f"akumulasi_{pegawai.nip}.pdf")
     if pdf:
         return pdf
     return HttpResponse("Error generating PDF", status=500)
 
+@conditional_page
 def penetapan_view(request):
     pegawai_options = Pegawai.objects.all()
     report_data = {}
@@ -784,25 +810,9 @@ def penetapan_view(request):
             tahun = latest_ak_unfiltered.tanggal_ditetapkan.year
 
         # === MODIFIKASI UTAMA: PENYESUAIAN BERDASARKAN GOLONGAN ===
-        raw_golongan = str(pegawai.golongan).strip()
-        # Normalisasi alternatif format golongan
-        alt_map = {
-            "IIIA": "III/a",
-            "IIIB": "III/b",
-            "IIIC": "III/c",
-            "IIID": "III/d",
-            "3A": "III/a",
-            "3B": "III/b",
-            "3C": "III/c",
-            "3D": "III/d",
-            "3a": "III/a",
-            "3b": "III/b",
-            "3c": "III/c",
-            "3d": "III/d",
-        }
-        golongan = alt_map.get(raw_golongan.upper(), raw_golongan)
+        promotion = get_promotion(normalize_golongan(pegawai.golongan))
 
-        total_lama = GOLONGAN_TO_LAMA.get(golongan, 0.0)
+        total_lama = promotion.lama
 
         # Hitung total_baru dari AK terpilih
         total_baru = 0.0
@@ -850,38 +860,16 @@ def penetapan_view(request):
                 ak_list_for_report.insert(insert_index, pendidikan_ak_item_display)
 
         # === TERAPKAN PENGURANGAN SESUAI GOLONGAN ===
-        PENGURANGAN_GOLONGAN = {
-            "III/a": 0,
-            "III/b": 50,
-            "III/c": 0,
-            "III/d": 100,
-        }
-        pengurangan = PENGURANGAN_GOLONGAN.get(golongan, 0)
+        pengurangan = promotion.pengurangan
         total_baru = max(0.0, total_baru - pengurangan)  # Hindari nilai negatif
 
         # For penetapan report, total_jumlah includes ak_pendidikan_total if included
         total_jumlah = total_lama + total_baru + ak_pendidikan_total
 
         # Hitung info kenaikan pangkat
-        next_golongan = "N/A"
-        pangkat_minimal = 0.0
-        jenjang_minimal = 0.0
-        if golongan in GOLONGAN_HIERARKI:
-            idx = GOLONGAN_HIERARKI.index(golongan)
-            if idx < len(GOLONGAN_HIERARKI) - 1:
-                next_golongan = GOLONGAN_HIERARKI[idx + 1]
-                key = (golongan, next_golongan)
-                if key in MINIMAL_AK_MAPPING:
-                    pangkat_minimal, jenjang_minimal = MINIMAL_AK_MAPPING[key]
-            else:
-                next_golongan = "Tertinggi"
-
-        PANGKAT_OPTIONS_REVERSE = {v: k for k, v in PANGKAT_OPTIONS.items()}
-        if next_golongan in GOLONGAN_HIERARKI:
-            nama_pangkat_tujuan = PANGKAT_OPTIONS_REVERSE.get(next_golongan, next_golongan)
-            teks_tujuan = f"{nama_pangkat_tujuan} {next_golongan}"
-        else:
-            teks_tujuan = next_golongan
+        pangkat_minimal = promotion.pangkat_minimal
+        jenjang_minimal = promotion.jenjang_minimal
+        teks_tujuan = promotion.teks_tujuan
 
         hasil_pangkat = total_jumlah - pangkat_minimal
         hasil_jenjang = total_jumlah - jenjang_minimal
@@ -958,13 +946,15 @@ def penetapan_view(request):
     }
     return render(request, 'pegawai/penetapan.html', context)
 
+@conditional_page
 def penetapan_pdf_view(request):
-    pegawai_id = request.GET.get('pegawai_id')
+    params = _report_params(request)
+    pegawai_id = params.get('pegawai_id')
     if not pegawai_id:
         return HttpResponse("Pegawai ID is required.", status=400)
 
-    selected_periods = request.GET.getlist('selected_periods')
-    include_ak_pendidikan_str = request.GET.get('include_ak_pendidikan', 'false')
+    selected_periods = params.getlist('selected_periods')
+    include_ak_pendidikan_str = params.get('include_ak_pendidikan', 'false')
     include_ak_pendidikan = include_ak_pendidikan_str.lower() == 'true'
     pegawai = get_object_or_404(Pegawai, id=pegawai_id)
 
@@ -983,43 +973,43 @@ def penetapan_pdf_view(request):
                 except ValueError:
                     pass
 
+    snapshot = ReportSnapshot(pegawai)
+
     if not selected_periods:
-        selected_ak_ids = list(AK.objects.filter(pegawai=pegawai).values_list('id', flat=True))
-        if AngkaIntegrasi.objects.filter(pegawai=pegawai).exists():
+        selected_ak_ids = snapshot.ak_ids
+        if snapshot.angka_integrasi:
             include_integrasi_filter = True
-        if AkPendidikan.objects.filter(pegawai=pegawai).exists():
+        if snapshot.ak_pendidikan_records:
             include_pendidikan_filter = True
 
-    report_data = _get_penetapan_report_data(pegawai, selected_ak_ids, include_integrasi_filter, include_pendidikan_filter)
+    report_data = _get_penetapan_report_data(pegawai, selected_ak_ids, include_integrasi_filter, include_pendidikan_filter, snapshot=snapshot)
 
     context = {
         'report_data': report_data,
         'ak_list': report_data.get('ak_list', []),
         'base_dir': settings.BASE_DIR,
     }
-    pdf = render_to_pdf('pegawai/penetapan_report_template.html', context)
+    cache_key = report_cache_key('penetapan', snapshot, selected_periods=selected_ak_ids,
+                                 include_integrasi=include_integrasi_filter, include_pendidikan=include_pendidikan_filter)
+    pdf = _cached_pdf_response(cache_key, 'pegawai/penetapan_report_template.html', context,
+                               request=request, filename=f"penetapan_{pegawai.nip}.pdf")
     if pdf:
-        response = HttpResponse(pdf, content_type='application/pdf')
-        response['Content-Disposition'] = f'inline; filename="penetapan_{pegawai.nip}.pdf"'
-        return response
+        return pdf
     return HttpResponse("Error generating PDF", status=500)
 
+@conditional_page
 def angka_integrasi_list(request):
     # Get the search query from the GET parameters
     search_query = request.GET.get('search', '')
 
-    # Start with all AngkaIntegrasi objects, ordered by employee name in ascending order
-    angka_integrasi_list = AngkaIntegrasi.objects.select_related('pegawai').order_by('pegawai__nama')
+    angka_integrasi_list = AngkaIntegrasi.objects.select_related('pegawai')
 
     # If there's a search query, filter by employee name
     if search_query:
-        angka_integrasi_list = angka_integrasi_list.filter(pegawai__nama__icontains=search_query)
+        angka_integrasi_list = filter_by_nama(angka_integrasi_list, search_query, 'pegawai')
 
-    # Apply pagination
-    paginator = Paginator(angka_integrasi_list, 5)  # Show 5 records per page
-
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # 5 records per page, ordered by employee name
+    page_obj = paginate_list(request, angka_integrasi_list, ('pegawai__nama', 'id'), search_query)
 
     return render(request, 'pegawai/angka_integrasi_list.html', {
         'page_obj': page_obj,
@@ -1131,6 +1121,7 @@ class AngkaIntegrasiDeleteView(DeleteView):
     template_name = 'pegawai/angka_integrasi_confirm_delete.html'
     success_url = reverse_lazy('angka_integrasi_list')
 
+@conditional_page
 def instansi_list(request):
     instansi = Instansi.objects.all()
     return render(request, 'pegawai/instansi_list.html', {'instansi': instansi})
@@ -1152,6 +1143,7 @@ class InstansiDeleteView(DeleteView):
     template_name = 'pegawai/instansi_confirm_delete.html'
     success_url = reverse_lazy('instansi_list')
 
+@conditional_page
 def penilai_list(request):
     penilai = Penilai.objects.all()
     return render(request, 'pegawai/penilai_list.html', {'penilai': penilai})
@@ -1173,24 +1165,19 @@ class PenilaiDeleteView(DeleteView):
     template_name = 'pegawai/penilai_confirm_delete.html'
     success_url = reverse_lazy('penilai_list')
 
-from django.core.paginator import Paginator
-
+@conditional_page
 def ak_list(request):
     # Get the search query from the GET parameters
     search_query = request.GET.get('search', '')
 
-    # Start with all AK objects, ordered by employee name in ascending order
-    ak_list = AK.objects.select_related('pegawai', 'instansi', 'penilai').order_by('pegawai__nama')
+    ak_list = AK.objects.select_related('pegawai', 'instansi', 'penilai')
 
     # If there's a search query, filter by employee name
     if search_query:
-        ak_list = ak_list.filter(pegawai__nama__icontains=search_query)
+        ak_list = filter_by_nama(ak_list, search_query, 'pegawai')
 
-    # Apply pagination
-    paginator = Paginator(ak_list, 5)  # Show 5 records per page
-
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # 5 records per page, ordered by employee name
+    page_obj = paginate_list(request, ak_list, ('pegawai__nama', 'id'), search_query)
 
     return render(request, 'pegawai/ak_list.html', {
         'page_obj': page_obj,
@@ -1225,22 +1212,19 @@ class AKDeleteView(DeleteView):
     success_url = reverse_lazy('ak_list')
 
 
+@conditional_page
 def ak_pendidikan_list(request):
     # Get the search query from the GET parameters
     search_query = request.GET.get('search', '')
 
-    # Start with all AkPendidikan objects, ordered by employee name in ascending order
-    ak_pendidikan_list = AkPendidikan.objects.select_related('pegawai', 'instansi', 'penilai').order_by('pegawai__nama')
+    ak_pendidikan_list = AkPendidikan.objects.select_related('pegawai', 'instansi', 'penilai')
 
     # If there's a search query, filter by employee name
     if search_query:
-        ak_pendidikan_list = ak_pendidikan_list.filter(pegawai__nama__icontains=search_query)
-
-    # Apply pagination
-    paginator = Paginator(ak_pendidikan_list, 5)  # Show 5 records per page
+        ak_pendidikan_list = filter_by_nama(ak_pendidikan_list, search_query, 'pegawai')
 
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # 5 records per page, ordered by employee name
+    page_obj = paginate_list(request, ak_pendidikan_list, ('pegawai__nama', 'id'), search_query)
 
     return render(request, 'pegawai/ak_pendidikan_list.html', {
         'page_obj': page_obj,
@@ -1268,252 +1252,20 @@ class AkPendidikanDeleteView(DeleteView):
     success_url = reverse_lazy('ak_pendidikan_list')
 
 
-def _get_akumulasi_report_data(pegawai, selected_ak_ids, include_integrasi_filter, include_pendidikan_filter=False):
-    # This is a simplified version of the logic in akumulasi_view
-    ak_records_queryset = AK.objects.filter(pegawai=pegawai).order_by('tanggal_awal_penilaian')
+def _get_akumulasi_report_data(pegawai, selected_ak_ids, include_integrasi_filter, include_pendidikan_filter=False, snapshot=None):
+    """Helper function to generate data for the Akumulasi report."""
+    if snapshot is None:
+        snapshot = ReportSnapshot(pegawai)
+    return build_akumulasi_report(snapshot, selected_ak_ids, include_integrasi_filter, include_pendidikan_filter)
 
-    if selected_ak_ids:
-        ak_records_filtered = ak_records_queryset.filter(id__in=selected_ak_ids)
-    else:
-        ak_records_filtered = ak_records_queryset.all()
-
-    latest_ak_unfiltered = AK.objects.filter(pegawai=pegawai).order_by('tanggal_akhir_penilaian').last()
-
-    latest_ak = ak_records_filtered.last() if ak_records_filtered.exists() else None
-
-    tahun = datetime.now().year
-    if latest_ak_unfiltered and latest_ak_unfiltered.tanggal_akhir_penilaian:
-        tahun = latest_ak_unfiltered.tanggal_akhir_penilaian.year
-    elif latest_ak_unfiltered and latest_ak_unfiltered.tanggal_ditetapkan:
-        tahun = latest_ak_unfiltered.tanggal_ditetapkan.year
-
-    jenjang_raw = ""
-    if latest_ak_unfiltered and latest_ak_unfiltered.jenjang:
-        jenjang_raw = latest_ak_unfiltered.jenjang
-    # Use the actual job title from the employee record instead of defaulting to "Analis"
-    tmt_jabatan_str = ""
-    if pegawai.tmt_jabatan:
-        tmt_jabatan_str = pegawai.tmt_jabatan.strftime('%d-%m-%Y')
-    jabatan_dan_tmt = f"{pegawai.jabatan} / {tmt_jabatan_str}" if tmt_jabatan_str else pegawai.jabatan
-
-    periode_awal_str, periode_akhir_str = '', ''
-    ak_list_for_report = list(ak_records_filtered)
-
-    if ak_list_for_report:
-        min_tgl_awal = min((ak.tanggal_awal_penilaian for ak in ak_list_for_report if hasattr(ak, 'tanggal_awal_penilaian') and ak.tanggal_awal_penilaian), default=None)
-        max_tgl_akhir = max((ak.tanggal_akhir_penilaian for ak in ak_list_for_report if hasattr(ak, 'tanggal_akhir_penilaian') and ak.tanggal_akhir_penilaian), default=None)
-        if min_tgl_awal:
-            periode_awal_str = min_tgl_awal.strftime('%d-%m-%Y')
-        if max_tgl_akhir:
-            periode_akhir_str = max_tgl_akhir.strftime('%d-%m-%Y')
-
-    total_angka_kredit = sum(ak.jumlah_angka_kredit for ak in ak_list_for_report if hasattr(ak, 'jumlah_angka_kredit'))
-
-    for ak_item in ak_list_for_report:
-        if hasattr(ak_item, 'tanggal_awal_penilaian') and ak_item.tanggal_awal_penilaian and hasattr(ak_item, 'tanggal_akhir_penilaian') and ak_item.tanggal_akhir_penilaian:
-            rdelta = relativedelta(ak_item.tanggal_akhir_penilaian, ak_item.tanggal_awal_penilaian)
-            months = rdelta.years * 12 + rdelta.months
-            if rdelta.days > 0: months += 1
-            if months == 0: months = 1
-            ak_item.periode_bulan = months
-        elif isinstance(ak_item, dict):
-            ak_item['periode_bulan'] = 0
-        else:
-            ak_item.periode_bulan = 0
 
+def _get_penetapan_report_data(pegawai, selected_ak_ids, include_integrasi_filter, include_pendidikan_filter=False, snapshot=None):
+    """Helper function to generate data for the Penetapan report."""
+    if snapshot is None:
+        snapshot = ReportSnapshot(pegawai)
+    return build_penetapan_report(snapshot, selected_ak_ids, include_integrasi_filter, include_pendidikan_filter)
 
-    if include_integrasi_filter:
-        angka_integrasi_obj = AngkaIntegrasi.objects.filter(pegawai=pegawai).first()
-        if angka_integrasi_obj:
-            angka_integrasi_value = angka_integrasi_obj.jumlah_angka_integrasi
-            total_angka_kredit += angka_integrasi_value
-            integrasi_ak_item_display = {
-                'penilaian': 'AK Integrasi',
-                'jumlah_angka_kredit': angka_integrasi_value,
-                'is_integrasi_item': True,
-                'periode_bulan': None,
-            }
-            ak_list_for_report.insert(0, integrasi_ak_item_display)
-
-    # Handle Ak Pendidikan
-    if include_pendidikan_filter:
-        ak_pendidikan_records = AkPendidikan.objects.filter(pegawai=pegawai)
-        if ak_pendidikan_records.exists():
-            ak_pendidikan_total = sum([ak_pend.jumlah_angka_kredit for ak_pend in ak_pendidikan_records])
-            total_angka_kredit += ak_pendidikan_total
-            pendidikan_ak_item_display = {
-                'penilaian': 'AK Pendidikan',
-                'jumlah_angka_kredit': ak_pendidikan_total,
-                'is_pendidikan_item': True,
-                'periode_bulan': None,
-            }
-            # Insert after integrasi if present, otherwise at the beginning
-            insert_index = 1 if include_integrasi_filter and angka_integrasi_obj else 0
-            ak_list_for_report.insert(insert_index, pendidikan_ak_item_display)
-
-    return {
-        'pegawai': pegawai,
-        'ak_list': ak_list_for_report,
-        'tahun': tahun,
-        'nama_instansi': latest_ak.instansi.nama_instansi if latest_ak else '',
-        'periode_awal_str': periode_awal_str,
-        'periode_akhir_str': periode_akhir_str,
-        'jabatan_dan_tmt': jabatan_dan_tmt,
-        'total_angka_kredit': total_angka_kredit,
-        'tempat_ditetapkan': latest_ak.tempat_ditetapkan if latest_ak else '',
-        'tanggal_ditetapkan': latest_ak.tanggal_ditetapkan if latest_ak else datetime.now().date(),
-        'nama_penilai': latest_ak.penilai.nama if latest_ak and latest_ak.penilai else '',
-        'nip_penilai': latest_ak.penilai.nip if latest_ak and latest_ak.penilai else '',
-        'pangkat_penilai': latest_ak.penilai.pangkat if latest_ak and latest_ak.penilai else '',
-        'golongan_penilai': latest_ak.penilai.golongan if latest_ak and latest_ak.penilai else '',
-        'crud_angka_kredit': latest_ak.Nomor_AK if latest_ak and latest_ak.Nomor_AK else '',
-    }
-def _get_penetapan_report_data(pegawai, selected_ak_ids, include_integrasi_filter, include_pendidikan_filter=False):
-    ak_records_queryset = AK.objects.filter(pegawai=pegawai).order_by('tanggal_awal_penilaian')
-
-    if selected_ak_ids:
-        ak_records_filtered = ak_records_queryset.filter(id__in=selected_ak_ids)
-    else:
-        ak_records_filtered = ak_records_queryset.all()
-
-    latest_ak_unfiltered = AK.objects.filter(pegawai=pegawai).order_by('tanggal_akhir_penilaian').last()
-    latest_ak = ak_records_filtered.last() if ak_records_filtered.exists() else None
-
-    tahun = datetime.now().year
-    if latest_ak_unfiltered and latest_ak_unfiltered.tanggal_akhir_penilaian:
-        tahun = latest_ak_unfiltered.tanggal_akhir_penilaian.year
-    elif latest_ak_unfiltered and latest_ak_unfiltered.tanggal_ditetapkan:
-        tahun = latest_ak_unfiltered.tanggal_ditetapkan.year
-
-    # === NORMALISASI GOLONGAN ===
-    raw_golongan = str(pegawai.golongan).strip()
-    alt_map = {
-        "IIIA": "III/a",
-        "IIIB": "III/b",
-        "IIIC": "III/c",
-        "IIID": "III/d",
-        "3A": "III/a",
-        "3B": "III/b",
-        "3C": "III/c",
-        "3D": "III/d",
-        "3a": "III/a",
-        "3b": "III/b",
-        "3c": "III/c",
-        "3d": "III/d",
-    }
-    golongan = alt_map.get(raw_golongan.upper(), raw_golongan)
-
-    total_lama = GOLONGAN_TO_LAMA.get(golongan, 0.0)
-
-    ak_list_for_report = list(ak_records_filtered)
-    total_baru = sum(ak.jumlah_angka_kredit for ak in ak_list_for_report)
-
-    # Tambahkan integrasi jika diminta
-    if include_integrasi_filter:
-        angka_integrasi_obj = AngkaIntegrasi.objects.filter(pegawai=pegawai).first()
-        if angka_integrasi_obj:
-            integrasi_value = angka_integrasi_obj.jumlah_angka_integrasi
-            total_baru += integrasi_value
-            integrasi_item = {
-                'penilaian': 'AK Integrasi',
-                'jumlah_angka_kredit': integrasi_value,
-                'is_integrasi_item': True
-            }
-            ak_list_for_report.insert(0, integrasi_item)
-
-    # Tambahkan pendidikan jika diminta
-    ak_pendidikan_total = 0
-    if include_pendidikan_filter:
-        ak_pendidikan_records = AkPendidikan.objects.filter(pegawai=pegawai)
-        if ak_pendidikan_records.exists():
-            ak_pendidikan_total = sum([ak_pend.jumlah_angka_kredit for ak_pend in ak_pendidikan_records])
-            # NOTE: For penetapan report, pendidikan is shown in a separate row, not added to total_baru
-            pendidikan_item = {
-                'penilaian': 'AK Pendidikan',
-                'jumlah_angka_kredit': ak_pendidikan_total,
-                'is_pendidikan_item': True
-            }
-            # Insert after integrasi if present, otherwise at the beginning
-            insert_index = 1 if include_integrasi_filter and AngkaIntegrasi.objects.filter(pegawai=pegawai).exists() else 0
-            ak_list_for_report.insert(insert_index, pendidikan_item)
-
-    # === TERAPKAN PENGURANGAN SESUAI GOLONGAN ===
-    PENGURANGAN_GOLONGAN = {
-        "III/a": 0,
-        "III/b": 50,
-        "III/c": 0,
-        "III/d": 100,
-    }
-    pengurangan = PENGURANGAN_GOLONGAN.get(golongan, 0)
-    total_baru = max(0.0, total_baru - pengurangan)  # Hindari nilai negatif
-
-    # For penetapan report, total_jumlah includes ak_pendidikan_total if included
-    total_jumlah = total_lama + total_baru + (ak_pendidikan_total if include_pendidikan_filter else 0)
-
-    # Hitung kenaikan pangkat
-    next_golongan = "N/A"
-    pangkat_minimal, jenjang_minimal = 0.0, 0.0
-    if golongan in GOLONGAN_HIERARKI:
-        idx = GOLONGAN_HIERARKI.index(golongan)
-        if idx < len(GOLONGAN_HIERARKI) - 1:
-            next_golongan = GOLONGAN_HIERARKI[idx + 1]
-            key = (golongan, next_golongan)
-            if key in MINIMAL_AK_MAPPING:
-                pangkat_minimal, jenjang_minimal = MINIMAL_AK_MAPPING[key]
-        else:
-            next_golongan = "Tertinggi"
-
-    PANGKAT_OPTIONS_REVERSE = {v: k for k, v in PANGKAT_OPTIONS.items()}
-    if next_golongan in GOLONGAN_HIERARKI:
-        nama_pangkat_tujuan = PANGKAT_OPTIONS_REVERSE.get(next_golongan, next_golongan)
-        teks_tujuan = f"{nama_pangkat_tujuan} {next_golongan}"
-    else:
-        teks_tujuan = next_golongan
-
-    jenjang_raw = latest_ak_unfiltered.jenjang if latest_ak_unfiltered else ""
-    # Use the actual job title from the employee record instead of defaulting to "Analis"
-    tmt_jabatan_str = pegawai.tmt_jabatan.strftime('%d-%m-%Y') if pegawai.tmt_jabatan else ""
-    jabatan_dan_tmt = f"{pegawai.jabatan} / {tmt_jabatan_str}" if tmt_jabatan_str else pegawai.jabatan
-    
-    periode_awal_str, periode_akhir_str = '', ''
-    if ak_list_for_report:
-        ak_models_only = [ak for ak in ak_list_for_report if isinstance(ak, AK)]
-        if ak_models_only:
-            min_tgl_awal = min((ak.tanggal_awal_penilaian for ak in ak_models_only if ak.tanggal_awal_penilaian), default=None)
-            max_tgl_akhir = max((ak.tanggal_akhir_penilaian for ak in ak_models_only if ak.tanggal_akhir_penilaian), default=None)
-            if min_tgl_awal:
-                periode_awal_str = min_tgl_awal.strftime('%d-%m-%Y')
-            if max_tgl_akhir:
-                periode_akhir_str = max_tgl_akhir.strftime('%d-%m-%Y')
-    
-    return {
-        'pegawai': pegawai,
-        'ak_list': ak_list_for_report,
-        'tahun': tahun,
-        'nama_instansi': latest_ak_unfiltered.instansi.nama_instansi if latest_ak_unfiltered and latest_ak_unfiltered.instansi else '',
-        'periode_awal_str': periode_awal_str,
-        'periode_akhir_str': periode_akhir_str,
-        'jabatan_dan_tmt': jabatan_dan_tmt,
-        'total_lama': total_lama,
-        'total_baru': total_baru,          # <-- SUDAH DIKURANGI SESUAI ATURAN
-        'total_jumlah': total_jumlah,
-        'ak_pendidikan_value': ak_pendidikan_total if include_pendidikan_filter else 0,
-        'total_performance_only': total_lama + total_baru,
-        'total_baru_with_pendidikan': total_baru + (ak_pendidikan_total if include_pendidikan_filter else 0),
-        'pangkat_minimal': pangkat_minimal,
-        'jenjang_minimal': jenjang_minimal,
-        'hasil_pangkat': total_jumlah - pangkat_minimal,
-        'hasil_jenjang': total_jumlah - jenjang_minimal,
-        'teks_tujuan': teks_tujuan,
-        'tempat_ditetapkan': latest_ak_unfiltered.tempat_ditetapkan if latest_ak_unfiltered else '',
-        'tanggal_ditetapkan': latest_ak_unfiltered.tanggal_ditetapkan if latest_ak_unfiltered else datetime.now().date(),
-        'nama_penilai': latest_ak_unfiltered.penilai.nama if latest_ak_unfiltered and latest_ak_unfiltered.penilai else '',
-        'nip_penilai': latest_ak_unfiltered.penilai.nip if latest_ak_unfiltered and latest_ak_unfiltered.penilai else '',
-        'pangkat_penilai': latest_ak_unfiltered.penilai.pangkat if latest_ak_unfiltered and latest_ak_unfiltered.penilai else '',
-        'golongan_penilai': latest_ak_unfiltered.penilai.golongan if latest_ak_unfiltered and latest_ak_unfiltered.penilai else '',
-        'crud_angka_kredit': latest_ak_unfiltered.Nomor_AK if latest_ak_unfiltered and latest_ak_unfiltered.Nomor_AK else '',
-    }
-
+@conditional_page
 def merge_report_view(request):
     pegawai_options = Pegawai.objects.all()
     report_data = {}
@@ -1552,15 +1304,16 @@ def merge_report_view(request):
 
     if pegawai_id:
         pegawai = get_object_or_404(Pegawai, id=pegawai_id)
-        all_ak_records_for_pegawai = AK.objects.filter(pegawai=pegawai).order_by('tanggal_awal_penilaian')
-        angka_integrasi_obj = AngkaIntegrasi.objects.filter(pegawai=pegawai).first()
-        ak_pendidikan_records = AkPendidikan.objects.filter(pegawai=pegawai)
+        snapshot = ReportSnapshot(pegawai)
+        all_ak_records_for_pegawai = snapshot.ak_records
+        angka_integrasi_obj = snapshot.angka_integrasi
+        ak_pendidikan_records = snapshot.ak_pendidikan_records
 
         if start_date and end_date:
-            all_ak_records_for_pegawai = all_ak_records_for_pegawai.filter(
-                tanggal_awal_penilaian__gte=start_date,
-                tanggal_akhir_penilaian__lte=end_date
-            )
+            all_ak_records_for_pegawai = [
+                ak for ak in all_ak_records_for_pegawai
+                if ak.tanggal_awal_penilaian >= start_date and ak.tanggal_akhir_penilaian <= end_date
+            ]
 
         if request.method == 'POST' and 'generate_report' in request.POST:
 
@@ -1573,12 +1326,12 @@ def merge_report_view(request):
                 final_period_ids = [ak.id for ak in all_ak_records_for_pegawai]
                 if angka_integrasi_obj:
                     include_integrasi = True
-                if ak_pendidikan_records.exists():
+                if ak_pendidikan_records:
                     include_pendidikan = True
 
-            konversi_report_data, konversi_ak_list = _get_konversi_report_data(pegawai, final_period_ids, include_integrasi, include_pendidikan)
-            akumulasi_data = _get_akumulasi_report_data(pegawai, final_period_ids, include_integrasi, include_pendidikan)
-            penetapan_data = _get_penetapan_report_data(pegawai, final_period_ids, include_integrasi, include_pendidikan)
+            konversi_report_data, konversi_ak_list = _get_konversi_report_data(pegawai, final_period_ids, include_integrasi, include_pendidikan, snapshot=snapshot)
+            akumulasi_data = _get_akumulasi_report_data(pegawai, final_period_ids, include_integrasi, include_pendidikan, snapshot=snapshot)
+            penetapan_data = _get_penetapan_report_data(pegawai, final_period_ids, include_integrasi, include_pendidikan, snapshot=snapshot)
 
             report_data = {
                 'konversi': {
@@ -1613,14 +1366,16 @@ def merge_report_view(request):
     return render(request, 'pegawai/merge_report.html', context)
 
 
+@conditional_page
 def merge_report_pdf_view(request):
-    pegawai_id = request.GET.get('pegawai_id')
+    params = _report_params(request)
+    pegawai_id = params.get('pegawai_id')
     if not pegawai_id:
         return HttpResponse("Pegawai ID is required.", status=400)
 
-    selected_periods = request.GET.getlist('selected_periods')
-    start_date_str = request.GET.get('start_date')
-    end_date_str = request.GET.get('end_date')
+    selected_periods = params.getlist('selected_periods')
+    start_date_str = params.get('start_date')
+    end_date_str = params.get('end_date')
 
     start_date = None
     if start_date_str:
@@ -1646,16 +1401,17 @@ def merge_report_pdf_view(request):
                 pass
 
     pegawai = get_object_or_404(Pegawai, id=pegawai_id)
+    snapshot = ReportSnapshot(pegawai)
 
     # Get all AK records for the selected pegawai
-    all_ak_records_for_pegawai = AK.objects.filter(pegawai=pegawai).order_by('tanggal_awal_penilaian')
+    all_ak_records_for_pegawai = snapshot.ak_records
 
     # Apply date filters if provided
     if start_date and end_date:
-        all_ak_records_for_pegawai = all_ak_records_for_pegawai.filter(
-            tanggal_awal_penilaian__gte=start_date,
-            tanggal_akhir_penilaian__lte=end_date
-        )
+        all_ak_records_for_pegawai = [
+            ak for ak in all_ak_records_for_pegawai
+            if ak.tanggal_awal_penilaian >= start_date and ak.tanggal_akhir_penilaian <= end_date
+        ]
 
     # Determine final period IDs
     final_period_ids = selected_ak_ids_int
@@ -1665,17 +1421,15 @@ def merge_report_pdf_view(request):
     # If nothing is selected, use all
     if not selected_periods:
         final_period_ids = [ak.id for ak in all_ak_records_for_pegawai]
-        angka_integrasi_obj = AngkaIntegrasi.objects.filter(pegawai=pegawai).first()
-        ak_pendidikan_records = AkPendidikan.objects.filter(pegawai=pegawai)
-        if angka_integrasi_obj:
+        if snapshot.angka_integrasi:
             include_integrasi = True
-        if ak_pendidikan_records.exists():
+        if snapshot.ak_pendidikan_records:
             include_pendidikan = True
 
-    # Generate data for all three reports
-    konversi_report_data, konversi_ak_list = _get_konversi_report_data(pegawai, final_period_ids, include_integrasi, include_pendidikan)
-    akumulasi_data = _get_akumulasi_report_data(pegawai, final_period_ids, include_integrasi, include_pendidikan)
-    penetapan_data = _get_penetapan_report_data(pegawai, final_period_ids, include_integrasi, include_pendidikan)
+    # Generate data for all three reports from the same snapshot
+    konversi_report_data, konversi_ak_list = _get_konversi_report_data(pegawai, final_period_ids, include_integrasi, include_pendidikan, snapshot=snapshot)
+    akumulasi_data = _get_akumulasi_report_data(pegawai, final_period_ids, include_integrasi, include_pendidikan, snapshot=snapshot)
+    penetapan_data = _get_penetapan_report_data(pegawai, final_period_ids, include_integrasi, include_pendidikan, snapshot=snapshot)
 
     report_data = {
         'konversi': {
@@ -1692,10 +1446,76 @@ def merge_report_pdf_view(request):
         'base_dir': settings.BASE_DIR,
     }
 
+    cache_key = report_cache_key('merge', snapshot, selected_periods=final_period_ids,
+                                 include_integrasi=include_integrasi, include_pendidikan=include_pendidikan)
+
     # Use a separate template for the PDF version to avoid Font Awesome icons
-    pdf = render_to_pdf('pegawai/merge_report_pdf_template.html', context)
+    pdf = _cached_pdf_response(cache_key, 'pegawai/merge_report_pdf_template.html', context,
+                               request=request, filename=f"laporan_{pegawai.nip}.pdf")
     if pdf:
         # The render_to_pdf function already returns an HttpResponse with proper PDF content
         return pdf
     return HttpResponse("Error generating PDF", status=500)
 
+
+def batch_reports_view(request):
+    """
+    Generate report PDFs for every pegawai matching a filter and download them as one ZIP.
+
+    The page's script asks for JSON: with background jobs the ZIP is then
+    built by a job (202 with its status/download URLs, see pegawai.pdf_jobs).
+    Otherwise (PDF_BACKGROUND_JOBS off, e.g. on Vercel) it is built in the
+    request, for at most BATCH_SYNC_MAX_REPORTS reports so the request stays
+    within the time limit and does not hold a worker for long.
+    """
+    unit_kerja_options = Pegawai.objects.order_by('unit_kerja').values_list('unit_kerja', flat=True).distinct()
+    error_message = ""
+    wants_json = 'application/json' in request.headers.get('Accept', '')
+
+    if request.method == 'POST':
+        unit_kerja = request.POST.get('unit_kerja', '').strip()
+        golongan = request.POST.get('golongan', '').strip()
+        nips = request.POST.get('nip_list', '').replace(',', ' ').split()
+        report_types = [r for r in request.POST.getlist('report_types') if r in REPORT_TYPES]
+        sync_limit = getattr(settings, 'BATCH_SYNC_MAX_REPORTS', 30)
+
+        if not (unit_kerja or golongan or nips):
+            error_message = "Pilih unit kerja, golongan, atau isi daftar NIP terlebih dahulu."
+        elif not report_types:
+            error_message = "Pilih minimal satu jenis laporan."
+        else:
+            pegawai_qs = filter_pegawai(unit_kerja, golongan, nips)
+            pegawai_ids = list(pegawai_qs.values_list('id', flat=True))
+            report_count = len(pegawai_ids) * len(report_types)
+            if not pegawai_ids:
+                error_message = "Tidak ada pegawai yang sesuai dengan filter."
+            elif wants_json and pdf_jobs_enabled():
+                write = partial(generate_reports_zip, filter_pegawai().filter(pk__in=pegawai_ids), report_types)
+                job = submit_file_job('laporan_angka_kredit.zip', write, 'application/zip',
+                                      timeout=getattr(settings, 'PDF_BATCH_JOB_TIMEOUT', 1800))
+                return _pdf_job_response(job)
+            elif report_count > sync_limit:
+                error_message = (
+                    f"Terlalu banyak laporan ({report_count}) untuk dibuat sekaligus; maksimal {sync_limit}. "
+                    "Persempit filter atau isi daftar NIP."
+                )
+            else:
+                archive = tempfile.TemporaryFile()
+                statuses = generate_reports_zip(pegawai_qs, report_types, archive)
+                archive.seek(0)
+                response = FileResponse(archive, as_attachment=True, filename='laporan_angka_kredit.zip',
+                                        content_type='application/zip')
+                response['X-Batch-Total'] = str(len(statuses))
+                response['X-Batch-Failed'] = str(sum(1 for s in statuses if s['status'] != 'OK'))
+                return response
+        if wants_json:
+            return JsonResponse({'error': error_message}, status=400)
+
+    context = {
+        'unit_kerja_options': unit_kerja_options,
+        'golongan_options': GOLONGAN_HIERARKI,
+        'report_type_options': REPORT_TYPES,
+        'error_message': error_message,
+        'sync_limit': getattr(settings, 'BATCH_SYNC_MAX_REPORTS', 30),
+    }
+    return render(request, 'pegawai/batch_reports.html', context)
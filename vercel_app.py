@@ -3,7 +3,9 @@ Vercel WSGI handler for Django app.
 """
 import os
 import sys
+import time
 
+_start = time.perf_counter()
 _here = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, _here)
 
@@ -14,11 +16,22 @@ try:
     from django.core.wsgi import get_wsgi_application
     django.setup()
 
-    # Run migrations on every cold start (required for SQLite in /tmp)
-    from django.core.management import call_command
-    call_command("migrate", "--run-syncdb", verbosity=0)
+    from AppAk2.bootstrap import ColdStartTimer, prepare_database
+    timer = ColdStartTimer(_start)
+    timer.mark("django setup")
+
+    # SQLite in /tmp starts empty: copy the prebuilt template, migrate only if it is stale
+    timer.mark("database", prepare_database())
 
     application = get_wsgi_application()
+    timer.mark("wsgi app")
+
+    from django.conf import settings
+    if settings.PDF_WARM_UP:
+        from pegawai.utils import warm_up_pdf_renderer
+        warm_up_pdf_renderer()
+        timer.mark("pdf warm-up")
+    timer.report()
 except Exception:
     import traceback
     traceback.print_exc()